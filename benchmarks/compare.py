@@ -0,0 +1,59 @@
+"""Compare two `pipeline.py` result files stage by stage.
+
+    python benchmarks/compare.py before.json after.json [--threshold 0.1]
+
+Exits with status 1 when a stage got slower than the threshold allows.
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+
+def load(path):
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Allowed relative slowdown per stage (0.1 = 10%%)",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.01,
+        help="Ignore slowdowns smaller than this, which are mostly noise",
+    )
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before["params"] != after["params"]:
+        print("Warning: the runs used different parameters", file=sys.stderr)
+
+    print(f"{'stage':<28} {'before':>10} {'after':>10} {'change':>8}")
+    regressions = 0
+    for name, stage in after["stages"].items():
+        if name not in before["stages"]:
+            print(f"{name:<28} {'-':>10} {stage['seconds']:9.3f}s")
+            continue
+
+        old, new = before["stages"][name]["seconds"], stage["seconds"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > args.threshold and new - old > args.min_seconds:
+            flag = "  slower"
+            regressions += 1
+        print(f"{name:<28} {old:9.3f}s {new:9.3f}s {change:+7.1%}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
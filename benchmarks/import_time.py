@@ -0,0 +1,98 @@
+"""Check that report commands start quickly and never import the LLM stack.
+
+Each command is resolved the way `benchci` resolves it (importing the
+entrypoint and the module implementing the command) in a fresh interpreter,
+a few times over. The check fails when a forbidden module (openbench and the
+provider SDKs it pulls in) was imported, or when the best time exceeds the
+budget in every one of `--rounds` rounds: a single slow round is put down to
+a noisy machine and measured again.
+
+    python benchmarks/import_time.py [--budget-ms 100] [--runs 5] [--rounds 3]
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+
+REPORT_COMMANDS = (
+    "build-pages",
+    "build-charts",
+    "build-spider-chart",
+    "build-trends",
+    "build-all",
+    "compat",
+    "migrate-logs",
+    "merge-logs",
+    "prune",
+    "serve",
+)
+
+FORBIDDEN_MODULES = ("openbench", "inspect_ai", "anthropic", "openai")
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+from benchci import entrypoint
+entrypoint.load_command(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted(sys.modules)}))
+"""
+
+
+class ProbeError(Exception):
+    pass
+
+
+def measure(command, runs):
+    """Best import time of a command in ms, and the modules it loaded."""
+    best = None
+    modules = set()
+    for _ in range(runs):
+        probe = subprocess.run([sys.executable, "-c", PROBE, command], capture_output=True, text=True)
+        if probe.returncode != 0:
+            lines = probe.stderr.strip().splitlines()
+            raise ProbeError(lines[-1] if lines else f"exit status {probe.returncode}")
+        result = json.loads(probe.stdout)
+        best = result["ms"] if best is None else min(best, result["ms"])
+        modules.update(result["modules"])
+    return best, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Import time budget per command")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter runs per command (best is kept)")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds a command must be over budget to fail")
+    args = parser.parse_args()
+
+    failures = 0
+    for command in REPORT_COMMANDS:
+        try:
+            elapsed, modules = measure(command, args.runs)
+            for _ in range(args.rounds - 1):
+                if elapsed <= args.budget_ms:
+                    break
+                elapsed = min(elapsed, measure(command, args.runs)[0])
+        except ProbeError as e:
+            print(f"{command:<20} FAIL could not import the command ({e}); is benchci installed (make install)?")
+            failures += 1
+            continue
+
+        forbidden = sorted({name.split(".", 1)[0] for name in modules} & set(FORBIDDEN_MODULES))
+
+        status = "ok"
+        if forbidden:
+            status = f"FAIL imports {', '.join(forbidden)}"
+        elif elapsed > args.budget_ms:
+            status = f"FAIL over {args.budget_ms:.0f} ms budget"
+        failures += status != "ok"
+
+        print(f"{command:<20} {elapsed:7.1f} ms  {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Benchmark the ingest and report pipeline on synthetic logs.
+
+Generates logs with `synthetic.py`, then times each pipeline stage and
+records its peak memory. Results are written as JSON so runs can be
+compared across commits with `compare.py`.
+
+    python benchmarks/pipeline.py --scale 1k --output before.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import http.client
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from synthetic import DEFAULT_METRICS, write_logs
+
+from benchci import store, compat, server
+from benchci.reports import aggregate, charts, pages, spider
+
+
+SCALES = {"10": 10, "1k": 1_000, "100k": 100_000}
+
+SERVED_FILES = ("index.html", "database.json", "chart.html", "spider_chart.html", "report.css")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def stdout_to_stderr():
+    """Send the pipeline's progress output (including from workers) to stderr."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def timed(func, *args):
+    """Run `func` and return `(result, seconds)`."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(func, *args):
+    """Peak Python heap allocation of `func` in bytes."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_and_convert(logs_path):
+    return pages.convert_to_database_format(pages.load_json_files(logs_path))
+
+
+def serve_requests(reports_path, requests, concurrency):
+    """Fetch report files from a local server; return per-request latencies."""
+    httpd = server.make_server(reports_path, 0)
+    port = httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def fetch(i):
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", f"/{SERVED_FILES[i % len(SERVED_FILES)]}", headers={"Accept-Encoding": "gzip"})
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        if response.status != 200:
+            raise RuntimeError(f"Unexpected status {response.status}")
+        return time.perf_counter() - start
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(fetch, range(requests)))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(args, workdir):
+    logs_path = workdir / "logs"
+    reports_path = workdir / "docs"
+    reports_path.mkdir(parents=True)
+    config = {
+        "evaluation": {
+            "output": {"logs": str(logs_path), "reports": str(reports_path)},
+            "compat": {"workers": args.workers},
+        }
+    }
+    stages = {}
+
+    _, seconds = timed(
+        write_logs, logs_path, args.files, args.samples, args.metrics, args.error_ratio, args.seed
+    )
+    print(f"Generated {args.files} logs in {seconds:.2f}s", file=sys.stderr)
+
+    # compat runs in worker processes, so report their peak RSS instead
+    _, seconds = timed(compat.compat_logs, config)
+    stages["compat_logs"] = {
+        "seconds": seconds,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+    }
+
+    # Cold ingest into an empty store, decoded by worker processes
+    conn = store.connect(workdir / "results.sqlite")
+    with conn:
+        _, seconds = timed(pages.ingest_logs, logs_path, conn, args.workers)
+    conn.close()
+    stages["ingest_logs"] = {"seconds": seconds}
+
+    data, seconds = timed(load_and_convert, logs_path)
+    stages["load_and_convert"] = {"seconds": seconds, "peak_bytes": peak_memory(load_and_convert, logs_path)}
+
+    matrix, seconds = timed(aggregate.build_score_matrix, data)
+    stages["build_score_matrix"] = {
+        "seconds": seconds,
+        "peak_bytes": peak_memory(aggregate.build_score_matrix, data),
+    }
+
+    for name, prepare in (
+        ("prepare_chart_data", charts.prepare_chart_data),
+        ("prepare_spider_chart_data", spider.prepare_spider_chart_data),
+    ):
+        _, seconds = timed(prepare, matrix)
+        stages[name] = {"seconds": seconds, "peak_bytes": peak_memory(prepare, matrix)}
+
+    # Render the reports the serve loop fetches
+    pages.save_to_json_file(data, reports_path)
+    pages.generate_html_page(reports_path)
+    pages.generate_css(reports_path)
+    charts.generate_chart_html(*charts.prepare_chart_data(matrix), reports_path)
+    spider.generate_spider_chart_html(*spider.prepare_spider_chart_data(matrix), reports_path)
+    server.precompress_reports(reports_path)
+
+    latencies, seconds = timed(serve_requests, reports_path, args.requests, args.concurrency)
+    stages["serve"] = {
+        "seconds": seconds,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+    return {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "files": args.files,
+            "samples": args.samples,
+            "metrics": list(args.metrics),
+            "error_ratio": args.error_ratio,
+            "seed": args.seed,
+            "workers": args.workers,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scale",
+        choices=sorted(SCALES),
+        default="10",
+        help="Number of logs to generate (overridden by --files)",
+    )
+    parser.add_argument("--files", type=int, help="Number of logs to generate")
+    parser.add_argument("--samples", type=int, default=20, help="Samples per log")
+    parser.add_argument("--metrics", default=",".join(DEFAULT_METRICS), help="Comma-separated scorer metrics")
+    parser.add_argument("--error-ratio", type=float, default=0.05, help="Fraction of errored logs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="compat and ingest worker processes")
+    parser.add_argument("--requests", type=int, default=500, help="Requests in the serve loop")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent serve clients")
+    parser.add_argument("--workdir", help="Directory for the generated logs (default: a temporary one)")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    args.files = args.files if args.files is not None else SCALES[args.scale]
+    args.metrics = tuple(args.metrics.split(","))
+
+    with stdout_to_stderr():
+        if args.workdir:
+            results = run(args, Path(args.workdir))
+        else:
+            with tempfile.TemporaryDirectory(prefix="benchci-bench-") as workdir:
+                results = run(args, Path(workdir))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    for name, stage in results["stages"].items():
+        print(f"{name:<28} {stage['seconds']:9.3f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
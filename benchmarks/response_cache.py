@@ -0,0 +1,145 @@
+"""Exercise the model response cache against a local OpenAI-compatible stand-in.
+
+Starts a stand-in `/chat/completions` server with a fixed latency, then
+sends the same suite of requests (every prompt once per epoch) through the
+caching proxy twice, each time through a fresh proxy sharing one cache
+file, like two `benchci evaluate` runs. Reports the upstream calls and
+latencies of both passes, and fails if the second pass reached the
+upstream or got different responses.
+
+    python benchmarks/response_cache.py [--prompts 200] [--epochs 2] [--latency-ms 50]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import http.server
+import urllib.request
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchci import responsecache
+
+
+def make_standin(latency):
+    """An OpenAI-compatible server answering every request with a fresh completion."""
+    calls = Counter()
+    lock = threading.Lock()
+
+    class StandinHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                calls["total"] += 1
+                number = calls["total"]
+            time.sleep(latency)
+            prompt = body["messages"][-1]["content"]
+            response = json.dumps(
+                {
+                    "id": f"chatcmpl-{number}",
+                    "object": "chat.completion",
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": f"answer {number} to {prompt}"},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 20, "completion_tokens": 10, "total_tokens": 30},
+                }
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandinHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, calls
+
+
+def run_suite(base_url, prompts, epochs, concurrency):
+    """Send every prompt once per epoch; return the answers per prompt and the latencies."""
+
+    def send(index):
+        prompt = f"question {index % prompts}"
+        request = urllib.request.Request(
+            f"{base_url}/chat/completions",
+            data=json.dumps(
+                {"model": "standin/model", "messages": [{"role": "user", "content": prompt}], "temperature": 0.7}
+            ).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": "Bearer test"},
+            method="POST",
+        )
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            answer = json.loads(response.read())["choices"][0]["message"]["content"]
+        return prompt, answer, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(prompts * epochs)))
+
+    answers = {}
+    for prompt, answer, _ in results:
+        answers.setdefault(prompt, []).append(answer)
+    return {prompt: sorted(values) for prompt, values in answers.items()}, [latency for *_, latency in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    standin, calls = make_standin(args.latency_ms / 1000)
+    upstream = f"http://127.0.0.1:{standin.server_address[1]}/v1"
+
+    with tempfile.TemporaryDirectory(prefix="benchci-response-cache-") as workdir:
+        cache_path = Path(workdir) / "responses.db"
+        passes = []
+        for _ in range(2):
+            cache = responsecache.ResponseCache(cache_path, max_size_mb=64)
+            proxy = responsecache.make_proxy(cache, {"STANDIN": upstream})
+            threading.Thread(target=proxy.serve_forever, daemon=True).start()
+
+            before = calls["total"]
+            start = time.perf_counter()
+            base_url = f"http://127.0.0.1:{proxy.server_address[1]}/standin"
+            answers, latencies = run_suite(base_url, args.prompts, args.epochs, args.concurrency)
+            seconds = time.perf_counter() - start
+            passes.append((answers, calls["total"] - before))
+
+            proxy.shutdown()
+            proxy.server_close()
+            cache.close()
+
+            latencies.sort()
+            print(
+                f"{len(latencies)} requests in {seconds:.2f}s: {calls['total'] - before} upstream calls, "
+                f"{proxy.stats['hits']} hits, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms"
+            )
+
+    (first, _), (second, second_calls) = passes
+    distinct = all(len(set(values)) == args.epochs for values in first.values())
+    if second_calls or second != first or not distinct:
+        print("FAIL: the second pass was not answered from the cache, or epochs shared a response")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
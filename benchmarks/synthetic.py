@@ -0,0 +1,283 @@
+"""Generate synthetic openbench logs shaped like the files in `logs/`.
+
+Logs are written under their raw (pre-`compat`) names with `samples` and
+`reductions`, so the whole pipeline can be exercised on them.
+
+    python benchmarks/synthetic.py OUTPUT_DIR --files 1000 --samples 50
+"""
+
+import json
+import random
+import string
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+
+
+MODELS = (
+    "openrouter/deepseek/deepseek-chat-v3.1",
+    "openrouter/meta-llama/llama-4-maverick",
+    "openrouter/moonshotai/kimi-k2",
+    "openrouter/openai/gpt-oss-120b",
+    "openrouter/openai/gpt-oss-20b",
+    "openrouter/qwen/qwen3-235b-a22b",
+    "openrouter/google/gemma-3-27b-it",
+    "openrouter/mistralai/mistral-small-3.2-24b-instruct",
+)
+
+EVALS = (
+    "openbench/openbookqa",
+    "cti_bench",
+    "cti_bench_ate",
+    "cti_bench_mcq",
+    "cti_bench_rcm",
+    "cti_bench_vsp",
+    "math_500",
+    "mmlu",
+    "gpqa_diamond",
+    "humaneval",
+)
+
+DEFAULT_METRICS = ("accuracy", "stderr")
+
+START = datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+
+def random_id(rng, length=22):
+    return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+
+def make_sample(rng, sample_id, model, correct):
+    """One `samples` entry with a short chat transcript."""
+    question = " ".join(rng.choice(("what", "which", "option", "the", "value", "is")) for _ in range(24))
+    answer = rng.choice("ABCD")
+    target = answer if correct else rng.choice([c for c in "ABCD" if c != answer])
+    input_tokens = rng.randint(80, 600)
+    output_tokens = rng.randint(5, 400)
+    return {
+        "id": sample_id,
+        "epoch": 1,
+        "input": question,
+        "choices": ["A", "B", "C", "D"],
+        "target": target,
+        "messages": [
+            {"id": random_id(rng), "content": question, "source": "input", "role": "user"},
+            {
+                "id": random_id(rng),
+                "content": f"ANSWER: {answer}",
+                "source": "generate",
+                "role": "assistant",
+                "model": model.split("/", 1)[1],
+            },
+        ],
+        "output": {
+            "model": model.split("/", 1)[1],
+            "choices": [
+                {
+                    "message": {"role": "assistant", "content": f"ANSWER: {answer}"},
+                    "stop_reason": "stop",
+                }
+            ],
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        },
+        "scores": {
+            "choice": {
+                "value": "C" if correct else "I",
+                "answer": answer,
+                "explanation": f"ANSWER: {answer}",
+            }
+        },
+        "metadata": {},
+        "store": {},
+        "events": [],
+        "model_usage": {
+            model: {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            }
+        },
+    }
+
+
+def make_log(rng, index, samples=20, metrics=DEFAULT_METRICS, error=False):
+    """Build one openbench log as a dict."""
+    model = MODELS[index % len(MODELS)]
+    eval_name = EVALS[(index // len(MODELS)) % len(EVALS)]
+    task = eval_name.split("/")[-1]
+    created = START + timedelta(minutes=7 * index)
+    completed = created + timedelta(seconds=rng.randint(30, 3600))
+
+    skill = 0.3 + 0.6 * (index % len(MODELS)) / len(MODELS)
+    correct = [rng.random() < skill for _ in range(samples)]
+    accuracy = sum(correct) / samples if samples else 0.0
+    stderr = (accuracy * (1 - accuracy) / max(samples - 1, 1)) ** 0.5
+
+    sample_entries = [make_sample(rng, i + 1, model, ok) for i, ok in enumerate(correct)]
+    input_tokens = sum(s["output"]["usage"]["input_tokens"] for s in sample_entries)
+    output_tokens = sum(s["output"]["usage"]["output_tokens"] for s in sample_entries)
+
+    metric_values = {"accuracy": accuracy, "stderr": stderr}
+    log = {
+        "version": 2,
+        "status": "error" if error else "success",
+        "eval": {
+            "eval_id": random_id(rng),
+            "run_id": random_id(rng),
+            "created": created.isoformat(),
+            "task": eval_name,
+            "task_id": random_id(rng),
+            "task_version": 0,
+            "task_display_name": task,
+            "task_registry_name": f"openbench/{task}",
+            "task_attribs": {},
+            "task_args": {},
+            "task_args_passed": {},
+            "dataset": {
+                "name": task,
+                "samples": samples,
+                "sample_ids": list(range(1, samples + 1)),
+                "shuffled": False,
+            },
+            "model": model,
+            "model_generate_config": {"max_connections": 10, "timeout": 10000},
+            "model_base_url": "https://openrouter.ai/api/v1",
+            "model_args": {},
+            "config": {
+                "epochs": 1,
+                "epochs_reducer": ["mean"],
+                "fail_on_error": True,
+                "log_samples": True,
+                "log_realtime": True,
+                "log_images": True,
+                "log_buffer": 10,
+                "score_display": True,
+            },
+            "revision": {"type": "git", "origin": "https://example.com/benchci.git", "commit": "0000000"},
+            "packages": {"inspect_ai": "0.3.125"},
+            "scorers": [
+                {
+                    "name": "choice",
+                    "options": {},
+                    "metrics": [{"name": f"inspect_ai/{name}", "options": {}} for name in metrics],
+                    "metadata": {},
+                }
+            ],
+        },
+        "plan": {
+            "name": "plan",
+            "steps": [{"solver": "generate", "params": {}}],
+            "config": {"max_connections": 10, "max_tokens": 8192, "temperature": 0.0, "timeout": 10000},
+        },
+        "stats": {
+            "started_at": created.isoformat(),
+            "completed_at": completed.isoformat(),
+            "model_usage": {
+                model: {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "input_tokens_cache_read": 0,
+                    "reasoning_tokens": 0,
+                }
+            },
+        },
+        "samples": sample_entries,
+    }
+
+    if error:
+        log["error"] = {
+            "message": "BadRequestError('Provider returned error')",
+            "traceback": "Traceback (most recent call last):\n  ...\nBadRequestError\n",
+            "traceback_ansi": "",
+        }
+        return log
+
+    log["results"] = {
+        "total_samples": samples,
+        "completed_samples": samples,
+        "scores": [
+            {
+                "name": "choice",
+                "scorer": "choice",
+                "params": {},
+                "scored_samples": samples,
+                "unscored_samples": 0,
+                "metrics": {
+                    name: {
+                        "name": name,
+                        "value": metric_values.get(name, rng.random()),
+                        "params": {},
+                    }
+                    for name in metrics
+                },
+            }
+        ],
+    }
+    log["reductions"] = [
+        {
+            "scorer": "choice",
+            "reducer": "mean",
+            "samples": [
+                {"value": 1.0 if ok else 0.0, "answer": None, "sample_id": i + 1}
+                for i, ok in enumerate(correct)
+            ],
+        }
+    ]
+    return log
+
+
+def log_filename(log):
+    """Raw openbench file name, e.g. `results_<model>_<task>_<timestamp>.json`."""
+    model = log["eval"]["model"].replace("/", "_").replace("-", "_").replace(".", "_")
+    task = log["eval"]["task"].split("/")[-1]
+    stamp = datetime.fromisoformat(log["eval"]["created"]).strftime("%Y%m%d%H%M%S")
+    return f"results_{model}_{task}_{stamp}.json"
+
+
+def write_logs(output_dir, files, samples=20, metrics=DEFAULT_METRICS, error_ratio=0.05, seed=0):
+    """Write `files` synthetic logs to `output_dir` and return their paths."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+
+    paths = []
+    for index in range(files):
+        log = make_log(rng, index, samples, metrics, error=rng.random() < error_ratio)
+        path = output_dir / log_filename(log)
+        path.write_text(json.dumps(log, indent=2), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="Directory to write the logs to")
+    parser.add_argument("--files", type=int, default=10, help="Number of logs")
+    parser.add_argument("--samples", type=int, default=20, help="Samples per log")
+    parser.add_argument(
+        "--metrics",
+        default=",".join(DEFAULT_METRICS),
+        help="Comma-separated metrics reported by the scorer",
+    )
+    parser.add_argument("--error-ratio", type=float, default=0.05, help="Fraction of errored logs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_logs(
+        args.output,
+        args.files,
+        samples=args.samples,
+        metrics=tuple(args.metrics.split(",")),
+        error_ratio=args.error_ratio,
+        seed=args.seed,
+    )
+    print(f"Wrote {len(paths)} logs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,36 +4,105 @@
 # See: https://hynek.me/articles/testing-packaging/
 
 
-from . import compat, evaluation, reports, server
+import importlib
 
-from .compat import compat_logs
-from .evaluation import run_evaluation
-from .server import start_server
 
-from .reports import charts, pages, spider
-from .reports.pages import build_pages
-from .reports.charts import build_charts
-from .reports.spider import build_spider_chart
+# Submodules and commands are imported on first access, so that commands
+# which never run a model do not pay for importing openbench.
+_LAZY = {
+    "compat":             (".compat", None),
+    "compat_logs":        (".compat", "compat_logs"),
+    "evaluation":         (".evaluation", None),
+    "logio":              (".logio", None),
+    "parallel":           (".parallel", None),
+    "migrate_logs":       (".logio", "migrate_logs"),
+    "merge_log_dirs":     (".logio", "merge_log_dirs"),
+    "run_evaluation":     (".evaluation", "run_evaluation"),
+    "retention":          (".retention", None),
+    "retries":            (".retries", None),
+    "prune_logs":         (".retention", "prune_logs"),
+    "runcache":           (".runcache", None),
+    "responsecache":      (".responsecache", None),
+    "samples":            (".samples", None),
+    "load_samples":       (".samples", "load_samples"),
+    "scheduler":          (".scheduler", None),
+    "planner":            (".planner", None),
+    "server":             (".server", None),
+    "start_server":       (".server", "start_server"),
+    "store":              (".store", None),
+    "telemetry":          (".telemetry", None),
+    "watch":              (".watch", None),
+
+    "reports":            (".reports", None),
+    "build":              (".reports.build", None),
+    "build_all":          (".reports.build", "build_all"),
+    "charts":             (".reports.charts", None),
+    "build_charts":       (".reports.charts", "build_charts"),
+    "pages":              (".reports.pages", None),
+    "build_pages":        (".reports.pages", "build_pages"),
+    "spider":             (".reports.spider", None),
+    "build_spider_chart": (".reports.spider", "build_spider_chart"),
+    "trends":             (".reports.trends", None),
+    "build_trends":       (".reports.trends", "build_trends"),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attribute = _LAZY[name]
+    value = importlib.import_module(module_name, __name__)
+    if attribute:
+        value = getattr(value, attribute)
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
 
 __all__ = [
     "compat",
         "compat_logs",
+    "samples",
+        "load_samples",
+    "logio",
+        "migrate_logs",
+        "merge_log_dirs",
+    "retention",
+        "prune_logs",
 
     "charts",
         "build_charts",
 
     "evaluation",
         "run_evaluation",
+    "scheduler",
+    "planner",
+    "retries",
+    "runcache",
+    "responsecache",
+    "telemetry",
     
     "pages",
         "build_pages",
 
+    "store",
+    "parallel",
+
     "reports",
+        "build",
+            "build_all",
         "spider",
             "build_spider_chart",
+        "trends",
+            "build_trends",
         "server",
             "start_server",
+        "watch",
         "pages",
             "build_pages",
         "charts",
@@ -0,0 +1,84 @@
+import random
+from statistics import NormalDist
+from .shards import combine_metric
+
+
+DEFAULTS = {
+    "batch_size": 50,
+    "ci_width": 0.1,
+    "confidence": 0.95,
+    "min_samples": 100,
+    "max_samples": None,
+    "seed": 0,
+}
+
+
+def canary_settings(config, run_config, enabled=False):
+    """Resolve the canary settings for a run, or None if it runs in full.
+
+    Defaults come from `evaluation.canary` and can be overridden per run
+    with `canary: {...}`; `canary: true` or `enabled` turns it on.
+    """
+    run_canary = run_config.get("canary")
+    if not (enabled or run_canary):
+        return None
+
+    settings = {**DEFAULTS, **(config["evaluation"].get("canary") or {})}
+    if isinstance(run_canary, dict):
+        settings.update(run_canary)
+    return settings
+
+
+def batch_ranges(total, batch_size, seed):
+    """Sample ranges of one batch each, in a seeded random order.
+
+    openbench can only select contiguous sample ranges, so batches are
+    randomized at block level. Without a known dataset size the blocks are
+    returned in order and the caller stops at the end of the dataset.
+    """
+    if not total:
+        start = 0
+        while True:
+            yield (start, start + batch_size)
+            start += batch_size
+
+    ranges = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+    random.Random(seed).shuffle(ranges)
+    yield from ranges
+
+
+def pooled_accuracy(batches):
+    """Combine (accuracy, stderr, samples) batch results into one estimate."""
+    counts = [samples for _, _, samples in batches]
+    metrics = {
+        "accuracy": [accuracy for accuracy, _, _ in batches],
+        "stderr": [stderr for _, stderr, _ in batches],
+    }
+    return (
+        combine_metric("accuracy", metrics, counts),
+        combine_metric("stderr", metrics, counts),
+        sum(counts),
+    )
+
+
+def confidence_interval(accuracy, stderr, confidence):
+    """Normal-approximation confidence interval for the accuracy."""
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    return accuracy - z * stderr, accuracy + z * stderr
+
+
+def stop_reason(accuracy, stderr, samples, settings, baseline=None):
+    """Return why the canary can stop after these samples, or None."""
+    if settings["max_samples"] and samples >= settings["max_samples"]:
+        return "max_samples"
+    if samples < settings["min_samples"]:
+        return None
+
+    lower, upper = confidence_interval(accuracy, stderr, settings["confidence"])
+    if baseline is not None and upper < baseline:
+        return "below_baseline"
+    if baseline is not None and lower > baseline:
+        return "above_baseline"
+    if upper - lower <= settings["ci_width"]:
+        return "ci_width"
+    return None
@@ -1,45 +1,67 @@
-import json
-from pathlib import Path
+from functools import partial
+from . import logio, parallel, profiling
+from .logio import read_compacted
+from .samples import ColumnBuilder, sidecar_path, write_sidecar
 
 
 def iter_json_files(logs_path):
-    """Yield JSON objects from all JSON files in the logs directory."""
+    """Yield the paths of all (plain or compressed) logs in the logs directory."""
     # TODO - Better define output paths (config.yaml?) - evaluation.py:28
-    logs_dir = Path(logs_path)
+    yield from logio.iter_logs(logs_path)
 
-    for file_path in logs_dir.glob("*.json"):
-        yield file_path
 
+@profiling.traced
+def compact_log(record, extract_samples=True, compression="none"):
+    """Compact a single log file and return the path it was saved to.
 
+    Unless `extract_samples` is off, the per-sample scores, token counts and
+    timings are first saved to a sidecar next to the compacted log, which is
+    written with the given compression.
+    """
+    builder = ColumnBuilder() if extract_samples else None
+    try:
+        record_json = read_compacted(record, on_item=builder.add if builder is not None else None)
+    except logio.READ_ERRORS:
+        print(f"Warning: Could not decode JSON from {record}")
+        return None
+
+    # Leave logs of evals that are still running for a later pass
+    if record_json.get("status") == "started":
+        return None
+
+    # Strip all "_compats" first to avoid multiple suffixes
+    compat_stem = logio.log_stem(record).replace("_compat", "")
+    # Write the compacted log under the "_compat" name, then drop the original
+    compat_rename = record.with_name(logio.log_name(f"{compat_stem}_compat", compression))
+    # No sidecar when extraction is off (no builder) or the log has no samples
+    if builder is not None and len(builder):
+        write_sidecar(sidecar_path(compat_rename), builder.columns())
+    logio.write_log(compat_rename, record_json)
+    if compat_rename != record:
+        record.unlink()
+
+    print(f"Processed {record} and saved compacted version as {compat_rename}")
+
+    return compat_rename
+
+
+@profiling.traced
 def compat_logs(config):
     logs_path = config["evaluation"]["output"]["logs"]
+    compat_config = config["evaluation"].get("compat", {})
+    max_workers = compat_config.get("workers")
+    extract_samples = compat_config.get("samples", True)
+    compression = logio.log_compression(config)
+
+    # If the file is already compat, skip it
+    records = [
+        record
+        for record in iter_json_files(logs_path=logs_path)
+        if "_compat" not in record.name
+    ]
 
-    for record in iter_json_files(logs_path=logs_path):
-        # If the file is already compat, skip it
-        if "_compat" in record.name:
-            continue
-
-        try:
-            with record.open("r", encoding="utf-8") as f:
-                record_json = json.load(f)
-        except json.JSONDecodeError:
-            print(f"Warning: Could not decode JSON from {record}")
-            continue
-
-        # Remove evaluation content from the JSON
-        record_json.pop("samples", None)
-        record_json.pop("reductions", None)
-
-        # Write the modified JSON back to the file
-        with record.open("w", encoding="utf-8") as f:
-            json.dump(record_json, f, indent=4, sort_keys=True, ensure_ascii=False)
-
-        # Strip all "_compats" first to avoid multiple suffixes
-        compat_stem = record.stem.replace("_compat", "")
-        # Rename the file to prepend "_compat"
-        compat_rename = record.with_name(f"{compat_stem}_compat{record.suffix}")
-        record.rename(compat_rename)
-
-        print(f"Processed {record} and saved compacted version as {compat_rename}")
+    compact = partial(compact_log, extract_samples=extract_samples, compression=compression)
+    for _ in parallel.imap(compact, records, max_workers=max_workers):
+        pass
 
     print("Log compaction complete.")
@@ -1,9 +1,32 @@
 import yaml
-import benchci
 import argparse
+import importlib
 from pathlib import Path
 
 
+# Subcommand functions as "module:function". They are imported only when
+# their command runs, so report commands never import openbench.
+COMMANDS = {
+    "evaluate": "benchci.evaluation:run_evaluation",
+    "build-pages": "benchci.reports.pages:build_pages",
+    "build-charts": "benchci.reports.charts:build_charts",
+    "build-spider-chart": "benchci.reports.spider:build_spider_chart",
+    "build-trends": "benchci.reports.trends:build_trends",
+    "build-all": "benchci.reports.build:build_all",
+    "compat": "benchci.compat:compat_logs",
+    "migrate-logs": "benchci.logio:migrate_logs",
+    "merge-logs": "benchci.logio:merge_log_dirs",
+    "prune": "benchci.retention:prune_logs",
+    "serve": "benchci.server:start_server",
+}
+
+
+def load_command(command):
+    """Import and return the function implementing a subcommand."""
+    module_name, _, function_name = COMMANDS[command].partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
 def main():
     parser = argparse.ArgumentParser(description="BenchCI Command Line Interface")
 
@@ -14,33 +37,131 @@ def main():
         help="Path to the YAML configuration file",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-stage timing, memory and I/O as a Chrome trace",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        default="profile.json",
+        help="Where to write the --profile trace",
+    )
+
     subparsers = parser.add_subparsers(dest="command")
 
     eval_parser = subparsers.add_parser("evaluate", help="Run evaluations")
-    eval_parser.set_defaults(func=benchci.evaluation.run_evaluation)
+    eval_parser.add_argument(
+        "--force",
+        "--refresh",
+        dest="force",
+        action="store_true",
+        help="Re-run evaluations even if a cached result exists",
+    )
+    eval_parser.add_argument(
+        "--canary",
+        dest="canary_mode",
+        action="store_true",
+        help="Stop each eval early once its accuracy is known well enough",
+    )
+    eval_parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only print the planned job order per worker and the predicted makespan",
+    )
+    eval_parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Only run the I-th of N slices of the jobs, balanced by expected duration",
+    )
+    eval_parser.set_defaults(func="evaluate")
 
     page_parser = subparsers.add_parser("build-pages", help="Build HTML pages")
-    page_parser.set_defaults(func=benchci.reports.pages.build_pages)
+    page_parser.set_defaults(func="build-pages")
 
     chart_parser = subparsers.add_parser("build-charts", help="Build charts")
-    chart_parser.set_defaults(func=benchci.reports.charts.build_charts)
+    chart_parser.set_defaults(func="build-charts")
 
     spider_parser = subparsers.add_parser(
         "build-spider-chart", help="Build spider chart"
     )
-    spider_parser.set_defaults(func=benchci.reports.spider.build_spider_chart)
+    spider_parser.set_defaults(func="build-spider-chart")
+
+    trends_parser = subparsers.add_parser(
+        "build-trends", help="Build the score trend page and flag regressions"
+    )
+    trends_parser.set_defaults(func="build-trends")
+
+    build_parser = subparsers.add_parser(
+        "build-all", help="Build the database, HTML pages, all charts and trends"
+    )
+    build_parser.set_defaults(func="build-all")
 
     compat_parser = subparsers.add_parser("compat", help="Compat logs")
-    compat_parser.set_defaults(func=benchci.compat.compat_logs)
+    compat_parser.set_defaults(func="compat")
+
+    migrate_parser = subparsers.add_parser(
+        "migrate-logs", help="Rewrite existing logs with another compression"
+    )
+    migrate_parser.add_argument(
+        "--compression",
+        choices=["none", "gzip", "zstd"],
+        help="Compression to use (defaults to evaluation.output.compression)",
+    )
+    migrate_parser.set_defaults(func="migrate-logs")
+
+    merge_parser = subparsers.add_parser(
+        "merge-logs", help="Copy the logs of `evaluate --shard` slices into the logs directory"
+    )
+    merge_parser.add_argument(
+        "sources", nargs="+", help="Directories holding the logs of each slice"
+    )
+    merge_parser.set_defaults(func="merge-logs")
+
+    prune_parser = subparsers.add_parser(
+        "prune", help="Delete errored logs and roll up old runs (see evaluation.retention)"
+    )
+    prune_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print what would be deleted and rolled up",
+    )
+    prune_parser.set_defaults(func="prune")
 
     server_parser = subparsers.add_parser("serve", help="Serve reports")
-    server_parser.set_defaults(func=benchci.server.start_server)
+    server_parser.add_argument(
+        "--port", type=int, default=8000, help="Port to serve the reports on"
+    )
+    server_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Rebuild the reports as new logs arrive and push live updates",
+    )
+    server_parser.set_defaults(func="serve")
 
     args = parser.parse_args()
     config = yaml.safe_load(Path(args.config).read_text())
 
     if hasattr(args, "func"):
-        args.func(config)
+        # Pass subcommand options through as keyword arguments
+        options = {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("config", "command", "func", "profile", "profile_output")
+        }
+        if not args.profile:
+            load_command(args.func)(config, **options)
+            return
+
+        from benchci import profiling
+
+        profiling.enable()
+        try:
+            with profiling.span(args.command):
+                load_command(args.func)(config, **options)
+        finally:
+            profiling.write_trace(args.profile_output)
     else:
         parser.print_help()
 
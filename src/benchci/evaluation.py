@@ -1,64 +1,509 @@
+import os
+import time
 import datetime
 import openbench
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from . import logio, store, canary, shards, planner, profiling, retries, runcache, telemetry, responsecache
+from .scheduler import RateLimiter, Scheduler, expand_jobs
+from .reports.pages import ingest_logs, ingest_workers
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 
-def run_single_eval(model_name, eval_name, limit):
+def summarize_usage(eval_logs):
+    """Total the samples and tokens used by a list of eval logs."""
+    requests = 0
+    tokens = 0
+    metrics = {}
+    success = bool(eval_logs)
+    for eval_log in eval_logs or []:
+        success = success and eval_log.status == "success"
+        if eval_log.results is not None:
+            requests += eval_log.results.completed_samples
+            if eval_log.results.scores:
+                metrics = {
+                    name: metric.value
+                    for name, metric in eval_log.results.scores[0].metrics.items()
+                }
+        for usage in (eval_log.stats.model_usage or {}).values():
+            tokens += usage.total_tokens
+    return {"requests": requests, "tokens": tokens, "success": success, "metrics": metrics}
+
+
+def eval_failure(eval_logs):
+    """The error (message and traceback) of the first failed log, or None."""
+    for eval_log in eval_logs or []:
+        if eval_log.status == "success":
+            continue
+        if eval_log.error is None:
+            return f"Eval ended with status {eval_log.status}"
+        return "\n".join(part for part in (eval_log.error.message, eval_log.error.traceback) if part)
+    return None
+
+
+def resume_eval(log_path, max_connections=None):
+    """Re-run only the samples of a failed log that errored or never ran.
+
+    openbench writes logs as it goes, so a log that failed part way through
+    holds every sample completed before the failure. inspect's `eval_retry`
+    reuses those and writes a new, complete log, which replaces the failed
+    one under its name.
+    """
+    # openbench's `eval-retry` command wraps the same call, but exits the
+    # process on failure and returns no logs
+    from inspect_ai import eval_retry
+    from openbench.monkeypatch.file_recorder_logfile_patch import patch_file_recorder_logfile
+
+    retry_stem = f"{logio.log_stem(log_path)}_retry"
+    patch_file_recorder_logfile(retry_stem)
+    eval_logs = eval_retry(
+        str(log_path),
+        log_dir=str(log_path.parent),
+        log_format="json",
+        display="none",
+        max_connections=max_connections,
+    )
+
+    retry_path = log_path.with_name(logio.log_name(retry_stem))
+    if retry_path.exists():
+        os.replace(retry_path, log_path)
+        for eval_log in eval_logs:
+            eval_log.location = str(log_path)
+    return eval_logs
+
+
+def make_logfile_name(model_name, eval_name):
+    """Generate a timestamped logfile name for an eval."""
+    sanitized_model_name = model_name
+    for char in ["/", "-", ".", ":"]:
+        sanitized_model_name = sanitized_model_name.replace(char, "_")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"results_{sanitized_model_name}_{eval_name}_{timestamp}"
+
+
+@profiling.traced
+def run_single_eval(
+    model_name,
+    eval_name,
+    limit,
+    max_connections=None,
+    log_dir="./logs",
+    logfile_name=None,
+    sample_range=None,
+    retry=None,
+    compression="none",
+):
     """
     Runs a single evaluation task with logging.
+
+    When `sample_range` is given only the samples in `[start, end)` are
+    evaluated, which is how shards of a large eval are run. A run that fails
+    with a transient error (see `benchci.retries`) is retried with
+    exponential backoff, up to `retry["max_attempts"]` attempts in all;
+    retries resume from the failed log rather than starting over. openbench
+    writes plain JSON as it goes; once the run is over its log is re-encoded
+    with the given compression.
     """
     print(
         f"\nRunning evaluation: {eval_name} on model: {model_name} with limit: {limit}"
+        + (f" on samples {sample_range[0]}-{sample_range[1]}" if sample_range else "")
     )
 
     # Generate logfile name with timestamp
-    sanitized_model_name = model_name
-    for char in ["/", "-", ".", ":"]:
-        sanitized_model_name = sanitized_model_name.replace(char, "_")
+    logfile_name = logfile_name or make_logfile_name(model_name, eval_name)
 
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    logfile_name = f"results_{sanitized_model_name}_{eval_name}_{timestamp}"
-
-    # Run the evaluation
-    openbench.run_eval(
-        display=openbench._cli.eval_command.DisplayType.NONE,
-        benchmarks=[eval_name],
-        model=[model_name],
-        # TODO: Fix limit error
-        # limit=limit,
-        log_format=openbench._cli.eval_command.LogFormat.JSON,
-        logfile=logfile_name,
-        debug=True,
-        # model_base_url = "https://openrouter.ai/api/v1",
-        # model_role = "grader_model=openrouter/openai/gpt-4.1-mini",
+    # Only override openbench's defaults when configured
+    options = {}
+    if max_connections:
+        options["max_connections"] = max_connections
+    # openbench parses the limit from its CLI string form ("N" or "start,end")
+    if sample_range:
+        options["limit"] = f"{sample_range[0]},{sample_range[1]}"
+    elif limit:
+        options["limit"] = str(limit)
+
+    if telemetry.enabled():
+        # Registers inspect hooks that publish per-sample progress
+        from . import telemetry_hooks  # noqa: F401
+
+    retry = retry or retries.DEFAULTS
+    log_path = Path(log_dir) / logio.log_name(logfile_name)
+
+    for attempt in range(1, retry["max_attempts"] + 1):
+        eval_logs, raised = None, None
+        try:
+            if attempt > 1 and log_path.exists():
+                with profiling.span("inspect.eval_retry", model=model_name, eval=eval_name, attempt=attempt):
+                    eval_logs = resume_eval(log_path, max_connections)
+            else:
+                # Run the evaluation
+                with profiling.span("openbench.run_eval", model=model_name, eval=eval_name, **options):
+                    eval_logs = openbench.run_eval(
+                        display=openbench._cli.eval_command.DisplayType.NONE,
+                        benchmarks=[eval_name],
+                        model=[model_name],
+                        log_format=openbench._cli.eval_command.LogFormat.JSON,
+                        logfile=logfile_name,
+                        log_dir=log_dir,
+                        debug=True,
+                        # model_base_url = "https://openrouter.ai/api/v1",
+                        # model_role = "grader_model=openrouter/openai/gpt-4.1-mini",
+                        **options,
+                    )
+            error = eval_failure(eval_logs)
+        except Exception as e:
+            raised = e
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None or attempt == retry["max_attempts"] or not retries.is_transient(error, retry):
+            break
+
+        delay = retries.backoff_delay(attempt, retry)
+        reason = error.splitlines()[0]
+        print(
+            f"{eval_name} on {model_name} failed with a transient error ({reason}); "
+            f"retrying in {delay:.0f}s (attempt {attempt + 1}/{retry['max_attempts']})"
+        )
+        telemetry.emit("job_retry", model=model_name, eval=eval_name, attempt=attempt, wait=delay, error=reason)
+        time.sleep(delay)
+
+    if log_path.exists():
+        logio.convert_log(log_path, compression)
+    if raised is not None:
+        raise raised
+
+    return {
+        "message": f"Completed {eval_name} on {model_name}"
+        + (f" (samples {sample_range[0]}-{sample_range[1]})" if sample_range else ""),
+        "logfile": logfile_name,
+        **summarize_usage(eval_logs),
+    }
+
+
+@profiling.traced
+def run_canary_eval(
+    model_name,
+    eval_name,
+    settings,
+    baseline=None,
+    total=None,
+    max_connections=None,
+    log_dir="./logs",
+    compression="none",
+    retry=None,
+):
+    """
+    Runs an eval in random batches until its accuracy is known well enough.
+
+    Batches stop once the confidence interval is narrower than
+    `settings["ci_width"]`, or once it lies entirely above or below the
+    `baseline` score. The batch logs are merged into a single log, written
+    with the given compression.
+    """
+    logfile_name = make_logfile_name(model_name, eval_name)
+    if total and settings["max_samples"]:
+        total = min(total, settings["max_samples"])
+
+    batches = []
+    batch_paths = {}
+    usage = {"requests": 0, "tokens": 0}
+    reason = None
+    for index, sample_range in enumerate(
+        canary.batch_ranges(total, settings["batch_size"], settings["seed"])
+    ):
+        batch_logfile = f"{logfile_name}_batch{index + 1}"
+        result = run_single_eval(
+            model_name,
+            eval_name,
+            0,
+            max_connections=max_connections,
+            log_dir=log_dir,
+            logfile_name=batch_logfile,
+            sample_range=sample_range,
+            retry=retry,
+        )
+        if not result["success"]:
+            raise RuntimeError(f"Canary batch {sample_range} of {eval_name} on {model_name} failed")
+
+        batch_paths[sample_range] = Path(log_dir) / logio.log_name(batch_logfile)
+        usage["requests"] += result["requests"]
+        usage["tokens"] += result["tokens"]
+        metrics = result["metrics"]
+        batches.append((metrics.get("accuracy", 0.0), metrics.get("stderr", 0.0), result["requests"]))
+
+        accuracy, stderr, samples = canary.pooled_accuracy(batches)
+        reason = canary.stop_reason(accuracy, stderr, samples, settings, baseline)
+        if reason:
+            break
+        if result["requests"] < sample_range[1] - sample_range[0]:
+            # Ran past the end of a dataset of unknown size
+            reason = "exhausted"
+            break
+
+    reason = reason or "exhausted"
+    merged = shards.merge_shard_files(
+        [batch_paths[sample_range] for sample_range in sorted(batch_paths)],
+        Path(log_dir) / logio.log_name(logfile_name, compression),
     )
 
-    return f"Completed {eval_name} on {model_name}"
+    lower, upper = canary.confidence_interval(accuracy, stderr, settings["confidence"])
+    verdict = f" (baseline {baseline:.4f})" if baseline is not None else ""
+    return {
+        "message": (
+            f"Canary {eval_name} on {model_name}: accuracy {accuracy:.4f} "
+            f"[{lower:.4f}, {upper:.4f}] after {samples} samples, stopped: {reason}{verdict}"
+        ),
+        "logfile": logfile_name,
+        "success": merged.get("status") == "success",
+        **usage,
+    }
 
 
-def run_evaluation(config, max_workers=4):
+def skip_cached_jobs(conn, config, jobs, keys):
+    """Drop jobs whose inputs already have a successful, unexpired log."""
+    logs_path = config["evaluation"]["output"]["logs"]
+    ttl_days = config["evaluation"].get("cache", {}).get("ttl_days")
+
+    remaining = []
+    for job in jobs:
+        cached = runcache.lookup(conn, keys[job], logs_path, ttl_days)
+        if cached:
+            print(f"Skipping {job.eval_name} on {job.model_name}: cached in {cached}")
+        else:
+            remaining.append(job)
+    return remaining
+
+
+@profiling.traced
+def run_evaluation(config, max_workers=None, force=False, canary_mode=False, plan=False, shard=None):
     """
     Runs evaluations based on the provided configuration file.
+
+    Jobs are started longest first, by their duration estimated from earlier
+    runs (see `benchci.planner`), as soon as the scheduler has capacity for
+    their provider and model (see `benchci.scheduler.Scheduler`). With
+    `plan`, the planned order and predicted makespan are printed and nothing
+    runs. With `shard` ("I/N"), only the I-th of N slices of the jobs, split
+    by expected duration, is run (see `benchci.planner.partition_jobs`); the
+    logs of all slices are combined with `benchci merge-logs`. Jobs
+    with a cached successful result are skipped unless `force` is set, and
+    runs with `shards: N` split each eval into N sample ranges. Runs with
+    `canary` settings (or every run, with `canary_mode`) stop early once
+    their accuracy is known well enough; they always run and are not cached.
+    With `response_cache` enabled, model API calls go through a local cache
+    (see `benchci.responsecache`); the same proxy enforces the scheduler's
+    `requests_per_minute` and `tokens_per_minute` per request. Evals that fail with a transient error are
+    retried as configured in `evaluation.retry` (see `benchci.retries`).
+    """
+    logs_path = config["evaluation"]["output"]["logs"]
+    scheduler_config = config["evaluation"].get("scheduler", {})
+    cache_enabled = config["evaluation"].get("cache", {}).get("enabled", True)
+    compression = logio.log_compression(config)
+    max_workers = max_workers or scheduler_config.get("workers", 4)
+
+    conn = store.connect(store.get_store_path(config))
+    try:
+        # Bring the run history up to date; on a fresh checkout (e.g. every
+        # slice of a sharded CI run) the store is built from the logs here
+        with conn:
+            ingest_logs(logs_path, conn, ingest_workers(config))
+
+        sample_counts = store.sample_counts(conn)
+        # Rate limits of proxied providers are enforced per request by the proxy
+        limiter = RateLimiter(scheduler_config)
+        enforced = responsecache.proxied_providers(config) if limiter else ()
+        scheduler = Scheduler(scheduler_config, store.mean_usage(conn), sample_counts, enforced)
+        baselines = store.latest_scores(conn)
+
+        durations = planner.DurationModel(store.run_durations(conn))
+        jobs = expand_jobs(config)
+        if shard:
+            index, count = planner.parse_slice(shard)
+            slices, digest, estimates = planner.partition_jobs(jobs, durations, count, scheduler.estimates)
+            total = sum(estimates.values())
+            jobs = slices[index]
+            print(
+                f"Running slice {index + 1}/{count} (partition {digest}): {len(jobs)} jobs, "
+                f"{planner.format_duration(sum(estimates[job] for job in jobs))} of "
+                f"{planner.format_duration(total)} expected"
+            )
+
+        runs = config["evaluation"]["runs"]
+        version = runcache.openbench_version()
+        keys = {job: runcache.cache_key(job, runs[job.run_name], version) for job in jobs}
+
+        canaries = {}
+        for job in jobs:
+            settings = canary.canary_settings(config, runs[job.run_name], canary_mode)
+            if settings and job.limit:
+                # A run's limit caps how far its canary may go
+                settings["max_samples"] = min(settings["max_samples"] or job.limit, job.limit)
+            if settings:
+                canaries[job] = {
+                    "settings": settings,
+                    "baseline": baselines.get((job.model_name, job.eval_name)),
+                    "total": sample_counts.get(job.eval_name),
+                }
+
+        pending = [job for job in jobs if job not in canaries]
+        if cache_enabled and not force:
+            pending = skip_cached_jobs(conn, config, pending, keys)
+
+        pending = [
+            piece
+            for job in pending
+            for piece in shards.split_job(
+                job, runs[job.run_name].get("shards", 1), sample_counts.get(job.eval_name)
+            )
+        ]
+        pending = [job for job in jobs if job in canaries] + pending
+
+        job_plan = planner.plan_jobs(pending, durations, max_workers, scheduler.estimates)
+        planner.print_plan(job_plan, verbose=plan)
+        if plan:
+            return
+
+        events_path = telemetry.start_telemetry(config)
+        if events_path:
+            print(f"Publishing progress events to {events_path}")
+        proxy = responsecache.start_proxy(config, limiter)
+        try:
+            schedule_jobs(
+                job_plan.order,
+                scheduler,
+                max_workers,
+                logs_path,
+                conn,
+                keys,
+                canaries,
+                compression,
+                retries.retry_settings(config),
+            )
+        finally:
+            if proxy:
+                responsecache.stop_proxy(proxy)
+    finally:
+        conn.close()
+
+
+def finish_job(job, usage, groups, logs_path, compression="none"):
+    """Collect a finished job, merging sharded evals once all shards are in.
+
+    Returns the usage of the completed (merged) eval, or None while shards
+    of it are still running.
     """
-    tasks = []
+    if job.shards == 1:
+        return usage
+
+    group = groups[job.base]
+    group["finished"].append(usage)
+    if len(group["finished"]) < job.shards:
+        return None
+
+    logfile = group["logfile"]
+    if not all(result and result["success"] for result in group["finished"]):
+        print(f"Not merging {logfile}: some shards of {job.eval_name} failed")
+        return None
+
+    shard_paths = [
+        Path(logs_path) / logio.log_name(shards.shard_logfile(logfile, shard, job.shards))
+        for shard in range(job.shards)
+    ]
+    merged = shards.merge_shard_files(shard_paths, Path(logs_path) / logio.log_name(logfile, compression))
+    print(f"Merged {job.shards} shards of {job.eval_name} on {job.model_name} into {logfile}")
+
+    return {
+        "message": f"Completed {job.eval_name} on {job.model_name}",
+        "logfile": logfile,
+        "success": merged.get("status") == "success",
+    }
+
+
+def schedule_jobs(
+    pending, scheduler, max_workers, logs_path, conn, keys, canaries=None, compression="none", retry=None
+):
+    """Run jobs through the scheduler and record successful ones in the run cache."""
+    canaries = canaries or {}
+    running = {}
+    groups = {}
+
     with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        for run_name, run_config in config["evaluation"]["runs"].items():
-            print(f"\n--- Processing Evaluation Run: {run_name} ---")
+        while pending or running:
+            # Submit every job the scheduler will currently admit
+            for job in list(pending):
+                if len(running) >= max_workers:
+                    break
+                if not scheduler.admit(job):
+                    continue
+
+                pending.remove(job)
+                print(f"\n--- Starting {job.eval_name} for run: {job.run_name} ---")
+                telemetry.emit("job_start", model=job.model_name, eval=job.eval_name, shard=job.shard)
+
+                logfile_name = None
+                if job.shards > 1:
+                    # All shards of an eval share one logfile name
+                    group = groups.setdefault(
+                        job.base,
+                        {"logfile": make_logfile_name(job.model_name, job.eval_name), "finished": []},
+                    )
+                    logfile_name = shards.shard_logfile(group["logfile"], job.shard, job.shards)
+
+                if job in canaries:
+                    future = executor.submit(
+                        run_canary_eval,
+                        job.model_name,
+                        job.eval_name,
+                        max_connections=scheduler.max_connections(job),
+                        log_dir=logs_path,
+                        compression=compression,
+                        retry=retry,
+                        **canaries[job],
+                    )
+                    running[future] = job
+                    continue
+
+                future = executor.submit(
+                    run_single_eval,
+                    job.model_name,
+                    job.eval_name,
+                    job.limit,
+                    max_connections=scheduler.max_connections(job),
+                    log_dir=logs_path,
+                    logfile_name=logfile_name,
+                    sample_range=job.sample_range,
+                    retry=retry,
+                    # Shard logs are merged (and compressed) once all shards are in
+                    compression=compression if job.shards == 1 else "none",
+                )
+                running[future] = job
 
-            model_name = run_config.get("model")
-            limit = run_config.get("limit", 0)
-            evals_list = run_config.get("evals", [])
+            timeout = scheduler.wait_time(pending) if pending else None
+            if not running:
+                # Everything left is waiting on a rate limit to refill
+                time.sleep(timeout or 1)
+                continue
 
-            for eval_name in evals_list:
-                # Submit each eval to run in parallel
-                tasks.append(
-                    executor.submit(run_single_eval, model_name, eval_name, limit)
+            # Gather results as they complete
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                usage = None
+                try:
+                    usage = future.result()
+                    print(usage["message"])
+                except Exception as e:
+                    print(f"Task failed: {e}")
+                scheduler.release(job, usage)
+                telemetry.emit(
+                    "job_end",
+                    model=job.model_name,
+                    eval=job.eval_name,
+                    shard=job.shard,
+                    success=bool(usage and usage["success"]),
                 )
 
-        # Gather results as they complete
-        for future in as_completed(tasks):
-            try:
-                result = future.result()
-                print(result)
-            except Exception as e:
-                print(f"Task failed: {e}")
+                completed = finish_job(job, usage, groups, logs_path, compression)
+                if completed and completed["success"] and job not in canaries:
+                    with conn:
+                        runcache.record(conn, keys[job.base], job.base, completed["logfile"], logs_path)
@@ -0,0 +1,469 @@
+import io
+import os
+import re
+import gzip
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from functools import partial
+from contextlib import nullcontext
+from . import profiling
+
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# `evaluation.output.compression` -> suffix of the logs written with it
+SUFFIXES = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 10
+
+CHUNK_SIZE = 1 << 20
+
+# Top-level log members that hold per-sample data
+DROPPED_MEMBERS = ("samples", "reductions")
+
+# Characters of a log fed to `MemberFilter` at a time
+FILTER_CHUNK_SIZE = 1 << 16
+
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Raised for logs that are not valid (compressed) JSON, e.g. when truncated
+READ_ERRORS = (ValueError, EOFError, gzip.BadGzipFile) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def log_compression(config):
+    """Return the configured log compression, checking that it is usable."""
+    compression = config["evaluation"]["output"].get("compression") or "none"
+    if compression not in SUFFIXES:
+        raise ValueError(f"Unknown log compression {compression!r}; use one of {', '.join(SUFFIXES)}")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstd log compression needs the zstandard package")
+    return compression
+
+
+def log_suffix(path):
+    """The log suffix of a file name (e.g. `.json.gz`), or None if it is not a log."""
+    name = Path(path).name
+    for suffix in sorted(SUFFIXES.values(), key=len, reverse=True):
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_log(path):
+    return log_suffix(path) is not None
+
+
+def log_stem(path):
+    """A log's file name without its (compressed) JSON suffix."""
+    name = Path(path).name
+    return name[: -len(log_suffix(path))]
+
+
+def log_name(stem, compression="none"):
+    """File name of a log written with the given compression."""
+    return f"{stem}{SUFFIXES[compression]}"
+
+
+def iter_logs(logs_path, pattern="*"):
+    """Yield the logs in a directory (plain and compressed), sorted by name."""
+    candidates = Path(logs_path).glob(f"{pattern}.json*")
+    yield from sorted(path for path in candidates if is_log(path))
+
+
+def _zstandard():
+    if zstandard is None:
+        raise RuntimeError("Reading or writing .json.zst logs needs the zstandard package")
+    return zstandard
+
+
+def _reader(path):
+    """Binary stream of a log's decompressed bytes."""
+    suffix = log_suffix(path)
+    if suffix == SUFFIXES["gzip"]:
+        return gzip.open(path, "rb")
+    if suffix == SUFFIXES["zstd"]:
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def _writer(raw, path):
+    """Binary stream compressing into `raw` for a log named `path`."""
+    suffix = log_suffix(path)
+    if suffix == SUFFIXES["gzip"]:
+        # No name or timestamp in the header, so equal logs give equal bytes
+        return gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+    if suffix == SUFFIXES["zstd"]:
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+    return nullcontext(raw)
+
+
+def open_log(path, binary=False):
+    """Open a log for reading, decompressing it on the fly by its suffix."""
+    stream = _reader(path)
+    return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def loads(data):
+    """Parse JSON text or bytes, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN, Infinity and integers beyond 64 bits, all
+            # of which `json.dump` writes; let the standard parser have a go
+            pass
+    return json.loads(data)
+
+
+def read_log(path):
+    """Parse a plain or compressed log."""
+    with open_log(path, binary=True) as f:
+        return loads(f.read())
+
+
+class MemberFilter:
+    """Incremental JSON tokenizer that blanks out top-level members.
+
+    Text is fed in chunks and passed through unchanged, except that the
+    value of every top-level member named in ``dropped`` is replaced by
+    ``null``. Dropped values are never buffered, unless they are also named
+    in ``capture``: the elements of those (array) values are then parsed
+    one at a time and passed to ``on_item(member, element)``, so only one
+    element is held in memory.
+    """
+
+    def __init__(self, dropped=DROPPED_MEMBERS, capture=(), on_item=None):
+        self.dropped = set(dropped)
+        self.capture = set(capture)
+        self.on_item = on_item
+        self.member = None
+        # A StringIO holds the many small pieces of an element far more compactly than a list
+        self.item = io.StringIO()
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.skipping = False
+        self.key_chars = None
+        self.last_key = None
+
+    def _emit(self, out, text):
+        if not self.skipping:
+            out.append(text)
+        elif self.member is not None:
+            self.item.write(text)
+
+    def _finish_item(self):
+        text = self.item.getvalue().strip()
+        self.item = io.StringIO()
+        if text:
+            self.on_item(self.member, loads(text))
+
+    def _string_text(self, out, text):
+        self._emit(out, text)
+        if self.key_chars is not None and not self.skipping:
+            self.key_chars.append(text)
+
+    def feed(self, chunk):
+        """Consume a chunk of JSON text and return the text to keep."""
+        out = []
+        pos = 0
+        end = len(chunk)
+
+        if self.escape and end:
+            # The previous chunk ended on a backslash inside a string
+            self._string_text(out, chunk[0])
+            self.escape = False
+            pos = 1
+
+        while pos < end:
+            if self.in_string:
+                match = _STRING_SPECIAL.search(chunk, pos)
+                if not match:
+                    self._string_text(out, chunk[pos:])
+                    break
+
+                index = match.start()
+                if chunk[index] == "\\":
+                    self._string_text(out, chunk[pos : index + 2])
+                    self.escape = index + 1 >= end
+                    pos = index + 2
+                    continue
+
+                self._string_text(out, chunk[pos:index])
+                self._emit(out, '"')
+                if self.key_chars is not None:
+                    self.last_key = "".join(self.key_chars)
+                    self.key_chars = None
+                self.in_string = False
+                pos = index + 1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if not match:
+                self._emit(out, chunk[pos:])
+                break
+
+            index = match.start()
+            char = chunk[index]
+            self._emit(out, chunk[pos:index])
+            pos = index + 1
+
+            if char == '"':
+                self.in_string = True
+                self._emit(out, char)
+                if not self.skipping and self.depth == 1:
+                    self.key_chars = []
+            elif char in "{[":
+                self.depth += 1
+                if self.member is not None and self.depth == 2 and char == "[":
+                    # The captured array itself; its elements are parsed one by one
+                    self.item = io.StringIO()
+                    continue
+                self._emit(out, char)
+            elif char in "}]":
+                self.depth -= 1
+                if self.skipping and self.depth == 0:
+                    self._stop_skipping()
+                elif self.member is not None and self.depth == 1 and char == "]":
+                    self._finish_item()
+                    continue
+                self._emit(out, char)
+            elif char == ",":
+                if self.skipping and self.depth == 1:
+                    self._stop_skipping()
+                elif self.member is not None and self.depth == 2:
+                    self._finish_item()
+                    continue
+                self._emit(out, char)
+            elif char == ":":
+                self._emit(out, char)
+                if not self.skipping and self.depth == 1 and self.last_key in self.dropped:
+                    out.append(" null")
+                    self.skipping = True
+                    if self.last_key in self.capture:
+                        self.member = self.last_key
+
+        return "".join(out)
+
+    def _stop_skipping(self):
+        if self.member is not None:
+            # A captured value that was not an array, e.g. `null`
+            self._finish_item()
+        self.skipping = False
+        self.member = None
+
+
+def read_compacted(record, dropped=DROPPED_MEMBERS, chunk_size=FILTER_CHUNK_SIZE, on_item=None):
+    """Parse a log while skipping the dropped members at the tokenizer level.
+
+    If ``on_item`` is given, the elements of the dropped members are parsed
+    after all, one at a time, and passed to ``on_item(member, element)``.
+    """
+    member_filter = MemberFilter(dropped, capture=dropped if on_item else (), on_item=on_item)
+    kept = []
+    profiling.count(files_read=1, bytes_read=record.stat().st_size)
+
+    with open_log(record) as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            kept.append(member_filter.feed(chunk))
+
+    record_json = loads("".join(kept))
+    for member in dropped:
+        record_json.pop(member, None)
+
+    return record_json
+
+
+def iter_member(record, member, chunk_size=FILTER_CHUNK_SIZE):
+    """Yield the elements of a top-level array member of a log, parsing one at a time."""
+    pending = []
+    member_filter = MemberFilter((member,), capture=(member,), on_item=lambda _, element: pending.append(element))
+    profiling.count(files_read=1, bytes_read=Path(record).stat().st_size)
+
+    with open_log(record) as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            member_filter.feed(chunk)
+            yield from pending
+            pending.clear()
+
+
+def _write_atomic(path, write, encode=True):
+    """Write a log through a temporary file that is renamed into place.
+
+    Unless `encode` is off, `write` gets a stream compressing its bytes
+    according to the suffix of `path`.
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            with _writer(raw, path) if encode else nullcontext(raw) as stream:
+                write(stream)
+        os.replace(tmp_name, path)
+        profiling.count(bytes_written=path.stat().st_size)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def write_log(path, data, streams=None):
+    """Write a log atomically, compressed according to its suffix.
+
+    Plain logs are pretty-printed; compressed ones are written compactly
+    since nobody reads them without tooling anyway. `streams` maps
+    top-level array members to iterables of their elements, which are
+    written one at a time rather than held in `data`.
+    """
+    indent = 4 if log_suffix(path) == SUFFIXES["none"] else None
+    # Members are encoded as placeholder strings, which are then replaced by their elements
+    placeholders = {name: json.dumps(f"\0{name}\0") for name in streams or {}}
+
+    def write(stream):
+        text = io.TextIOWrapper(stream, encoding="utf-8")
+        if not placeholders:
+            json.dump(data, text, indent=indent, sort_keys=True, ensure_ascii=False)
+        else:
+            encoded = json.dumps(
+                {**data, **{name: f"\0{name}\0" for name in placeholders}},
+                indent=indent,
+                sort_keys=True,
+                ensure_ascii=False,
+            )
+            position = 0
+            for index, name in sorted((encoded.index(placeholder), name) for name, placeholder in placeholders.items()):
+                text.write(encoded[position:index])
+                _write_array(text, streams[name], indent)
+                position = index + len(placeholders[name])
+            text.write(encoded[position:])
+        text.flush()
+        text.detach()
+
+    _write_atomic(path, write)
+
+
+def _write_array(text, items, indent):
+    """Write an array member of a top-level object the way `json.dump` would."""
+    # Elements sit two levels deep: one indent for the member, one for the array
+    newline = "\n" + " " * (2 * indent) if indent else ""
+    text.write("[")
+    count = 0
+    for item in items:
+        encoded = json.dumps(item, indent=indent, sort_keys=True, ensure_ascii=False)
+        if count:
+            text.write("," if indent else ", ")
+        text.write(newline + encoded.replace("\n", newline) if indent else encoded)
+        count += 1
+    if indent and count:
+        text.write("\n" + " " * indent)
+    text.write("]")
+
+
+def copy_log(path, target):
+    """Copy a log, re-encoding it if `target` has another suffix.
+
+    The bytes are streamed through unchanged, so the log is never parsed.
+    """
+    path = Path(path)
+    same_suffix = log_suffix(path) == log_suffix(target)
+
+    def write(stream):
+        with open(path, "rb") if same_suffix else _reader(path) as source:
+            shutil.copyfileobj(source, stream, CHUNK_SIZE)
+
+    _write_atomic(target, write, encode=not same_suffix)
+    profiling.count(files_read=1, bytes_read=path.stat().st_size)
+
+
+def convert_log(path, compression):
+    """Re-encode a log with another compression and return its new path."""
+    path = Path(path)
+    target = path.with_name(log_name(log_stem(path), compression))
+    if target == path:
+        return path
+
+    copy_log(path, target)
+    path.unlink()
+    return target
+
+
+@profiling.traced
+def migrate_logs(config, compression=None):
+    """Rewrite every log in the logs directory with the given (or configured) compression."""
+    logs_path = config["evaluation"]["output"]["logs"]
+    compression = compression or log_compression(config)
+    max_workers = config["evaluation"].get("compat", {}).get("workers")
+
+    records = [path for path in iter_logs(logs_path) if log_suffix(path) != SUFFIXES[compression]]
+    size_before = sum(path.stat().st_size for path in records)
+
+    converted = []
+    if records:
+        # Deferred like in `compat_logs`; nothing to do is the common case
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            converted = list(executor.map(partial(convert_log, compression=compression), records))
+
+    size_after = sum(path.stat().st_size for path in converted)
+    print(
+        f"Migrated {len(converted)} logs in {logs_path} to {SUFFIXES[compression]} "
+        f"({size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB)"
+    )
+
+
+def run_name(path):
+    """Name identifying the run a log belongs to, whatever its suffix and compaction."""
+    return log_stem(path).replace("_compat", "")
+
+
+@profiling.traced
+def merge_log_dirs(config, sources):
+    """Copy the logs of several directories into the logs directory.
+
+    Meant for the logs of the slices of `benchci evaluate --shard I/N` run
+    on separate machines. Logs are written with the configured compression,
+    together with their per-sample sidecars. A run whose log is already in
+    the logs directory, or was copied from an earlier source, is skipped.
+    The run cache entries of the sources are merged as well, so that runs
+    cached by any slice are reused by the next evaluation.
+    """
+    from .runcache import merge_entries
+    from .samples import sidecar_path
+
+    logs_path = Path(config["evaluation"]["output"]["logs"])
+    compression = log_compression(config)
+    logs_path.mkdir(parents=True, exist_ok=True)
+
+    known = {run_name(path) for path in iter_logs(logs_path)}
+    copied = 0
+    duplicates = 0
+    for source_dir in sources:
+        for path in iter_logs(source_dir):
+            name = run_name(path)
+            if name in known:
+                duplicates += 1
+                continue
+
+            target = logs_path / log_name(log_stem(path), compression)
+            copy_log(path, target)
+            sidecar = sidecar_path(path)
+            if sidecar.exists():
+                shutil.copyfile(sidecar, sidecar_path(target))
+            known.add(name)
+            copied += 1
+        merge_entries(source_dir, logs_path)
+
+    print(f"Merged {copied} logs into {logs_path} ({duplicates} duplicates skipped)")
@@ -0,0 +1,36 @@
+import os
+from collections import deque
+
+
+# Logs worth starting worker processes for; fewer are handled in-process
+MIN_PARALLEL = 4
+
+
+def imap(func, *iterables, max_workers=None, in_flight=None, min_parallel=MIN_PARALLEL):
+    """Yield `func` applied to the items of the iterables, in order, from a process pool.
+
+    Unlike `Executor.map`, at most `in_flight` calls (twice the workers by
+    default) are queued at a time, so neither the queued arguments nor the
+    finished results pile up when the caller consumes them more slowly than
+    the workers produce them. With fewer than `min_parallel` items, or a
+    single worker, everything runs in-process and no pool is started.
+    """
+    items = list(zip(*iterables))
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(items) < min_parallel:
+        for args in items:
+            yield func(*args)
+        return
+
+    # multiprocessing is only worth importing when there is work to do
+    from concurrent.futures import ProcessPoolExecutor
+
+    in_flight = in_flight or 2 * max_workers
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        pending = deque()
+        for args in items:
+            if len(pending) >= in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, *args))
+        while pending:
+            yield pending.popleft().result()
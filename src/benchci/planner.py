@@ -0,0 +1,194 @@
+import heapq
+import hashlib
+from dataclasses import dataclass
+
+
+# Seconds assumed for a job nothing is known about, not even its eval
+DEFAULT_SECONDS = 600.0
+
+
+@dataclass
+class Plan:
+    """Jobs in the order they are started and the schedule it predicts.
+
+    `workers` holds the jobs each worker is expected to run, `estimates`
+    the predicted seconds of every job and `sources` what each estimate
+    is based on.
+    """
+
+    order: list
+    estimates: dict
+    sources: dict
+    workers: list
+    makespan: float
+    config_makespan: float
+
+
+class DurationModel:
+    """Estimates how long a job takes from the durations of earlier runs.
+
+    In order of preference a (model, eval) job is estimated from:
+
+        history:  the mean duration of its earlier successful runs
+        tokens:   its mean token usage (or, if the model never ran the
+                  eval, the eval's mean over other models) times the
+                  model's seconds per token (or that of all models)
+        eval:     the eval's mean duration on other models
+        default:  `DEFAULT_SECONDS`
+
+    Shards are assumed to take their share of the whole eval.
+    """
+
+    def __init__(self, durations, default=DEFAULT_SECONDS):
+        self.default = default
+        pairs = {}
+        evals = {}
+        model_rates = {}
+        eval_tokens = {}
+        for model, eval_name, seconds, tokens in durations:
+            pairs.setdefault((model, eval_name), []).append((seconds, tokens))
+            evals.setdefault(eval_name, []).append(seconds)
+            if tokens:
+                rate = model_rates.setdefault(model, [0.0, 0])
+                rate[0] += seconds
+                rate[1] += tokens
+                eval_tokens.setdefault(eval_name, []).append(tokens)
+
+        self.pair_seconds = {pair: _mean([seconds for seconds, _ in runs]) for pair, runs in pairs.items()}
+        self.pair_tokens = {
+            pair: _mean([tokens for _, tokens in runs if tokens]) for pair, runs in pairs.items()
+        }
+        self.eval_seconds = {eval_name: _mean(seconds) for eval_name, seconds in evals.items()}
+        self.eval_tokens = {eval_name: _mean(tokens) for eval_name, tokens in eval_tokens.items()}
+        self.model_rates = {model: seconds / tokens for model, (seconds, tokens) in model_rates.items()}
+
+        total_seconds = sum(seconds for seconds, _ in model_rates.values())
+        total_tokens = sum(tokens for _, tokens in model_rates.values())
+        self.rate = total_seconds / total_tokens if total_tokens else None
+
+    def estimate(self, job, tokens=None):
+        """Return `(seconds, source)` for a job.
+
+        `tokens` is the job's expected token usage if known from elsewhere
+        (e.g. the scheduler's usage estimates).
+        """
+        pair = (job.model_name, job.eval_name)
+        seconds, source = self._estimate_whole(pair, tokens)
+        return seconds / job.shards, source
+
+    def _estimate_whole(self, pair, tokens):
+        if self.pair_seconds.get(pair):
+            return self.pair_seconds[pair], "history"
+
+        model, eval_name = pair
+        tokens = self.pair_tokens.get(pair) or tokens or self.eval_tokens.get(eval_name)
+        rate = self.model_rates.get(model, self.rate)
+        if tokens and rate:
+            return tokens * rate, "tokens"
+
+        if self.eval_seconds.get(eval_name):
+            return self.eval_seconds[eval_name], "eval"
+
+        return self.default, "default"
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def pack(jobs, estimates, max_workers):
+    """Assign jobs, in order, to whichever worker frees up first.
+
+    This is how a pool that starts the next job whenever a worker is idle
+    behaves. Returns the jobs of every worker and the predicted makespan.
+    """
+    workers = [[] for _ in range(max(1, max_workers))]
+    loads = [(0.0, index) for index in range(len(workers))]
+    for job in jobs:
+        load, index = heapq.heappop(loads)
+        workers[index].append(job)
+        heapq.heappush(loads, (load + estimates[job], index))
+    return workers, max(load for load, _ in loads)
+
+
+def plan_jobs(jobs, model, max_workers, tokens=None):
+    """Order jobs longest first and bin-pack them across the workers.
+
+    Starting the longest jobs first (LPT) keeps a long eval on a slow model
+    from starting last and leaving every other worker idle at the end; its
+    makespan is within 4/3 of the optimum. `tokens` maps (model, eval) to
+    expected token usage for jobs without a run history of their own.
+    """
+    tokens = tokens or {}
+    estimates = {}
+    sources = {}
+    for job in jobs:
+        estimates[job], sources[job] = model.estimate(job, tokens.get((job.model_name, job.eval_name)))
+
+    # Stable, so equally long jobs keep their config order
+    order = sorted(jobs, key=lambda job: -estimates[job])
+    workers, makespan = pack(order, estimates, max_workers)
+    _, config_makespan = pack(jobs, estimates, max_workers)
+
+    return Plan(order, estimates, sources, workers, makespan, config_makespan)
+
+
+def parse_slice(text):
+    """Parse `I/N` (1-based) into `(index, count)` with a 0-based index."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Expected a slice like 1/4, got {text!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Slice {text} is out of range; expected I/N with 1 <= I <= N")
+    return index - 1, count
+
+
+def partition_jobs(jobs, model, count, tokens=None):
+    """Split jobs into `count` slices of about equal expected duration.
+
+    Jobs are dealt longest first to the slice with the least work so far,
+    with ties broken by run, model and eval, so every machine computes the
+    same partition from the same config and run history. Returns the slices
+    (in config order), a short digest of the partition, which matches
+    across machines that agree on it, and the estimate of every job.
+    """
+    tokens = tokens or {}
+    estimates = {
+        job: model.estimate(job, tokens.get((job.model_name, job.eval_name)))[0] for job in jobs
+    }
+    order = sorted(jobs, key=lambda job: (-estimates[job], job.run_name, job.model_name, job.eval_name))
+    slices, _ = pack(order, estimates, count)
+
+    positions = {job: position for position, job in enumerate(jobs)}
+    slices = [sorted(jobs_slice, key=positions.get) for jobs_slice in slices]
+    layout = "\n".join(
+        sorted(f"{index}\t{job.run_name}\t{job.eval_name}" for index, jobs_slice in enumerate(slices) for job in jobs_slice)
+    )
+    digest = hashlib.sha256(layout.encode("utf-8")).hexdigest()[:12]
+    return slices, digest, estimates
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def print_plan(plan, verbose=False):
+    """Print the predicted makespan and, if `verbose`, every worker's jobs."""
+    if verbose:
+        for index, jobs in enumerate(plan.workers):
+            total = sum(plan.estimates[job] for job in jobs)
+            print(f"Worker {index + 1} ({format_duration(total)}):")
+            for job in jobs:
+                shard = f" [shard {job.shard + 1}/{job.shards}]" if job.shards > 1 else ""
+                print(
+                    f"  {format_duration(plan.estimates[job]):>10}  {job.eval_name} on {job.model_name}"
+                    f"{shard} ({plan.sources[job]})"
+                )
+
+    print(
+        f"Planned {len(plan.order)} jobs on {len(plan.workers)} workers: predicted makespan "
+        f"{format_duration(plan.makespan)} (config order: {format_duration(plan.config_makespan)})"
+    )
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import threading
+import functools
+from pathlib import Path
+from contextlib import contextmanager
+
+
+# Set while profiling so worker processes (fork or spawn) record their
+# spans into this directory, one JSON-lines file per process
+PROFILE_DIR_ENV = "BENCHCI_PROFILE_DIR"
+
+COUNTERS = ("files_read", "bytes_read", "bytes_written")
+
+
+class Tracer:
+    """Collects finished spans as Chrome trace events."""
+
+    def __init__(self, spool_dir, owner=None):
+        self.spool_dir = Path(spool_dir)
+        self.owner = owner
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def record(self, event):
+        if os.getpid() == self.owner:
+            with self.lock:
+                self.events.append(event)
+            return
+        # Worker process: hand the event to the parent through the spool
+        spool = self.spool_dir / f"{os.getpid()}.jsonl"
+        with spool.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+
+    def collect(self):
+        """Events of this process and of every worker process."""
+        events = list(self.events)
+        for spool in sorted(self.spool_dir.glob("*.jsonl")):
+            with spool.open("r", encoding="utf-8") as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+        return sorted(events, key=lambda event: event["ts"])
+
+
+_tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def enable(spool_dir=None):
+    """Start recording spans (and tracing allocations) in this process."""
+    # Imported here, not at the top: every command imports this module for `traced`
+    import tempfile
+    import tracemalloc
+
+    global _tracer
+    if _tracer is not None:
+        return
+    if spool_dir is None:
+        spool_dir = tempfile.mkdtemp(prefix="benchci-profile-")
+        os.environ[PROFILE_DIR_ENV] = spool_dir
+        _tracer = Tracer(spool_dir, owner=os.getpid())
+    else:
+        # A worker process; it always spools its events
+        _tracer = Tracer(spool_dir)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def read_io():
+    """Bytes read and written by this process at the syscall level, if known."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+@contextmanager
+def span(name, **args):
+    """Time a stage: wall and CPU time, peak traced memory and I/O counters.
+
+    Spans nest per thread; counters added with `count` and the peak memory
+    of a span include those of its children. A no-op unless enabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+
+    import tracemalloc
+
+    stack = tracer.stack()
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+
+    frame = {"peak": current, "counters": dict.fromkeys(COUNTERS, 0)}
+    stack.append(frame)
+    io_start = read_io()
+    cpu_start = time.thread_time()
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        cpu = time.thread_time() - cpu_start
+        io_end = read_io()
+        frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent["peak"] = max(parent["peak"], frame["peak"])
+            for key, value in frame["counters"].items():
+                parent["counters"][key] += value
+        tracemalloc.reset_peak()
+
+        details = {
+            **args,
+            "cpu_ms": round(cpu * 1000, 3),
+            "peak_memory_bytes": frame["peak"] - current,
+            **frame["counters"],
+        }
+        if io_start and io_end:
+            details["io_read_bytes"] = io_end[0] - io_start[0]
+            details["io_write_bytes"] = io_end[1] - io_start[1]
+
+        tracer.record(
+            {
+                "name": name,
+                "cat": "benchci",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": details,
+            }
+        )
+
+
+def traced(func):
+    """Run every call of `func` in a span named after it."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _tracer is None:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def count(**counters):
+    """Add to the I/O counters of the current thread's innermost span."""
+    if _tracer is None:
+        return
+    stack = _tracer.stack()
+    if stack:
+        for key, value in counters.items():
+            stack[-1]["counters"][key] += value
+
+
+def write_trace(output_path):
+    """Write the recorded spans as a Chrome trace and print a summary."""
+    import shutil
+
+    events = _tracer.collect()
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    totals = {}
+    for event in events:
+        total = totals.setdefault(event["name"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+        total["calls"] += 1
+        total["wall_ms"] += event["dur"] / 1000
+        total["cpu_ms"] += event["args"]["cpu_ms"]
+
+    print(f"{'stage':<40} {'calls':>6} {'wall ms':>10} {'cpu ms':>10}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall_ms"])[:20]:
+        print(f"{name:<40} {total['calls']:>6} {total['wall_ms']:>10.1f} {total['cpu_ms']:>10.1f}")
+    print(f"Profile written to {output_path} (open it in chrome://tracing or Perfetto)")
+
+    shutil.rmtree(_tracer.spool_dir, ignore_errors=True)
+
+
+# Worker processes started by a profiled parent record their spans too
+if os.environ.get(PROFILE_DIR_ENV) and _tracer is None:
+    enable(os.environ[PROFILE_DIR_ENV])
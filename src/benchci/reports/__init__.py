@@ -1,16 +1,57 @@
 # ruff: noqa
 # fmt: off
-from . import spider
-from .spider import build_spider_chart
-from .charts import build_charts
-from .pages import build_pages
+import importlib
+
+
+# Imported on first access; see `benchci.__getattr__`
+_LAZY = {
+    "aggregate":          (".aggregate", None),
+    "build":              (".build", None),
+    "build_all":          (".build", "build_all"),
+    "datafiles":          (".datafiles", None),
+    "graph":              (".graph", None),
+    "spider":             (".spider", None),
+    "build_spider_chart": (".spider", "build_spider_chart"),
+    "charts":             (".charts", None),
+    "build_charts":       (".charts", "build_charts"),
+    "history":            (".history", None),
+    "trends":             (".trends", None),
+    "build_trends":       (".trends", "build_trends"),
+    "pages":              (".pages", None),
+    "build_pages":        (".pages", "build_pages"),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attribute = _LAZY[name]
+    value = importlib.import_module(module_name, __name__)
+    if attribute:
+        value = getattr(value, attribute)
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
 
 __all__ = [
+    "aggregate",
+    "build",
+        "build_all",
+    "datafiles",
+    "graph",
     "spider",
         "build_spider_chart",
     "charts",
         "build_charts",
+    "history",
+    "trends",
+        "build_trends",
     "pages",
         "build_pages",
 ]
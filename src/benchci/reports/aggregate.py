@@ -0,0 +1,95 @@
+import numpy as np
+from dataclasses import dataclass
+from .. import profiling
+
+
+@dataclass
+class ScoreMatrix:
+    """Dense model x eval matrix of aggregated scores.
+
+    Rows follow `models` and columns follow `evals`, both sorted. Cells
+    without any valid score have a count of 0 and NaN statistics.
+    """
+
+    models: list
+    evals: list
+    mean: np.ndarray
+    count: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+    @property
+    def present(self):
+        """Boolean mask of cells with at least one score."""
+        return self.count > 0
+
+    def model_index(self):
+        """Map each model label to its row."""
+        return {model: row for row, model in enumerate(self.models)}
+
+    def eval_index(self):
+        """Map each eval label to its column."""
+        return {eval_name: column for column, eval_name in enumerate(self.evals)}
+
+
+def item_runs(item):
+    """Number of runs a database entry stands for."""
+    return (item.get("additional_metrics") or {}).get("runs", 1)
+
+
+@profiling.traced
+def build_score_matrix(data):
+    """Aggregate database entries into a `ScoreMatrix` in a single pass.
+
+    Roll-ups of old runs count as the number of runs they stand for.
+    """
+    valid = [
+        (item["model"], item["eval_name"], item["score"], item_runs(item))
+        for item in data
+        if item.get("score") != "Error"
+        and item.get("model") is not None
+        and item.get("eval_name") is not None
+    ]
+
+    if not valid:
+        empty = np.empty((0, 0))
+        return ScoreMatrix([], [], empty, empty.astype(int), empty, empty)
+
+    model_labels, eval_labels, scores, runs = zip(*valid)
+    models, model_rows = np.unique(np.array(model_labels, dtype=object), return_inverse=True)
+    evals, eval_columns = np.unique(np.array(eval_labels, dtype=object), return_inverse=True)
+    scores = np.asarray(scores, dtype=float)
+    runs = np.asarray(runs, dtype=float)
+
+    shape = (len(models), len(evals))
+    cells = np.ravel_multi_index((model_rows, eval_columns), shape)
+    size = shape[0] * shape[1]
+
+    count = np.bincount(cells, weights=runs, minlength=size).astype(int)
+    total = np.bincount(cells, weights=scores * runs, minlength=size)
+
+    minimum = np.full(size, np.inf)
+    maximum = np.full(size, -np.inf)
+    np.minimum.at(minimum, cells, scores)
+    np.maximum.at(maximum, cells, scores)
+
+    missing = count == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    mean[missing] = np.nan
+    minimum[missing] = np.nan
+    maximum[missing] = np.nan
+
+    print(
+        f"Aggregated {len(valid)} valid entries into "
+        f"{shape[0]} models x {shape[1]} evaluation tasks"
+    )
+
+    return ScoreMatrix(
+        models=models.tolist(),
+        evals=evals.tolist(),
+        mean=mean.reshape(shape),
+        count=count.reshape(shape),
+        minimum=minimum.reshape(shape),
+        maximum=maximum.reshape(shape),
+    )
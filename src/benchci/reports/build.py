@@ -0,0 +1,151 @@
+from functools import partial
+from .. import store, profiling
+from . import pages, charts, spider, trends, datafiles
+from ..compat import compat_logs
+from .graph import BuildGraph, hash_data
+
+
+@profiling.traced
+def ingest_and_query(config):
+    """Ingest new or changed logs and query the report data.
+
+    Returns `(parsed, data, report_data)`: the number of logs parsed, every
+    result, and the results the charts are built from.
+    """
+    logs_path = config["evaluation"]["output"]["logs"]
+
+    conn = store.connect(store.get_store_path(config))
+    try:
+        with conn:
+            parsed = pages.ingest_logs(logs_path, conn, pages.ingest_workers(config))
+        data = store.query_results(conn)
+
+        # Only query again when the charts are filtered differently
+        filters = store.report_filters(config)
+        report_data = store.query_results(conn, **filters) if filters else data
+    finally:
+        conn.close()
+
+    return parsed, data, report_data
+
+
+@profiling.traced
+def write_reports(config, data, report_data):
+    """Build the out-of-date report artifacts and return those that changed."""
+    from .aggregate import build_score_matrix
+
+    reports_path = config["evaluation"]["output"]["reports"]
+    report_config = config["evaluation"].get("reports", {})
+    shard_rows = report_config.get("shard_rows", datafiles.SHARD_ROWS)
+    page_size = report_config.get("page_size", pages.PAGE_SIZE)
+    data_hash = hash_data(data)
+
+    graph = BuildGraph(reports_path)
+    graph.add(
+        "database.json",
+        partial(pages.save_to_json_file, data, reports_path),
+        inputs=data_hash,
+    )
+    graph.add(
+        "data/index.json",
+        partial(datafiles.write_data_files, data, reports_path, shard_rows),
+        inputs=[data_hash, shard_rows],
+        complete=partial(datafiles.shards_present, reports_path),
+    )
+    graph.add(
+        "index.html",
+        partial(pages.generate_html_page, reports_path, page_size),
+        inputs=page_size,
+        templates=["report_html.j2", "live_updates.j2"],
+    )
+    graph.add(
+        "report.css",
+        partial(pages.generate_css, reports_path),
+        templates=["report_css.j2"],
+    )
+
+    matrix = build_score_matrix(report_data)
+
+    labels, datasets = charts.prepare_chart_data(matrix)
+    if labels and datasets:
+        graph.add(
+            charts.CHART_DATA,
+            partial(charts.generate_chart_data, labels, datasets, reports_path),
+            inputs=[labels, datasets],
+        )
+        graph.add(
+            "chart.html",
+            partial(charts.generate_chart_html, labels, datasets, reports_path),
+            inputs=[labels, datasets],
+            templates=["chart_html.j2", "live_updates.j2"],
+        )
+    else:
+        print("No valid data to display in charts.")
+
+    labels, datasets = spider.prepare_spider_chart_data(matrix)
+    if labels and datasets:
+        graph.add(
+            spider.SPIDER_DATA,
+            partial(spider.generate_spider_chart_data, labels, datasets, reports_path),
+            inputs=[labels, datasets],
+        )
+        graph.add(
+            "spider_chart.html",
+            partial(spider.generate_spider_chart_html, labels, datasets, reports_path),
+            inputs=[labels, datasets],
+            templates=["spider_chart.j2", "live_updates.j2"],
+        )
+    else:
+        print("No valid data to display in the spider chart.")
+
+    # Trends are drawn from every run, whatever the chart filters are
+    options = trends.history_options(config)
+    window = options.pop("window", None)
+    trend_data = trends.prepare_trend_data(data, window, **options)
+    trends.report_regressions(trend_data)
+    graph.add(
+        trends.TRENDS_DATA,
+        partial(trends.generate_trend_data, trend_data, reports_path),
+        inputs=trend_data,
+    )
+    graph.add(
+        "trends.html",
+        partial(trends.generate_trends_html, reports_path, window),
+        inputs=window,
+        templates=["trends_html.j2", "live_updates.j2"],
+    )
+
+    conn = store.connect(store.get_store_path(config))
+    try:
+        with conn:
+            return graph.run(conn, report_config.get("workers"))
+    finally:
+        conn.close()
+
+
+@profiling.traced
+def refresh_reports(config):
+    """Pick up new logs and rebuild only the artifacts they affect."""
+    compat_logs(config)
+
+    parsed, data, report_data = ingest_and_query(config)
+    if not parsed or not data:
+        return []
+
+    return write_reports(config, data, report_data)
+
+
+@profiling.traced
+def build_all(config):
+    """Compact logs, ingest them once and emit every report artifact."""
+    compat_logs(config)
+
+    _, data, report_data = ingest_and_query(config)
+
+    if not data:
+        print("No data found to generate a report.")
+        return
+
+    write_reports(config, data, report_data)
+
+    print("Build process completed successfully!")
@@ -1,138 +1,88 @@
 import json
-from jinja2 import Template
 from pathlib import Path
+from .. import store, profiling
+from .graph import render_template, write_if_changed
 
 
-def load_database_file(database_path):
-    """Load the database JSON file containing model evaluation data."""
-    try:
-        with open(database_path, "r") as f:
-            data = json.load(f)
-        print(f"Loaded {len(data)} records from database")
-        return data
-    except FileNotFoundError:
-        print(f"Database file not found at {database_path}")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        return []
+# Where the chart page reloads its data from on live updates, relative to the reports
+CHART_DATA = "data/chart.json"
 
-
-def prepare_chart_data(data):
-    """Prepare data for the chart visualization."""
-    if not data:
+@profiling.traced
+def prepare_chart_data(matrix):
+    """Prepare data for the chart visualization from a `ScoreMatrix`."""
+    if not matrix.models:
         return [], []
 
-    # Group data by model and eval_name for comparison
-    model_scores = {}
-    models = set()
-    evals = set()
-
-    print("Processing data entries...")
-    entry_count = 0
-
-    for item in data:
-        model = item.get("model", "Unknown Model")
-        eval_name = item.get("eval_name", "Unknown Eval")
-        score = item.get("score", 0)
-
-        # Skip error entries
-        if score == "Error":
-            print(f"Skipping error entry for model {model}, eval {eval_name}")
-            continue
-
-        entry_count += 1
-        models.add(model)
-        evals.add(eval_name)
-
-        if model not in model_scores:
-            model_scores[model] = {}
-
-        if eval_name not in model_scores[model]:
-            model_scores[model][eval_name] = []
-
-        model_scores[model][eval_name].append(score)
-
-    print(f"Processed {entry_count} valid entries")
-    print(f"Found {len(models)} unique models and {len(evals)} unique evaluation tasks")
-
-    # Show detailed breakdown
-    for model in model_scores:
-        for eval_name in model_scores[model]:
-            scores = model_scores[model][eval_name]
-            if len(scores) > 1:
-                avg_score = sum(scores) / len(scores)
-                print(
-                    f"Model {model} on {eval_name}: {len(scores)} tests, scores={scores}, avg={avg_score:.4f}"
-                )
-            elif len(scores) == 1:
-                print(f"Model {model} on {eval_name}: 1 test, score={scores[0]}")
-
-    # Prepare chart data
-    chart_labels = sorted(list(models))
-    eval_names = sorted(list(evals))
-
-    # For each eval, create a dataset
+    # For each eval, create a dataset. Multiple scores for the same
+    # model/eval combination are averaged by the matrix.
     datasets = []
-    for eval_name in eval_names:
-        scores = []
-        for model in chart_labels:
-            if model in model_scores and eval_name in model_scores[model]:
-                model_scores_list = model_scores[model][eval_name]
-                # Average multiple scores for the same model/eval combination
-                avg_score = sum(model_scores_list) / len(model_scores_list)
-                scores.append(round(avg_score, 4))
-                if len(model_scores_list) > 1:
-                    print(
-                        f"Averaging {len(model_scores_list)} scores for {model} on {eval_name}: {avg_score:.4f}"
-                    )
-            else:
-                scores.append(0)
+    for column, eval_name in enumerate(matrix.evals):
+        scores = [
+            round(mean, 4) if present else 0
+            for mean, present in zip(
+                matrix.mean[:, column].tolist(), matrix.present[:, column].tolist()
+            )
+        ]
         datasets.append({"label": eval_name, "data": scores, "borderWidth": 1})
 
-    return chart_labels, datasets
+    return list(matrix.models), datasets
 
 
+@profiling.traced
 def generate_chart_html(labels, datasets, outputs_path="reports"):
     """Generate an HTML file with interactive charts using Chart.js."""
     # Convert data to JSON for JavaScript
     labels_json = json.dumps(labels)
     datasets_json = json.dumps(datasets)
 
-    template_path = Path(__file__).parent / "templates/chart_html.j2"
-    html_template = Template(template_path.read_text(encoding="utf-8"))
-
-    html_rendered = html_template.render(
+    html_rendered = render_template(
+        "chart_html.j2",
         labels_json=labels_json,
         datasets_json=datasets_json,
+        data_url=CHART_DATA,
     )
 
     output_path = Path(f"{outputs_path}/chart.html")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html_rendered, encoding="utf-8")
+    written = write_if_changed(output_path, html_rendered)
+    if written:
+        print(f"Chart HTML saved to {output_path}")
+    return written
 
-    print(f"Chart HTML saved to {output_path}")
 
+@profiling.traced
+def generate_chart_data(labels, datasets, outputs_path="reports"):
+    """Write the chart data loaded by the chart page on live updates."""
+    output_path = Path(outputs_path) / CHART_DATA
+    written = write_if_changed(output_path, json.dumps({"labels": labels, "datasets": datasets}, separators=(",", ":")))
+    if written:
+        print(f"Chart data saved to {output_path}")
+    return written
 
+
+@profiling.traced
 def build_charts(config):
     """Main function to generate the performance charts."""
+    # Deferred so that starting the CLI does not import numpy
+    from .aggregate import build_score_matrix
+
     reports_path = config["evaluation"]["output"]["reports"]
 
-    # Load data from database
-    data = load_database_file(str(Path(reports_path) / "database.json"))
+    # Load data from the results store
+    data = store.load_results(config)
 
     if not data:
         print("No data available to generate charts.")
         return
 
     # Prepare chart data
-    labels, datasets = prepare_chart_data(data)
+    labels, datasets = prepare_chart_data(build_score_matrix(data))
 
     if not labels or not datasets:
         print("No valid data to display in charts.")
         return
 
     # Generate the HTML chart
+    generate_chart_data(labels, datasets, reports_path)
     generate_chart_html(labels, datasets, reports_path)
 
     print("Chart generation completed successfully!")
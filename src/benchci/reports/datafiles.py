@@ -0,0 +1,125 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+from .. import profiling
+from .graph import write_if_changed
+
+
+# Rows per data shard; bounds the size of every file the report page fetches
+SHARD_ROWS = 500
+
+# Per-row columns of a shard, in order
+COLUMNS = (
+    "timestamp",
+    "eval",
+    "score",
+    "total_tokens",
+    "total_input_tokens",
+    "total_output_tokens",
+    "additional_metrics",
+)
+
+
+def slugify(name):
+    """Filesystem-safe version of a model name."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "model"
+
+
+def to_columns(rows):
+    """Lay out database entries column by column.
+
+    Eval names are stored as indexes into the shard's own `evals` list (so
+    a shard does not change when other evals appear), errored scores as
+    null and empty metric dicts as null.
+    """
+    evals = sorted({row["eval_name"] for row in rows})
+    eval_index = {eval_name: i for i, eval_name in enumerate(evals)}
+
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        columns["timestamp"].append(row["timestamp"])
+        columns["eval"].append(eval_index[row["eval_name"]])
+        columns["score"].append(None if row["score"] == "Error" else row["score"])
+        columns["total_tokens"].append(row["total_tokens"])
+        columns["total_input_tokens"].append(row["total_input_tokens"])
+        columns["total_output_tokens"].append(row["total_output_tokens"])
+        columns["additional_metrics"].append(row["additional_metrics"] or None)
+    return evals, columns
+
+
+def build_data_files(data, shard_rows=SHARD_ROWS):
+    """Split database entries into an index and per-model columnar shards.
+
+    Returns `(index, shards)` where `shards` maps file names (relative to
+    the data directory) to their content. Shard names carry a content hash,
+    so a shard's URL only ever refers to one version of it.
+    """
+    by_model = {}
+    for row in data:
+        row = {**row, "model": str(row["model"]), "eval_name": str(row["eval_name"])}
+        by_model.setdefault(row["model"], []).append(row)
+
+    index = {
+        "version": 1,
+        "total": len(data),
+        "models": sorted(by_model),
+        "evals": sorted({str(row["eval_name"]) for row in data}),
+        "shards": [],
+    }
+    shards = {}
+    for model in index["models"]:
+        rows = by_model[model]
+        for start in range(0, len(rows), shard_rows):
+            evals, columns = to_columns(rows[start:start + shard_rows])
+            content = json.dumps(
+                {"model": model, "evals": evals, "columns": columns},
+                separators=(",", ":"),
+            )
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+            name = f"shards/{slugify(model)}-{digest}.json"
+            shards[name] = content
+            index["shards"].append({"file": name, "model": model, "rows": len(columns["eval"])})
+
+    return index, shards
+
+
+def shards_present(reports_path):
+    """Whether the data index exists and every shard it lists does too."""
+    data_path = Path(reports_path) / "data"
+    try:
+        index = json.loads((data_path / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return all((data_path / shard["file"]).exists() for shard in index["shards"])
+
+
+@profiling.traced
+def write_data_files(data, reports_path, shard_rows=SHARD_ROWS):
+    """Write the data index and any new shards, removing stale shards."""
+    data_path = Path(reports_path) / "data"
+    (data_path / "shards").mkdir(parents=True, exist_ok=True)
+
+    index, shards = build_data_files(data, shard_rows)
+
+    written = 0
+    for name, content in shards.items():
+        shard_path = data_path / name
+        # The name is derived from the content, so an existing file is current
+        if not shard_path.exists():
+            shard_path.write_text(content, encoding="utf-8")
+            profiling.count(bytes_written=len(content))
+            written += 1
+
+    index_path = data_path / "index.json"
+    index_written = write_if_changed(index_path, json.dumps(index, separators=(",", ":")))
+
+    for shard_path in (data_path / "shards").glob("*.json"):
+        if f"shards/{shard_path.name}" not in shards:
+            shard_path.unlink()
+            for variant in shard_path.parent.glob(f"{shard_path.name}.*"):
+                variant.unlink()
+
+    if index_written or written:
+        print(f"Data index saved to {index_path} ({len(shards)} shards, {written} written)")
+    return index_written or written > 0
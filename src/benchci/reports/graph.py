@@ -0,0 +1,117 @@
+import json
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from .. import store, profiling
+
+
+TEMPLATES_PATH = Path(__file__).parent / "templates"
+
+
+@lru_cache(maxsize=None)
+def get_environment():
+    """Shared Jinja environment; compiled templates are cached on disk."""
+    # Imported on first render; jinja2 and importlib.metadata dominate the
+    # startup time of commands that end up not rendering anything
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATES_PATH)),
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+
+
+def render_template(name, **context):
+    """Render one of the report templates."""
+    return get_environment().get_template(name).render(**context)
+
+
+def write_if_changed(path, text):
+    """Write `text` unless the file already holds exactly these bytes.
+
+    Returns whether the file was written; unchanged files keep their mtime.
+    """
+    path = Path(path)
+    data = text.encode("utf-8")
+    if path.is_file() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    profiling.count(bytes_written=len(data))
+    return True
+
+
+@lru_cache(maxsize=None)
+def package_version():
+    from importlib import metadata
+
+    try:
+        return metadata.version("benchci")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def hash_data(value):
+    """Stable hash of JSON-serializable build inputs."""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def input_digest(templates, inputs):
+    """Digest of everything an artifact is rendered from."""
+    digest = hashlib.sha256(package_version().encode("utf-8"))
+    for name in templates:
+        digest.update(name.encode("utf-8"))
+        digest.update(hashlib.sha256((TEMPLATES_PATH / name).read_bytes()).digest())
+    digest.update(hash_data(inputs).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildGraph:
+    """The report artifacts and the inputs each of them is built from.
+
+    An artifact is rebuilt when its output is missing or the digest of its
+    inputs (templates, data and package version) differs from the one
+    recorded in the results store by its last build. Builders return whether
+    they changed their output. An artifact made of several files can pass
+    `complete`, which checks that all of them exist, in place of checking
+    for its output file alone.
+    """
+
+    def __init__(self, reports_path):
+        self.reports_path = Path(reports_path)
+        self.artifacts = []
+
+    def add(self, name, build, inputs=None, templates=(), complete=None):
+        complete = complete or (self.reports_path / name).exists
+        self.artifacts.append((name, build, input_digest(templates, inputs), complete))
+
+    @profiling.traced
+    def run(self, conn, max_workers=None):
+        """Build the out-of-date artifacts in parallel.
+
+        Returns the names of the artifacts whose output changed.
+        """
+        # Imported here; concurrent.futures (and logging) slow down every command's start
+        from concurrent.futures import ThreadPoolExecutor
+
+        built = store.load_build_manifest(conn)
+        stale = [
+            (name, build, digest)
+            for name, build, digest, complete in self.artifacts
+            if built.get(name) != digest or not complete()
+        ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            changed = list(executor.map(lambda artifact: artifact[1](), stale))
+
+        for name, _, digest in stale:
+            store.record_build(conn, name, digest)
+
+        written = [name for (name, _, _), was_written in zip(stale, changed) if was_written]
+        print(
+            f"Built {len(stale)} report artifacts ({len(written)} changed, "
+            f"{len(self.artifacts) - len(stale)} up to date)"
+        )
+        return written
@@ -0,0 +1,179 @@
+import numpy as np
+from dataclasses import dataclass
+from .. import store, profiling
+
+
+# Runs averaged by the rolling mean drawn on the trend page
+WINDOW = 5
+
+# A change point needs at least this many runs on either side
+MIN_RUNS = 2
+
+# Shifts smaller than this (in score units) are never flagged
+MIN_SHIFT = 0.02
+
+# Flag shifts whose two-sample statistic is at least this large
+THRESHOLD = 3.0
+
+# Lower bound on the run-to-run noise, so that a few identical scores do not
+# make every later change look infinitely significant
+NOISE_FLOOR = 0.01
+
+
+@dataclass
+class History:
+    """Score time series of every (model, eval) pair, padded to a matrix.
+
+    Row `i` holds the runs of `keys[i]` in time order in its first
+    `lengths[i]` columns; the remaining cells are NaN.
+    """
+
+    keys: list
+    times: np.ndarray
+    scores: np.ndarray
+    lengths: np.ndarray
+
+    @property
+    def present(self):
+        """Boolean mask of the cells holding a run."""
+        return np.arange(self.scores.shape[1]) < self.lengths[:, None]
+
+
+@dataclass
+class ChangePoints:
+    """The most significant mean shift of every series.
+
+    `index` is the first run after the shift (0 when a series has too few
+    runs to test), `before` and `after` the mean scores on either side.
+    """
+
+    index: np.ndarray
+    before: np.ndarray
+    after: np.ndarray
+    statistic: np.ndarray
+    flagged: np.ndarray
+
+    @property
+    def shift(self):
+        return self.after - self.before
+
+    @property
+    def regression(self):
+        """Flagged shifts towards lower scores."""
+        return self.flagged & (self.shift < 0)
+
+
+@profiling.traced
+def build_history(data):
+    """Group database entries into per-(model, eval) series in one pass."""
+    valid = [
+        (item["model"], item["eval_name"], created_at, item["score"])
+        for item in data
+        if item.get("score") != "Error"
+        and item.get("model") is not None
+        and item.get("eval_name") is not None
+        and (created_at := store.parse_created_at(item.get("timestamp"))) is not None
+    ]
+
+    if not valid:
+        empty = np.empty((0, 0))
+        return History([], empty, empty, np.zeros(0, dtype=int))
+
+    model_labels, eval_labels, times, scores = zip(*valid)
+    models, model_rows = np.unique(np.array(model_labels, dtype=object), return_inverse=True)
+    evals, eval_columns = np.unique(np.array(eval_labels, dtype=object), return_inverse=True)
+    codes, series = np.unique(model_rows * len(evals) + eval_columns, return_inverse=True)
+    times = np.asarray(times, dtype=float)
+    scores = np.asarray(scores, dtype=float)
+
+    # Order runs by series, then time, and place each at its rank in its series
+    order = np.lexsort((times, series))
+    series, times, scores = series[order], times[order], scores[order]
+    lengths = np.bincount(series, minlength=len(codes))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    positions = np.arange(len(series)) - starts[series]
+
+    shape = (len(codes), int(lengths.max()))
+    time_matrix = np.full(shape, np.nan)
+    score_matrix = np.full(shape, np.nan)
+    time_matrix[series, positions] = times
+    score_matrix[series, positions] = scores
+
+    keys = [(models[code // len(evals)], evals[code % len(evals)]) for code in codes.tolist()]
+    return History(keys, time_matrix, score_matrix, lengths)
+
+
+def rolling_mean(history, window=WINDOW):
+    """Mean of the last `window` runs (fewer at the start) of every series."""
+    if not history.keys:
+        return history.scores.copy()
+
+    sums = np.cumsum(np.where(history.present, history.scores, 0), axis=1)
+    lagged = np.zeros_like(sums)
+    lagged[:, window:] = sums[:, :-window]
+    counts = np.minimum(np.arange(1, sums.shape[1] + 1), window)
+    return np.where(history.present, (sums - lagged) / counts, np.nan)
+
+
+@profiling.traced
+def detect_change_points(
+    history,
+    min_runs=MIN_RUNS,
+    min_shift=MIN_SHIFT,
+    threshold=THRESHOLD,
+    noise_floor=NOISE_FLOOR,
+):
+    """Find the most significant mean shift of every series at once.
+
+    Every split of every series is scored with a two-sample statistic,
+    `|after - before| / noise * sqrt(n_before * n_after / n)`, computed from
+    cumulative sums over the whole history matrix.
+    """
+    count = len(history.keys)
+    if not count or history.scores.shape[1] < 2:
+        zeros = np.zeros(count)
+        return ChangePoints(zeros.astype(int), zeros, zeros, zeros, zeros.astype(bool))
+
+    present = history.present
+    scores = np.where(present, history.scores, 0)
+    lengths = history.lengths[:, None].astype(float)
+
+    sums = np.cumsum(scores, axis=1)
+    squares = np.cumsum(scores**2, axis=1)
+    total = sums[np.arange(count), history.lengths - 1][:, None]
+    total_squares = squares[np.arange(count), history.lengths - 1][:, None]
+
+    # Column k - 1 splits a series into its first k runs and the rest
+    n_before = np.arange(1, scores.shape[1] + 1, dtype=float)[None, :]
+    n_after = lengths - n_before
+    valid = (n_before >= min_runs) & (n_after >= min_runs)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        before = sums / n_before
+        after = (total - sums) / n_after
+        within = (
+            squares - n_before * before**2
+            + (total_squares - squares) - n_after * after**2
+        ) / np.maximum(lengths - 2, 1)
+        noise = np.maximum(np.sqrt(np.maximum(within, 0)), noise_floor)
+        statistic = np.abs(after - before) / noise * np.sqrt(n_before * n_after / lengths)
+
+    statistic = np.where(valid, statistic, -np.inf)
+    best = np.argmax(statistic, axis=1)
+    rows = np.arange(count)
+    tested = valid.any(axis=1)
+
+    result = ChangePoints(
+        index=np.where(tested, best + 1, 0),
+        before=np.where(tested, before[rows, best], np.nan),
+        after=np.where(tested, after[rows, best], np.nan),
+        statistic=np.where(tested, statistic[rows, best], 0.0),
+        flagged=np.zeros(count, dtype=bool),
+    )
+    result.flagged = tested & (result.statistic >= threshold) & (np.abs(result.shift) >= min_shift)
+
+    print(
+        f"Checked {count} score series for change points: "
+        f"{int(result.flagged.sum())} shifts, {int(result.regression.sum())} regressions"
+    )
+    return result
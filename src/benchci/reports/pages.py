@@ -1,157 +1,317 @@
 import json
-from jinja2 import Template
+import hashlib
 from pathlib import Path
 from datetime import datetime
+from .. import logio, store, parallel, profiling, runcache
+from .datafiles import SHARD_ROWS, write_data_files
+from .graph import render_template, write_if_changed
 
 
+# Rows per page of the report table
+PAGE_SIZE = 50
+
+# Subdirectory of the logs holding roll-ups of old runs (see `benchci.retention`)
+ROLLUP_DIR = "rollups"
+
+
+@profiling.traced
 def load_json_files(logs_path):
-    """Load all JSON files from the logs directory."""
+    """Load all (plain or compressed) logs from the logs directory."""
     logs_dir = Path(logs_path)
     report_data = []
 
-    for file_path in logs_dir.glob("*.json"):
+    for file_path in logio.iter_logs(logs_dir):
         try:
-            with file_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                report_data.append(data)
-        except json.JSONDecodeError:
+            report_data.append(logio.read_compacted(file_path))
+        except logio.READ_ERRORS:
             print(f"Warning: Could not decode JSON from {file_path}")
             continue
 
     return report_data
 
 
+def extract_database_entry(item):
+    """Convert a single log into a database entry."""
+    model = item.get("eval", {}).get("model", "N/A")
+    timestamp = item.get("eval", {}).get("created", "N/A")
+    eval_name = item.get("eval", {}).get("task", "N/A")
+
+    # Parse timestamp if it's not 'N/A'
+    if timestamp != "N/A":
+        try:
+            # Handle different timestamp formats
+            if isinstance(timestamp, str):
+                parsed_timestamp = datetime.fromisoformat(
+                    timestamp.replace("Z", "+00:00")
+                )
+            else:
+                parsed_timestamp = datetime.fromtimestamp(timestamp)
+            formatted_timestamp = parsed_timestamp.isoformat()
+        except Exception:
+            formatted_timestamp = timestamp
+    else:
+        formatted_timestamp = "N/A"
+
+    # Extract score and additional metrics
+    score_val = "Error"
+    additional_metrics = {}
+    if item.get("status") != "error":
+        try:
+            # Primary accuracy score
+            score_val = item["results"]["scores"][0]["metrics"]["accuracy"]["value"]
+
+            # Additional metrics
+            metrics = item["results"]["scores"][0]["metrics"]
+            for metric_name, metric_data in metrics.items():
+                if metric_name != "accuracy":  # Skip the main accuracy metric
+                    additional_metrics[metric_name] = metric_data["value"]
+        except (KeyError, IndexError):
+            pass
+
+    # Model usage data
+    model_usage = item.get("stats", {}).get("model_usage", {})
+    total_input_tokens = 0
+    total_output_tokens = 0
+    total_tokens = 0
+
+    for _model_key, usage_data in model_usage.items():
+        total_input_tokens += usage_data.get("input_tokens", 0)
+        total_output_tokens += usage_data.get("output_tokens", 0)
+        total_tokens += usage_data.get("total_tokens", 0)
+
+    return {
+        "model": model,
+        "timestamp": formatted_timestamp,
+        "eval_name": eval_name,
+        "score": score_val if isinstance(score_val, (int, float)) else score_val,
+        "additional_metrics": additional_metrics,
+        "total_input_tokens": total_input_tokens,
+        "total_output_tokens": total_output_tokens,
+        "total_tokens": total_tokens,
+    }
+
+
+def extract_rollup_entry(item):
+    """Convert the roll-up of a model's old runs of an eval into a database entry.
+
+    The entry stands for all rolled-up runs: its score is their mean, its
+    token counts are per-run means and `additional_metrics` holds the number
+    of runs and the standard error of the mean.
+    """
+    runs = item["runs"]
+    return {
+        "model": item["model"],
+        "timestamp": item["last"],
+        "eval_name": item["eval_name"],
+        "score": item["mean"],
+        "additional_metrics": {"runs": runs, "stderr": item["stderr"]},
+        "total_input_tokens": round(item["total_input_tokens"] / runs),
+        "total_output_tokens": round(item["total_output_tokens"] / runs),
+        "total_tokens": round(item["total_tokens"] / runs),
+    }
+
+
+def log_duration(item):
+    """Wall-clock seconds a run took according to its stats, or None."""
+    stats = item.get("stats") or {}
+    try:
+        started = datetime.fromisoformat(stats["started_at"].replace("Z", "+00:00"))
+        completed = datetime.fromisoformat(stats["completed_at"].replace("Z", "+00:00"))
+        return (completed - started).total_seconds()
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return None
+
+
+def log_error(item):
+    """The error message and traceback of a failed run, or None."""
+    error = item.get("error") or {}
+    text = "\n".join(part for part in (error.get("message"), error.get("traceback")) if part)
+    return text or None
+
+
+@profiling.traced
 def convert_to_database_format(report_data):
     """Convert the report data to a database-friendly format."""
-    database_entries = []
-
-    # TODO - This needs to be reworked. Use iter (see compat.py) so that
-    #        we're not loading every file into memory.
-    for item in report_data:
-        model = item.get("eval", {}).get("model", "N/A")
-        timestamp = item.get("eval", {}).get("created", "N/A")
-        eval_name = item.get("eval", {}).get("task", "N/A")
-
-        # Parse timestamp if it's not 'N/A'
-        if timestamp != "N/A":
-            try:
-                # Handle different timestamp formats
-                if isinstance(timestamp, str):
-                    parsed_timestamp = datetime.fromisoformat(
-                        timestamp.replace("Z", "+00:00")
-                    )
-                else:
-                    parsed_timestamp = datetime.fromtimestamp(timestamp)
-                formatted_timestamp = parsed_timestamp.isoformat()
-            except Exception:
-                formatted_timestamp = timestamp
+    return [extract_database_entry(item) for item in report_data]
+
+
+def hash_file(file_path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    profiling.count(bytes_read=file_path.stat().st_size)
+    return digest.hexdigest()
+
+
+def ingest_workers(config):
+    """Processes used to decode logs at ingest (`reports.ingest_workers`)."""
+    return config["evaluation"].get("reports", {}).get("ingest_workers")
+
+
+@profiling.traced
+def parse_log(file_path, known_digest=None):
+    """Hash a log and extract what the results store needs from it.
+
+    Runs in a worker process during ingest, so only the small extracted
+    record is returned, never the log itself. The log is decompressed and
+    parsed as a stream without its per-sample members, which the results
+    store does not use, so a large log is never in memory whole. Returns
+    `(digest, parsed)`; `parsed` is None if the log's hash is
+    `known_digest`, else `(entry, samples, duration, status, error)`.
+    """
+    digest = hash_file(file_path)
+    if digest == known_digest:
+        return digest, None
+
+    entry = None
+    samples = None
+    duration = None
+    try:
+        item = logio.read_compacted(file_path)
+        if "rollup" in item:
+            entry = extract_rollup_entry(item)
+            status, error = "success", None
         else:
-            formatted_timestamp = "N/A"
-
-        # Extract score and additional metrics
-        score_val = "Error"
-        additional_metrics = {}
-        if item.get("status") != "error":
-            try:
-                # Primary accuracy score
-                score_val = item["results"]["scores"][0]["metrics"]["accuracy"]["value"]
-
-                # Additional metrics
-                metrics = item["results"]["scores"][0]["metrics"]
-                for metric_name, metric_data in metrics.items():
-                    if metric_name != "accuracy":  # Skip the main accuracy metric
-                        additional_metrics[metric_name] = metric_data["value"]
-            except (KeyError, IndexError):
-                pass
-
-        # Model usage data
-        model_usage = item.get("stats", {}).get("model_usage", {})
-        total_input_tokens = 0
-        total_output_tokens = 0
-        total_tokens = 0
-
-        for _model_key, usage_data in model_usage.items():
-            total_input_tokens += usage_data.get("input_tokens", 0)
-            total_output_tokens += usage_data.get("output_tokens", 0)
-            total_tokens += usage_data.get("total_tokens", 0)
-
-        database_entries.append(
-            {
-                "model": model,
-                "timestamp": formatted_timestamp,
-                "eval_name": eval_name,
-                "score": (
-                    score_val if isinstance(score_val, (int, float)) else score_val
-                ),
-                "additional_metrics": additional_metrics,
-                "total_input_tokens": total_input_tokens,
-                "total_output_tokens": total_output_tokens,
-                "total_tokens": total_tokens,
-            }
-        )
-
-    return database_entries
+            entry = extract_database_entry(item)
+            samples = item.get("eval", {}).get("dataset", {}).get("samples")
+            duration = log_duration(item)
+            status, error = item.get("status"), log_error(item)
+    except logio.READ_ERRORS as e:
+        print(f"Warning: Could not decode JSON from {file_path}")
+        status, error = "invalid", f"{type(e).__name__}: {e}"
+
+    return digest, (entry, samples, duration, status, error)
+
+
+@profiling.traced
+def ingest_logs(logs_path, conn, max_workers=None):
+    """Parse new or changed logs into the results store and return their count.
+
+    Files are keyed by name (relative to the logs directory for roll-ups).
+    A file whose size and mtime match the manifest is skipped outright;
+    otherwise its content hash is compared so that a touched-but-identical
+    file (e.g. after a fresh checkout) is not re-parsed. Hashing and parsing
+    fan out over `max_workers` processes while the results are written to
+    the store in order. The status and error of every run are recorded in
+    the manifest, and the run cache entries kept with the logs are loaded
+    into `run_cache`.
+    """
+    logs_dir = Path(logs_path)
+    manifest = store.load_manifest(conn)
+    seen = set()
+    changed = []
+
+    file_paths = [*logio.iter_logs(logs_dir), *logio.iter_logs(logs_dir / ROLLUP_DIR)]
+    for file_path in file_paths:
+        key = file_path.relative_to(logs_dir).as_posix()
+        seen.add(key)
+
+        stat = file_path.stat()
+        record = manifest.get(key)
+        if (
+            record
+            and record["size"] == stat.st_size
+            and record["mtime_ns"] == stat.st_mtime_ns
+        ):
+            continue
+        changed.append((key, file_path, stat, record))
+
+    parsed = 0
+    known_digests = [record and record["sha256"] for _, _, _, record in changed]
+    results = parallel.imap(parse_log, [item[1] for item in changed], known_digests, max_workers=max_workers)
+    for (key, file_path, stat, record), (digest, result) in zip(changed, results):
+        if result is None:
+            store.record_file(
+                conn, key, stat.st_size, stat.st_mtime_ns, digest, record["status"], record["error"]
+            )
+            continue
 
+        entry, samples, duration, status, error = result
+        # Changed logs replace their previous results; new logs are appended
+        if record:
+            store.forget_files(conn, [key])
+        if entry:
+            store.insert_entry(conn, key, entry, samples, duration)
+        store.record_file(conn, key, stat.st_size, stat.st_mtime_ns, digest, status, error)
+        parsed += 1
 
+    # Drop logs that no longer exist (e.g. renamed by `compat`)
+    store.forget_files(conn, set(manifest) - seen)
+    runcache.load_entries(conn, logs_dir)
+
+    print(f"Ingested {parsed} new or changed logs ({len(seen) - parsed} unchanged)")
+
+    return parsed
+
+
+@profiling.traced
 def save_to_json_file(data, reports_path):
     """Save the database entries to a JSON file."""
-    with open(f"{reports_path}/database.json", "w") as f:
-        json.dump(data, f, indent=2)
-    print(f"Database saved to {reports_path}")
+    written = write_if_changed(f"{reports_path}/database.json", json.dumps(data, indent=2))
+    if written:
+        print(f"Database saved to {reports_path}")
+    return written
 
 
-def generate_html_page(reports_path):
+@profiling.traced
+def generate_html_page(reports_path, page_size=PAGE_SIZE):
     """Generate an HTML page to display the data using Jinja2."""
-    template_path = Path(__file__).parent / "templates/report_html.j2"
-    html_template = Template(template_path.read_text(encoding="utf-8"))
-
-    html_rendered = html_template.render(
+    html_rendered = render_template(
+        "report_html.j2",
         title="Model Evaluation Report",
         css_file="report.css",
-        data_file="database.json",
+        data_dir="data",
+        data_index="data/index.json",
+        page_size=page_size,
     )
 
     output_path = Path(f"{reports_path}/index.html")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html_rendered, encoding="utf-8")
-
-    print(f"HTML page saved to {output_path}")
+    written = write_if_changed(output_path, html_rendered)
+    if written:
+        print(f"HTML page saved to {output_path}")
+    return written
 
 
+@profiling.traced
 def generate_css(reports_path):
     """Generate CSS for the HTML page."""
-    template_path = Path(__file__).parent / "templates/report_css.j2"
-    html_template = Template(template_path.read_text(encoding="utf-8"))
-
-    html_rendered = html_template.render()
+    css_rendered = render_template("report_css.j2")
 
     output_path = Path(f"{reports_path}/report.css")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html_rendered, encoding="utf-8")
-
-    print(f"CSS file saved to {output_path}")
+    written = write_if_changed(output_path, css_rendered)
+    if written:
+        print(f"CSS file saved to {output_path}")
+    return written
 
 
+@profiling.traced
 def build_pages(config):
     """Main function to orchestrate the build process."""
     logs_path = config["evaluation"]["output"]["logs"]
     reports_path = config["evaluation"]["output"]["reports"]
 
-    # Load JSON files
-    report_data = load_json_files(logs_path)
+    # Only parse logs that are new or changed since the last build
+    conn = store.connect(store.get_store_path(config))
+    try:
+        with conn:
+            ingest_logs(logs_path, conn, ingest_workers(config))
+        database_entries = store.query_results(conn)
+    finally:
+        conn.close()
 
-    if not report_data:
+    if not database_entries:
         print("No data found to generate a report.")
         return
 
-    # Convert to database format
-    database_entries = convert_to_database_format(report_data)
-
-    # Save to JSON file (this will be our "database")
+    # Export the JSON view of the store, and the sharded copy the report page loads
     save_to_json_file(database_entries, reports_path)
+    report_config = config["evaluation"].get("reports", {})
+    write_data_files(database_entries, reports_path, report_config.get("shard_rows", SHARD_ROWS))
 
     # Generate HTML page
-    generate_html_page(reports_path)
+    generate_html_page(reports_path, report_config.get("page_size", PAGE_SIZE))
 
     # Generate CSS
     generate_css(reports_path)
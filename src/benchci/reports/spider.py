@@ -1,125 +1,98 @@
 import json
-from jinja2 import Template
 from pathlib import Path
+from .. import store, profiling
+from .graph import render_template, write_if_changed
 
 
-def load_database_file(database_path):
-    """Load the database JSON file containing model evaluation data."""
-    try:
-        with open(database_path, "r") as f:
-            data = json.load(f)
-        print(f"Loaded {len(data)} records from database")
-        return data
-    except FileNotFoundError:
-        print(f"Database file not found at {database_path}")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        return []
+# Where the spider chart page reloads its data from on live updates, relative to the reports
+SPIDER_DATA = "data/spider_chart.json"
 
+@profiling.traced
+def prepare_spider_chart_data(matrix):
+    """Prepare data for a spider (radar) chart visualization from a `ScoreMatrix`."""
+    import numpy as np
 
-def prepare_spider_chart_data(data):
-    """Prepare data for a spider (radar) chart visualization."""
-    if not data:
+    if not matrix.models:
         return [], []
 
-    model_scores = {}
-    eval_names = set()
-
-    print("Processing data entries for spider chart...")
-    for item in data:
-        model = item.get("model")
-        eval_name = item.get("eval_name")
-        score = item.get("score")
-
-        if score == "Error" or model is None or eval_name is None:
-            continue
-
-        if model not in model_scores:
-            model_scores[model] = {}
-
-        if eval_name not in model_scores[model]:
-            model_scores[model][eval_name] = []
-
-        model_scores[model][eval_name].append(score)
-        eval_names.add(eval_name)
-
     # Normalize scores to a 0-1 range to make them comparable on the chart
-    # First, find the min and max scores for each evaluation
-    eval_min_max = {eval: {"min": 1, "max": 0} for eval in eval_names}
-    for model in model_scores:
-        for eval_name, scores in model_scores[model].items():
-            if scores:
-                avg_score = sum(scores) / len(scores)
-                eval_min_max[eval_name]["min"] = min(
-                    eval_min_max[eval_name]["min"], avg_score
-                )
-                eval_min_max[eval_name]["max"] = max(
-                    eval_min_max[eval_name]["max"], avg_score
-                )
+    # First, find the min and max average scores for each evaluation
+    with np.errstate(invalid="ignore"):
+        eval_min = np.minimum(np.nanmin(matrix.mean, axis=0), 1)
+        eval_max = np.maximum(np.nanmax(matrix.mean, axis=0), 0)
+        spread = eval_max - eval_min
+        normalized = np.where(
+            spread > 0, (matrix.mean - eval_min) / np.where(spread > 0, spread, 1), 0
+        )
 
     # Create datasets for the spider chart
-    datasets = []
-    for model, evals in model_scores.items():
-        scores = []
-        for eval_name in sorted(list(eval_names)):
-            if eval_name in evals:
-                avg_score = sum(evals[eval_name]) / len(evals[eval_name])
-                # Normalize the score
-                min_val = eval_min_max[eval_name]["min"]
-                max_val = eval_min_max[eval_name]["max"]
-                if max_val > min_val:
-                    normalized_score = (avg_score - min_val) / (max_val - min_val)
-                else:
-                    normalized_score = 0
-                scores.append(round(normalized_score, 4))
-            else:
-                scores.append(0)
-        datasets.append({"label": model, "data": scores, "borderWidth": 1})
-
-    return sorted(list(eval_names)), datasets
+    datasets = [
+        {
+            "label": model,
+            "data": [
+                round(score, 4) if present else 0
+                for score, present in zip(
+                    normalized[row].tolist(), matrix.present[row].tolist()
+                )
+            ],
+            "borderWidth": 1,
+        }
+        for row, model in enumerate(matrix.models)
+    ]
 
+    return list(matrix.evals), datasets
 
+
+@profiling.traced
 def generate_spider_chart_html(labels, datasets, outputs_path="reports"):
     """Generate an HTML file with an interactive spider chart using Chart.js."""
     labels_json = json.dumps(labels)
     datasets_json = json.dumps(datasets)
 
-    template_path = Path(__file__).parent / "templates/spider_chart.j2"
-    # Ensure the template exists
-    if not template_path.exists():
-        print(f"Error: Template file not found at {template_path}")
-        return
-
-    html_template = Template(template_path.read_text(encoding="utf-8"))
-    html_rendered = html_template.render(
+    html_rendered = render_template(
+        "spider_chart.j2",
         labels_json=labels_json,
         datasets_json=datasets_json,
+        data_url=SPIDER_DATA,
     )
 
     output_path = Path(f"{outputs_path}/spider_chart.html")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html_rendered, encoding="utf-8")
+    written = write_if_changed(output_path, html_rendered)
+    if written:
+        print(f"Spider chart HTML saved to {output_path}")
+    return written
+
 
-    print(f"Spider chart HTML saved to {output_path}")
+@profiling.traced
+def generate_spider_chart_data(labels, datasets, outputs_path="reports"):
+    """Write the spider chart data loaded by its page on live updates."""
+    output_path = Path(outputs_path) / SPIDER_DATA
+    written = write_if_changed(output_path, json.dumps({"labels": labels, "datasets": datasets}, separators=(",", ":")))
+    if written:
+        print(f"Spider chart data saved to {output_path}")
+    return written
 
 
+@profiling.traced
 def build_spider_chart(config):
     """Main function to generate the spider chart."""
+    from .aggregate import build_score_matrix
+
     reports_path = config["evaluation"]["output"]["reports"]
 
-    data = load_database_file(str(Path(reports_path) / "database.json"))
+    data = store.load_results(config)
 
     if not data:
         print("No data available to generate charts.")
         return
 
-    labels, datasets = prepare_spider_chart_data(data)
+    labels, datasets = prepare_spider_chart_data(build_score_matrix(data))
 
     if not labels or not datasets:
         print("No valid data to display in the spider chart.")
         return
 
+    generate_spider_chart_data(labels, datasets, reports_path)
     generate_spider_chart_html(labels, datasets, reports_path)
 
     print("Spider chart generation completed successfully!")
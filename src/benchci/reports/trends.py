@@ -0,0 +1,128 @@
+import json
+from pathlib import Path
+from datetime import datetime, timezone
+from .. import store, profiling
+from .graph import render_template, write_if_changed
+
+
+# Where the trend page loads its series from, relative to the reports
+TRENDS_DATA = "data/trends.json"
+
+
+def history_options(config):
+    """Keyword arguments for `detect_change_points` and the rolling window."""
+    history_config = config["evaluation"].get("reports", {}).get("history", {})
+    keys = ("window", "min_runs", "min_shift", "threshold")
+    return {key: history_config[key] for key in keys if key in history_config}
+
+
+def _round(values):
+    return [None if value != value else round(value, 4) for value in values]
+
+
+@profiling.traced
+def prepare_trend_data(data, window=None, **detect_options):
+    """Build the series shown on the trend page from database entries.
+
+    Flagged shifts come first (regressions, largest drop first), then the
+    remaining series by model and eval.
+    """
+    from .history import WINDOW, build_history, rolling_mean, detect_change_points
+
+    window = window or WINDOW
+    history = build_history(data)
+    rolling = rolling_mean(history, window)
+    changes = detect_change_points(history, **detect_options)
+
+    series = []
+    for row, (model, eval_name) in enumerate(history.keys):
+        length = int(history.lengths[row])
+        change = None
+        if changes.index[row]:
+            change = {
+                "index": int(changes.index[row]),
+                "before": round(float(changes.before[row]), 4),
+                "after": round(float(changes.after[row]), 4),
+                "shift": round(float(changes.shift[row]), 4),
+                "statistic": round(float(changes.statistic[row]), 2),
+                "flagged": bool(changes.flagged[row]),
+            }
+        series.append(
+            {
+                "model": model,
+                "eval": eval_name,
+                "times": [int(time * 1000) for time in history.times[row, :length].tolist()],
+                "scores": _round(history.scores[row, :length].tolist()),
+                "rolling": _round(rolling[row, :length].tolist()),
+                "change": change,
+            }
+        )
+
+    def order(item):
+        change = item["change"]
+        flagged = bool(change and change["flagged"])
+        return (not flagged, change["shift"] if flagged else 0, item["model"], item["eval"])
+
+    return {"version": 1, "window": window, "series": sorted(series, key=order)}
+
+
+def report_regressions(trend_data):
+    """Print the flagged regressions, e.g. for CI logs."""
+    for series in trend_data["series"]:
+        change = series["change"]
+        if not (change and change["flagged"]):
+            break
+        if change["shift"] >= 0:
+            continue
+        since = datetime.fromtimestamp(series["times"][change["index"]] / 1000, timezone.utc)
+        print(
+            f"Regression: {series['model']} on {series['eval']}: "
+            f"{change['before']:.4f} -> {change['after']:.4f} since {since:%Y-%m-%d}"
+        )
+
+
+@profiling.traced
+def generate_trend_data(trend_data, outputs_path="reports"):
+    """Write the trend series loaded by the trend page."""
+    output_path = Path(outputs_path) / TRENDS_DATA
+    written = write_if_changed(output_path, json.dumps(trend_data, separators=(",", ":")))
+    if written:
+        print(f"Trend data saved to {output_path}")
+    return written
+
+
+@profiling.traced
+def generate_trends_html(outputs_path="reports", window=None):
+    """Generate the trend page, which fetches its series on load."""
+    from .history import WINDOW
+
+    html_rendered = render_template("trends_html.j2", data_url=TRENDS_DATA, window=window or WINDOW)
+
+    output_path = Path(f"{outputs_path}/trends.html")
+    written = write_if_changed(output_path, html_rendered)
+    if written:
+        print(f"Trend HTML saved to {output_path}")
+    return written
+
+
+@profiling.traced
+def build_trends(config):
+    """Main function to generate the trend page and flag regressions."""
+    reports_path = config["evaluation"]["output"]["reports"]
+
+    # Every run counts here, whatever the chart filters are
+    data = store.load_results(config, latest=False, since=None)
+
+    if not data:
+        print("No data available to generate trends.")
+        return
+
+    options = history_options(config)
+    window = options.pop("window", None)
+    trend_data = prepare_trend_data(data, window, **options)
+    report_regressions(trend_data)
+
+    generate_trend_data(trend_data, reports_path)
+    generate_trends_html(reports_path, window)
+
+    print("Trend generation completed successfully!")
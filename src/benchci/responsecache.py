@@ -0,0 +1,410 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import http.server
+import urllib.error
+import urllib.request
+from pathlib import Path
+from . import profiling
+
+
+# Where the cache lives unless `response_cache.path` says otherwise; not
+# under the reports, which are published
+DEFAULT_PATH = ".benchci/responses.db"
+
+# Providers whose API calls are routed through the cache, by the prefix of
+# their `<PREFIX>_BASE_URL` environment variable, with their default base URL
+UPSTREAMS = {
+    "OPENROUTER": "https://openrouter.ai/api/v1",
+    "OPENAI": "https://api.openai.com/v1",
+}
+
+# Request headers not forwarded upstream; the proxy sets its own
+HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding", "keep-alive", "transfer-encoding"}
+
+# Request body members that do not change the response
+IGNORED_MEMBERS = ("user", "metadata")
+
+# Fraction of `max_size_mb` the cache is trimmed down to once it is full
+TRIM_RATIO = 0.9
+
+# Seconds the proxy waits on a silent upstream connection (`response_cache.timeout`)
+UPSTREAM_TIMEOUT = 600
+
+# Largest piece of an event stream relayed at once
+STREAM_CHUNK_SIZE = 1 << 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key          TEXT PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    body         BLOB NOT NULL,
+    size         INTEGER NOT NULL,
+    tokens       INTEGER NOT NULL DEFAULT 0,
+    created_at   REAL NOT NULL,
+    accessed_at  REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def request_key(url, body):
+    """Hash the upstream URL and the request body (model, messages and parameters).
+
+    Members in `IGNORED_MEMBERS` are left out, and the body is re-encoded
+    with sorted keys so that equal requests hash equally.
+    """
+    payload = {key: value for key, value in body.items() if key not in IGNORED_MEMBERS}
+    encoded = json.dumps({"url": url, "body": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def response_usage(body):
+    """The `usage` of an API response body, JSON or an event stream, or {}."""
+    try:
+        return json.loads(body).get("usage") or {}
+    except (ValueError, AttributeError):
+        pass
+    # An event stream reports its usage (when asked to) in one of its last events
+    for line in reversed(body.splitlines()):
+        if not line.startswith(b"data:"):
+            continue
+        try:
+            usage = json.loads(line[5:]).get("usage")
+        except (ValueError, AttributeError):
+            continue
+        if usage:
+            return usage
+    return {}
+
+
+def response_tokens(body):
+    """Total tokens reported in an API response body, or 0."""
+    usage = response_usage(body)
+    total = usage.get("total_tokens")
+    if total is None:
+        total = (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+    return total or 0
+
+
+class ResponseCache:
+    """SQLite store of API responses with a TTL and least-recently-used eviction.
+
+    The proxy's threads share one connection behind a lock. The database
+    runs in WAL mode with a busy timeout, so several processes (e.g.
+    concurrent `benchci evaluate` runs) can share one cache file too.
+    """
+
+    def __init__(self, path, max_size_mb=None, ttl_days=None):
+        self.path = Path(path)
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb else None
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        if self.ttl:
+            with self.conn:
+                self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def get(self, key):
+        """Return `(content_type, body, tokens)` for a key, or None."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_type, body, tokens, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[3] > self.ttl):
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        content_type, body, tokens, _ = row
+        return content_type, gzip.decompress(body), tokens
+
+    def put(self, key, content_type, body):
+        """Store a response, then evict the least recently used ones while over size."""
+        compressed = gzip.compress(body, mtime=0)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, content_type, body, size, tokens, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, content_type, compressed, len(compressed), response_tokens(body), now, now),
+            )
+            if self.max_size:
+                self.evict()
+
+    def evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+        # Least recently used first, until the cache is back under TRIM_RATIO of its size
+        self.conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key) AS freed
+                    FROM responses
+                ) WHERE freed - size < ?
+            )
+            """,
+            (total - self.max_size * TRIM_RATIO,),
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+class CachingProxyHandler(http.server.BaseHTTPRequestHandler):
+    """Forwards API requests to their upstream and answers repeats from the cache.
+
+    Requests to `/<prefix>/<path>` go to `<upstream of prefix>/<path>`. Only
+    successful responses to JSON POST requests are cached. The n-th
+    identical request seen by a proxy maps to the n-th cached response, so
+    the epochs of an eval (which send identical requests) keep their own
+    responses. Without a cache every request is forwarded.
+
+    With a `limiter` (a `benchci.scheduler.RateLimiter`), JSON requests that
+    go upstream first wait for the rate limits of their model, named
+    `<prefix>/<model of the request>` like the models of the config.
+
+    Event streams (`"stream": true` requests) are relayed as they arrive
+    and cached whole once complete. An upstream that stays silent for
+    `upstream_timeout` seconds is answered with a 504.
+    """
+
+    cache = None
+    limiter = None
+    upstream_timeout = UPSTREAM_TIMEOUT
+    upstreams = {}
+    stats = None
+    lock = None
+    seen = None
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def route(self):
+        """The `(prefix, upstream URL)` of the request; the URL is None for unknown prefixes."""
+        prefix, _, rest = self.path.lstrip("/").partition("/")
+        upstream = self.upstreams.get(prefix.upper())
+        return prefix.lower(), f"{upstream.rstrip('/')}/{rest}" if upstream else None
+
+    def do_GET(self):
+        _, url = self.route()
+        if url is None:
+            self.respond(404, "text/plain", b"Unknown upstream\n")
+            return
+        self.forward(url)
+
+    def do_POST(self):
+        prefix, url = self.route()
+        if url is None:
+            self.respond(404, "text/plain", b"Unknown upstream\n")
+            return
+
+        data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            body = json.loads(data)
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self.forward(url, data)
+            return
+
+        model_name = f"{prefix}/{body.get('model')}"
+        if self.cache is None:
+            self.forward_limited(model_name, url, data)
+            return
+
+        base_key = request_key(url, body)
+        with self.lock:
+            occurrence = self.seen.get(base_key, 0)
+            self.seen[base_key] = occurrence + 1
+        key = hashlib.sha256(f"{base_key}:{occurrence}".encode("utf-8")).hexdigest()
+
+        cached = self.cache.get(key)
+        if cached:
+            content_type, response, tokens = cached
+            with self.lock:
+                self.stats["hits"] += 1
+                self.stats["tokens"] += tokens
+            self.respond(200, content_type, response)
+            return
+
+        with self.lock:
+            self.stats["misses"] += 1
+        status, content_type, response = self.forward_limited(model_name, url, data)
+        if status == 200:
+            self.cache.put(key, content_type, response)
+
+    def forward_limited(self, model_name, url, data):
+        """Forward a model request once the rate limits allow it, charging its tokens."""
+        if not self.limiter:
+            return self.forward(url, data)
+
+        self.limiter.acquire(model_name)
+        status, content_type, response = self.forward(url, data)
+        if status == 200:
+            self.limiter.charge(model_name, response_tokens(response))
+        return status, content_type, response
+
+    def forward(self, url, data=None):
+        """Send the request upstream, relay its response and return it.
+
+        A stream that breaks off is returned with status 502, so that it is
+        neither cached nor charged.
+        """
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+        request = urllib.request.Request(url, data=data, headers=headers, method=self.command)
+        try:
+            with profiling.span("responsecache.forward", url=url):
+                with urllib.request.urlopen(request, timeout=self.upstream_timeout) as upstream:
+                    status = upstream.status
+                    content_type = upstream.headers.get("Content-Type", "application/json")
+                    if content_type.startswith("text/event-stream"):
+                        response = self.relay_stream(upstream, status, content_type)
+                        return (status, content_type, response) if response is not None else (502, content_type, b"")
+                    response = upstream.read()
+        except urllib.error.HTTPError as e:
+            status, content_type, response = e.code, e.headers.get("Content-Type", "application/json"), e.read()
+        except (urllib.error.URLError, OSError) as e:
+            reason = e.reason if isinstance(e, urllib.error.URLError) else e
+            status = 504 if isinstance(reason, TimeoutError) else 502
+            content_type, response = "text/plain", f"Upstream error: {reason}\n".encode("utf-8")
+
+        self.respond(status, content_type, response)
+        return status, content_type, response
+
+    def relay_stream(self, upstream, status, content_type):
+        """Relay an event stream chunk by chunk; returns its body, or None if it broke off."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunks = []
+        try:
+            while chunk := upstream.read1(STREAM_CHUNK_SIZE):
+                chunks.append(chunk)
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            # The upstream timed out or either side hung up mid-stream
+            self.close_connection = True
+            return None
+        return b"".join(chunks)
+
+    def respond(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_proxy(cache, upstreams, port=0, limiter=None, timeout=UPSTREAM_TIMEOUT):
+    """Create a threaded caching proxy on localhost; `stats` counts hits and misses."""
+    handler = type(
+        "ConfiguredCachingProxyHandler",
+        (CachingProxyHandler,),
+        {
+            "cache": cache,
+            "limiter": limiter,
+            "upstream_timeout": timeout,
+            "upstreams": dict(upstreams),
+            "stats": {"hits": 0, "misses": 0, "tokens": 0},
+            "lock": threading.Lock(),
+            "seen": {},
+        },
+    )
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    httpd.daemon_threads = True
+    httpd.stats = handler.stats
+    httpd.cache = cache
+    httpd.limiter = limiter
+    return httpd
+
+
+def proxied_upstreams(config):
+    """Base URLs of the providers routed through the proxy, by prefix."""
+    cache_config = config["evaluation"].get("response_cache", {})
+    return {
+        prefix.upper(): os.environ.get(f"{prefix.upper()}_BASE_URL") or default
+        for prefix, default in {**UPSTREAMS, **(cache_config.get("upstreams") or {})}.items()
+    }
+
+
+def proxied_providers(config):
+    """Model name prefixes (e.g. `openrouter`) whose requests go through the proxy."""
+    return {prefix.lower() for prefix in proxied_upstreams(config)}
+
+
+def start_proxy(config, limiter=None):
+    """Start the API proxy if `evaluation.response_cache.enabled` is set or `limiter` has limits.
+
+    Points the `<PREFIX>_BASE_URL` variables of the proxied providers at
+    the proxy, which the evaluation workers inherit, and returns the
+    running proxy (or None when neither is needed).
+    """
+    cache_config = config["evaluation"].get("response_cache", {})
+    if not (cache_config.get("enabled") or limiter):
+        return None
+
+    cache = None
+    if cache_config.get("enabled"):
+        cache = ResponseCache(
+            cache_config.get("path", DEFAULT_PATH),
+            cache_config.get("max_size_mb"),
+            cache_config.get("ttl_days"),
+        )
+    upstreams = proxied_upstreams(config)
+    httpd = make_proxy(
+        cache, upstreams, limiter=limiter or None, timeout=cache_config.get("timeout", UPSTREAM_TIMEOUT)
+    )
+    httpd.environ = {prefix: os.environ.get(f"{prefix}_BASE_URL") for prefix in upstreams}
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    for prefix in upstreams:
+        os.environ[f"{prefix}_BASE_URL"] = f"http://127.0.0.1:{port}/{prefix.lower()}"
+    if cache:
+        print(f"Caching model responses in {cache.path} (proxy on port {port})")
+    if limiter:
+        print(f"Rate limiting model requests of {', '.join(sorted(proxied_providers(config)))} (proxy on port {port})")
+    return httpd
+
+
+def stop_proxy(httpd):
+    """Stop the proxy, restore the base URLs and print its hit rate and rate limit delays."""
+    httpd.shutdown()
+    httpd.server_close()
+    for prefix, value in httpd.environ.items():
+        if value is None:
+            os.environ.pop(f"{prefix}_BASE_URL", None)
+        else:
+            os.environ[f"{prefix}_BASE_URL"] = value
+
+    if httpd.cache:
+        httpd.cache.close()
+        stats = httpd.stats
+        print(
+            f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['tokens']} tokens not sent again"
+        )
+    if httpd.limiter:
+        stats = httpd.limiter.stats
+        print(f"Rate limits delayed {stats['delayed']} model requests by {stats['waited']:.0f}s in all")
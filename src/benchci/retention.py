@@ -0,0 +1,159 @@
+import math
+from pathlib import Path
+from itertools import groupby
+from . import logio, store, profiling, runcache
+from .samples import sidecar_path
+from .reports.pages import ROLLUP_DIR, ingest_logs, ingest_workers
+from .reports.datafiles import slugify
+
+
+# Errors of runs whose logs are deleted by default; these runs failed for
+# reasons unrelated to the model's ability (bad requests, auth, provider)
+DELETE_ERRORS = ("BadRequestError", "AuthenticationError", "OpenRouterError", "JSONDecodeError")
+
+
+def retention_policy(config):
+    """Return `(keep_runs, delete_errors)` from `evaluation.retention`.
+
+    `keep_runs` is None to keep every run. `delete_errors` is a list of
+    error patterns, None to delete every errored log, or empty to keep them.
+    """
+    retention = config["evaluation"].get("retention", {})
+    delete_errors = retention.get("delete_errors", DELETE_ERRORS)
+    if delete_errors is True:
+        delete_errors = None
+    elif not delete_errors:
+        delete_errors = ()
+    return retention.get("keep_runs"), delete_errors
+
+
+def rollup_stem(model, eval_name):
+    """Name (without suffix) of the roll-up of a model's runs of an eval."""
+    return f"rollup_{slugify(model)}_{slugify(eval_name)}"
+
+
+def remove_log(path):
+    """Delete a log and its per-sample sidecar."""
+    Path(path).unlink(missing_ok=True)
+    sidecar_path(path).unlink(missing_ok=True)
+
+
+def merge_runs(rollup, model, eval_name, runs):
+    """Fold database entries of runs into a roll-up record.
+
+    The mean and the sum of squared deviations are combined exactly
+    (Chan et al.), so rolling up in several passes gives the same result
+    as rolling up everything at once.
+    """
+    rollup = rollup or {
+        "rollup": 1,
+        "model": model,
+        "eval_name": eval_name,
+        "runs": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "first": None,
+        "last": None,
+        "total_input_tokens": 0,
+        "total_output_tokens": 0,
+        "total_tokens": 0,
+        "sources": [],
+    }
+
+    runs = [run for run in runs if run["source"] not in rollup["sources"]]
+    if not runs:
+        return rollup
+
+    scores = [run["score"] for run in runs]
+    count = len(scores)
+    mean = sum(scores) / count
+    m2 = sum((score - mean) ** 2 for score in scores)
+
+    total = rollup["runs"] + count
+    delta = mean - rollup["mean"]
+    rollup["mean"] += delta * count / total
+    rollup["m2"] += m2 + delta**2 * rollup["runs"] * count / total
+    rollup["runs"] = total
+    rollup["stderr"] = math.sqrt(rollup["m2"] / (total - 1) / total) if total > 1 else 0.0
+
+    timestamps = [run["timestamp"] for run in runs]
+    rollup["first"] = min(filter(None, [rollup["first"], *timestamps]))
+    rollup["last"] = max(filter(None, [rollup["last"], *timestamps]))
+    for column in ("total_input_tokens", "total_output_tokens", "total_tokens"):
+        rollup[column] += sum(run[column] for run in runs)
+    rollup["sources"] += [run["source"] for run in runs]
+
+    return rollup
+
+
+@profiling.traced
+def prune_logs(config, dry_run=False):
+    """Apply the retention policy to the logs directory.
+
+    Errored logs (as indexed at ingest) are deleted, and all but the newest
+    `keep_runs` successful runs of every model and eval are rolled up into a
+    single record in `<logs>/rollups/` before their logs are deleted.
+    """
+    logs_dir = Path(config["evaluation"]["output"]["logs"])
+    keep_runs, delete_errors = retention_policy(config)
+    compression = logio.log_compression(config)
+    action = "Would delete" if dry_run else "Deleting"
+    workers = ingest_workers(config)
+
+    conn = store.connect(store.get_store_path(config))
+    try:
+        with conn:
+            ingest_logs(logs_dir, conn, workers)
+
+        errored = []
+        if delete_errors != ():
+            errored = store.errored_logs(conn, delete_errors)
+        for key, error in errored:
+            reason = error.splitlines()[0] if error else "no error message"
+            print(f"{action} errored log {key}: {reason}")
+            if not dry_run:
+                remove_log(logs_dir / key)
+
+        rolled = 0
+        if keep_runs is not None:
+            old_runs = store.runs_beyond(conn, keep_runs, f"{ROLLUP_DIR}/")
+            rollup_dir = logs_dir / ROLLUP_DIR
+            pairs = groupby(old_runs, key=lambda run: (run["model"], run["eval_name"]))
+            for (model, eval_name), runs in pairs:
+                runs = list(runs)
+                stem = rollup_stem(model, eval_name)
+                existing = next(
+                    (path for path in logio.iter_logs(rollup_dir, stem) if logio.log_stem(path) == stem),
+                    None,
+                )
+                rollup = merge_runs(existing and logio.read_log(existing), model, eval_name, runs)
+
+                print(
+                    f"{'Would roll' if dry_run else 'Rolling'} up {len(runs)} old runs of "
+                    f"{eval_name} on {model} ({rollup['runs']} in total)"
+                )
+                rolled += len(runs)
+                if dry_run:
+                    continue
+
+                # Write the roll-up before deleting the logs it replaces; it
+                # lists their names, so an interrupted prune never counts a run twice
+                rollup_dir.mkdir(parents=True, exist_ok=True)
+                rollup_path = rollup_dir / logio.log_name(stem, compression)
+                logio.write_log(rollup_path, rollup)
+                if existing and existing != rollup_path:
+                    existing.unlink()
+                for run in runs:
+                    remove_log(logs_dir / run["source"])
+
+        if not dry_run and (errored or rolled):
+            runcache.prune_entries(logs_dir)
+            with conn:
+                ingest_logs(logs_dir, conn, workers)
+    finally:
+        conn.close()
+
+    if dry_run:
+        print(f"Dry run: would delete {len(errored)} errored logs and roll up {rolled} old runs")
+    else:
+        print(f"Deleted {len(errored)} errored logs and rolled up {rolled} old runs")
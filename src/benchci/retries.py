@@ -0,0 +1,72 @@
+import re
+import random
+
+
+DEFAULTS = {
+    "max_attempts": 3,
+    "base_delay": 30.0,
+    "max_delay": 600.0,
+    "transient": [],
+}
+
+# Errors that will fail again however often the eval is retried: rejected
+# requests, bad credentials, unknown models and prompts that do not fit.
+# Checked before TRANSIENT_ERRORS.
+PERMANENT_ERRORS = (
+    r"BadRequestError",
+    r"AuthenticationError",
+    r"PermissionDeniedError",
+    r"NotFoundError",
+    r"context.length",
+    r"Error code: 4(?!08|29)\d\d",
+    r"OpenRouterError.*Error 4(?!08|29)\d\d",
+)
+
+# Errors of the provider rather than the request: rate limits, server
+# errors and overload, timeouts and dropped connections
+TRANSIENT_ERRORS = (
+    r"RateLimitError",
+    r"rate.limit",
+    r"InternalServerError",
+    r"ServiceUnavailable",
+    r"overloaded",
+    r"Timeout",
+    r"timed out",
+    r"APIConnectionError",
+    r"ConnectionError",
+    r"RemoteProtocolError",
+    r"Error code: (408|429|5\d\d)",
+    r"OpenRouterError.*Error (408|429|5\d\d)",
+)
+
+
+def retry_settings(config):
+    """Resolve `evaluation.retry` over `DEFAULTS`; `retry: false` turns retries off."""
+    retry_config = config["evaluation"].get("retry", {})
+    if retry_config is False:
+        return {**DEFAULTS, "max_attempts": 1}
+    return {**DEFAULTS, **(retry_config or {})}
+
+
+def is_transient(error, settings=None):
+    """Whether a run that failed with `error` (its message and traceback) may succeed if retried.
+
+    Errors matching neither list are not retried. `settings["transient"]`
+    adds patterns of errors to retry.
+    """
+    if not error:
+        return False
+    if any(re.search(pattern, error, re.IGNORECASE) for pattern in PERMANENT_ERRORS):
+        return False
+    patterns = TRANSIENT_ERRORS + tuple((settings or {}).get("transient") or ())
+    return any(re.search(pattern, error, re.IGNORECASE) for pattern in patterns)
+
+
+def backoff_delay(attempt, settings, rng=random):
+    """Seconds to wait before retry `attempt` (1-based).
+
+    The delay doubles with every attempt up to `max_delay`, and half of it
+    is random so that evals which failed together do not retry together.
+    """
+    delay = min(settings["max_delay"], settings["base_delay"] * 2 ** (attempt - 1))
+    return delay / 2 + rng.uniform(0, delay / 2)
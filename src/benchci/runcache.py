@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from . import logio
+
+
+# Directory under the logs holding one `<key>.json` entry per cached run.
+# The entries travel with the logs (commits, CI artifacts, `merge-logs`),
+# so a fresh checkout rebuilds `run_cache` from them on ingest.
+ENTRY_DIR = "run_cache"
+
+
+def openbench_version():
+    """Return the installed openbench version."""
+    from importlib import metadata
+
+    try:
+        return metadata.version("openbench")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def cache_key(job, run_config, version=None):
+    """Hash everything that determines the result of a job.
+
+    The run's `evals` list is left out so that adding or removing an eval
+    does not invalidate the cached results of the others, and `shards` only
+    changes how an eval is executed, not its result.
+    """
+    payload = {
+        "model": job.model_name,
+        "eval": job.eval_name,
+        "limit": job.limit,
+        "openbench": version or openbench_version(),
+        "config": {key: value for key, value in run_config.items() if key not in ("evals", "shards")},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def find_logfile(logs_path, logfile):
+    """Return the log written for `logfile`, including its compacted name."""
+    for candidate in logio.iter_logs(logs_path, f"{logfile}*"):
+        return candidate
+    return None
+
+
+def lookup(conn, key, logs_path, ttl_days=None):
+    """Return the cached log for a key, or None if it is missing or expired."""
+    row = conn.execute(
+        "SELECT logfile, created_at FROM run_cache WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    if ttl_days is not None and time.time() - row["created_at"] > ttl_days * 86400:
+        return None
+
+    return find_logfile(logs_path, row["logfile"])
+
+
+def record(conn, key, job, logfile, logs_path):
+    """Remember that a job completed successfully with the given log.
+
+    Besides the row in the store, an entry is written under the logs so
+    that the result stays cached where only the logs are kept.
+    """
+    entry = {"model": job.model_name, "eval_name": job.eval_name, "logfile": logfile, "created_at": time.time()}
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO run_cache (key, model, eval_name, logfile, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (key, entry["model"], entry["eval_name"], entry["logfile"], entry["created_at"]),
+    )
+    write_entry(Path(logs_path) / ENTRY_DIR / f"{key}.json", entry)
+
+
+def write_entry(path, entry):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(entry, sort_keys=True, indent=4) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_entries(entry_dir):
+    """Yield `(key, entry)` for the readable entries in a directory."""
+    for path in sorted(Path(entry_dir).glob("*.json")):
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            print(f"Warning: Skipping unreadable run cache entry {path}")
+            continue
+        yield path.stem, entry
+
+
+def load_entries(conn, logs_path):
+    """Fill `run_cache` from the entries under the logs; newer rows win."""
+    conn.executemany(
+        """
+        INSERT INTO run_cache (key, model, eval_name, logfile, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (key) DO UPDATE SET
+            model = excluded.model,
+            eval_name = excluded.eval_name,
+            logfile = excluded.logfile,
+            created_at = excluded.created_at
+        WHERE excluded.created_at > run_cache.created_at
+        """,
+        [
+            (key, entry["model"], entry["eval_name"], entry["logfile"], entry["created_at"])
+            for key, entry in read_entries(Path(logs_path) / ENTRY_DIR)
+        ],
+    )
+
+
+def merge_entries(source_dir, logs_path):
+    """Copy the entries of another logs directory, keeping the newer of two entries for a key."""
+    target_dir = Path(logs_path) / ENTRY_DIR
+    known = dict(read_entries(target_dir))
+    copied = 0
+    for key, entry in read_entries(Path(source_dir) / ENTRY_DIR):
+        if key in known and known[key]["created_at"] >= entry["created_at"]:
+            continue
+        write_entry(target_dir / f"{key}.json", entry)
+        known[key] = entry
+        copied += 1
+    return copied
+
+
+def prune_entries(logs_path):
+    """Delete the entries whose log no longer exists; returns their count."""
+    removed = 0
+    for key, entry in read_entries(Path(logs_path) / ENTRY_DIR):
+        if find_logfile(logs_path, entry["logfile"]) is None:
+            (Path(logs_path) / ENTRY_DIR / f"{key}.json").unlink()
+            removed += 1
+    return removed
@@ -0,0 +1,248 @@
+import os
+import struct
+from array import array
+import zipfile
+import tempfile
+from pathlib import Path
+from . import logio, profiling
+
+
+# Sidecar written next to each compacted log, e.g. `<stem>_compat.samples.npz`
+SIDECAR_SUFFIX = ".samples.npz"
+
+# Score values inspect_ai maps to floats (see `value_to_float`)
+SCORE_VALUES = {
+    "c": 1.0,
+    "p": 0.5,
+    "i": 0.0,
+    "n": 0.0,
+    "yes": 1.0,
+    "true": 1.0,
+    "no": 0.0,
+    "false": 0.0,
+}
+
+TOKEN_COLUMNS = ("input_tokens", "output_tokens", "total_tokens")
+
+TIME_COLUMNS = ("total_time", "working_time")
+
+
+def sidecar_path(log_path):
+    """Path of the per-sample sidecar of a (compacted) log."""
+    return Path(log_path).with_name(logio.log_stem(log_path) + SIDECAR_SUFFIX)
+
+
+def score_to_float(value):
+    """Map a score value to a float the way inspect_ai metrics do; NaN if unknown."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if value.lower() in SCORE_VALUES:
+            return SCORE_VALUES[value.lower()]
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return float("nan")
+
+
+def _score_items(prefix, value):
+    """Column names and float values of a (possibly dict-valued) score."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield f"{prefix}.{key}", score_to_float(item)
+    else:
+        yield prefix, score_to_float(value)
+
+
+def _usage(sample):
+    """Token usage of a sample, summed over the models it called."""
+    usage = dict.fromkeys(TOKEN_COLUMNS, 0)
+    model_usage = sample.get("model_usage") or {}
+    if not model_usage:
+        output_usage = (sample.get("output") or {}).get("usage")
+        model_usage = {"output": output_usage} if output_usage else {}
+
+    for counts in model_usage.values():
+        for column in TOKEN_COLUMNS:
+            usage[column] += counts.get(column) or 0
+    return usage
+
+
+class ColumnBuilder:
+    """Collects the per-sample columns of a log one sample at a time.
+
+    Only the values that end up in columns are kept, so the samples of a
+    log never have to be in memory at once (see `logio.read_compacted`).
+    Items are added with `add("samples", sample)` and
+    `add("reductions", reduction)`, in any order.
+    """
+
+    def __init__(self):
+        # Numbers are kept in typed arrays rather than lists of objects
+        self.ids = []
+        self.epochs = array("q")
+        self.errors = bytearray()
+        self.values = {
+            **{column: array("q") for column in TOKEN_COLUMNS},
+            **{column: array("d") for column in TIME_COLUMNS},
+        }
+        self.scores = {}
+        self.reduced = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, member, item):
+        if member == "samples" and isinstance(item, dict):
+            self.add_sample(item)
+        elif member == "reductions" and isinstance(item, dict):
+            self.add_reduction(item)
+
+    def add_sample(self, sample):
+        row = len(self.ids)
+        self.ids.append(sample.get("id"))
+        self.epochs.append(sample.get("epoch") or 0)
+        self.errors.append(bool(sample.get("error")))
+
+        usage = _usage(sample)
+        for column in TOKEN_COLUMNS:
+            self.values[column].append(usage[column])
+        for column in TIME_COLUMNS:
+            value = sample.get(column)
+            self.values[column].append(float("nan") if value is None else value)
+
+        for scorer, score in (sample.get("scores") or {}).items():
+            for name, value in _score_items(f"score.{scorer}", (score or {}).get("value")):
+                values = self.scores.setdefault(name, array("d"))
+                values.extend([float("nan")] * (row + 1 - len(values)))
+                values[row] = value
+
+    def add_reduction(self, reduction):
+        prefix = f"reduced.{reduction.get('reducer')}.{reduction.get('scorer')}"
+        for reduced in reduction.get("samples") or []:
+            for name, value in _score_items(prefix, reduced.get("value")):
+                self.reduced.append((reduced.get("sample_id"), name, value))
+
+    def columns(self):
+        """The columns, with rows ordered by sample id and epoch.
+
+        Scores become `score.<scorer>` columns (`score.<scorer>.<key>` for
+        dict values) and reduced scores `reduced.<reducer>.<scorer>`
+        columns, repeated for every epoch of a sample. Missing values are NaN.
+        """
+        import numpy as np
+
+        count = len(self.ids)
+        numeric_ids = all(isinstance(sample_id, int) and not isinstance(sample_id, bool) for sample_id in self.ids)
+        ids = self.ids if numeric_ids else [str(sample_id) for sample_id in self.ids]
+        ids = np.array(ids, dtype=np.int64 if numeric_ids else str)
+        epochs = np.array(self.epochs, dtype=np.int32)
+        order = np.lexsort((epochs, ids))
+
+        columns = {
+            "id": ids[order],
+            "epoch": epochs[order],
+            "error": np.array(self.errors, dtype=bool)[order],
+        }
+        for column in TOKEN_COLUMNS:
+            columns[column] = np.array(self.values[column], dtype=np.int64)[order]
+        for column in TIME_COLUMNS:
+            columns[column] = np.array(self.values[column], dtype=np.float64)[order]
+        for name, values in self.scores.items():
+            values = np.concatenate([np.array(values, dtype=np.float64), np.full(count - len(values), np.nan)])
+            columns[name] = values[order]
+
+        rows_by_id = {}
+        for row, sample_id in enumerate(columns["id"].tolist()):
+            rows_by_id.setdefault(sample_id, []).append(row)
+
+        for sample_id, name, value in self.reduced:
+            sample_id = sample_id if numeric_ids else str(sample_id)
+            if name not in columns:
+                columns[name] = np.full(count, np.nan)
+            for row in rows_by_id.get(sample_id, ()):
+                columns[name][row] = value
+
+        return columns
+
+
+def extract_columns(samples, reductions=None):
+    """Turn the `samples` and `reductions` of a log into columns (see `ColumnBuilder`)."""
+    builder = ColumnBuilder()
+    for sample in samples:
+        builder.add_sample(sample)
+    for reduction in reductions or []:
+        builder.add_reduction(reduction)
+    return builder.columns()
+
+
+def write_sidecar(path, columns):
+    """Write columns as an uncompressed `.npz`, atomically."""
+    import numpy as np
+
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Stored (not deflated) members can be memory-mapped by `load_samples`
+            np.savez(f, **columns)
+        os.replace(tmp_name, path)
+        profiling.count(bytes_written=path.stat().st_size)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_samples(path, columns=None):
+    """Memory-map the columns of a sidecar (all of them by default).
+
+    Accepts the sidecar or the log it belongs to. Only the requested columns
+    are touched; their data is paged in from disk as it is read.
+    """
+    import numpy as np
+
+    path = Path(path)
+    if not path.name.endswith(SIDECAR_SUFFIX):
+        path = sidecar_path(path)
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, path.open("rb") as f:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if columns is not None and name not in columns:
+                continue
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Column {name} of {path} is compressed and cannot be memory-mapped")
+
+            # The member data follows its local header: 30 fixed bytes,
+            # then the file name and the extra field
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode="r",
+                shape=shape,
+                order="F" if fortran_order else "C",
+                offset=f.tell(),
+            )
+
+    missing = set(columns or ()) - set(arrays)
+    if missing:
+        raise KeyError(f"{path} has no column(s) {', '.join(sorted(missing))}")
+
+    return arrays
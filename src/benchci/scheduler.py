@@ -0,0 +1,255 @@
+import time
+import threading
+from dataclasses import replace, dataclass
+
+
+@dataclass(frozen=True)
+class Job:
+    """A single (model, eval) evaluation task, or one sample shard of it."""
+
+    run_name: str
+    model_name: str
+    eval_name: str
+    limit: int = 0
+    shard: int = 0
+    shards: int = 1
+    sample_range: tuple = None
+
+    @property
+    def provider(self):
+        """Provider prefix of the model name, e.g. `openrouter`."""
+        return self.model_name.split("/", 1)[0]
+
+    @property
+    def base(self):
+        """The unsharded job this job belongs to."""
+        return replace(self, shard=0, shards=1, sample_range=None)
+
+
+def expand_jobs(config):
+    """Expand the configured evaluation runs into jobs, in config order."""
+    jobs = []
+    for run_name, run_config in config["evaluation"]["runs"].items():
+        model_name = run_config.get("model")
+        limit = run_config.get("limit", 0)
+        for eval_name in run_config.get("evals", []):
+            jobs.append(Job(run_name, model_name, eval_name, limit))
+    return jobs
+
+
+class TokenBucket:
+    """Per-minute token bucket that can go into debt.
+
+    A request is admitted while the bucket holds at least its cost (capped
+    at the bucket capacity so oversized requests are not starved). Usage
+    that turns out larger than estimated is charged afterwards and blocks
+    new requests until the bucket refills.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount):
+        """Take `amount` from the bucket if it currently allows it."""
+        self._refill()
+        if self.level < min(amount, self.capacity):
+            return False
+        self.level -= amount
+        return True
+
+    def charge(self, amount):
+        """Adjust the bucket by usage discovered after the fact."""
+        self._refill()
+        self.level -= amount
+
+    def wait_time(self, amount):
+        """Seconds until `amount` could be acquired."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+def make_buckets(scheduler_config):
+    """Token buckets of the configured rate limits, keyed by (scope, name, kind)."""
+    buckets = {}
+    for scope, section in (("provider", "providers"), ("model", "models")):
+        for name, options in (scheduler_config.get(section, {}) or {}).items():
+            for kind in ("requests", "tokens"):
+                per_minute = (options or {}).get(f"{kind}_per_minute")
+                if per_minute:
+                    buckets[(scope, name, kind)] = TokenBucket(per_minute)
+    return buckets
+
+
+def model_scopes(model_name):
+    return (("provider", model_name.split("/", 1)[0]), ("model", model_name))
+
+
+class RateLimiter:
+    """Per-request enforcement of the `requests_per_minute` and `tokens_per_minute` limits.
+
+    Every model request of every eval worker passes through the API proxy
+    (see `benchci.responsecache`), which calls `acquire` before sending it
+    upstream and `charge` with the tokens its response used. A request
+    waits while a request bucket of its model or provider is empty, or a
+    token bucket is in debt. Thread-safe.
+    """
+
+    def __init__(self, scheduler_config):
+        self.buckets = make_buckets(scheduler_config)
+        self.lock = threading.Lock()
+        self.stats = {"delayed": 0, "waited": 0.0}
+
+    def __bool__(self):
+        return bool(self.buckets)
+
+    def _buckets(self, model_name, kind):
+        scopes = model_scopes(model_name)
+        return [
+            bucket
+            for (scope, name, bucket_kind), bucket in self.buckets.items()
+            if bucket_kind == kind and (scope, name) in scopes
+        ]
+
+    def acquire(self, model_name):
+        """Block until a request to `model_name` fits its budgets, then take one request."""
+        started = time.monotonic()
+        delayed = False
+        while True:
+            with self.lock:
+                waits = [bucket.wait_time(1) for bucket in self._buckets(model_name, "requests")]
+                waits += [bucket.wait_time(0) for bucket in self._buckets(model_name, "tokens")]
+                wait = max(waits, default=0.0)
+                if wait <= 0:
+                    for bucket in self._buckets(model_name, "requests"):
+                        bucket.try_acquire(1)
+                    if delayed:
+                        self.stats["delayed"] += 1
+                        self.stats["waited"] += time.monotonic() - started
+                    return
+            delayed = True
+            time.sleep(wait)
+
+    def charge(self, model_name, tokens):
+        """Charge the tokens a response used to the model's token budgets."""
+        with self.lock:
+            for bucket in self._buckets(model_name, "tokens"):
+                bucket.charge(tokens)
+
+
+class Scheduler:
+    """Admission control for evaluation jobs.
+
+    Limits are read from the `evaluation.scheduler` config section, keyed by
+    provider (`providers`) and by full model name (`models`):
+
+        max_concurrency:     evals running at once
+        max_connections:     parallel model requests inside one eval
+        requests_per_minute: request budget (token bucket)
+        tokens_per_minute:   token budget (token bucket)
+
+    For the providers in `enforced`, rate limits are enforced per model
+    request by a `RateLimiter` and only concurrency is checked here. For
+    other providers they are admission budgets: each eval is charged its
+    estimated cost (one request per sample) when it starts and trued up
+    with its actual usage when it finishes.
+    """
+
+    def __init__(self, scheduler_config, estimates=None, sample_counts=None, enforced=()):
+        self.providers = scheduler_config.get("providers", {}) or {}
+        self.models = scheduler_config.get("models", {}) or {}
+        self.estimates = estimates or {}
+        self.sample_counts = sample_counts or {}
+        self.enforced = set(enforced)
+        self.running = {}
+        self.charged = {}
+        self.buckets = make_buckets(scheduler_config)
+
+    def _scopes(self, job):
+        return model_scopes(job.model_name)
+
+    def _buckets(self, job):
+        """The `(kind, bucket)` admission budgets of a job."""
+        if job.provider in self.enforced:
+            return []
+        return [
+            (kind, bucket)
+            for (scope, name, kind), bucket in self.buckets.items()
+            if (scope, name) in self._scopes(job)
+        ]
+
+    def _limits(self, scope, name):
+        source = self.providers if scope == "provider" else self.models
+        return source.get(name) or {}
+
+    def estimate(self, job):
+        """Estimated (requests, tokens) cost of a job."""
+        if job.sample_range:
+            requests = job.sample_range[1] - job.sample_range[0]
+        else:
+            # openbench runs a single epoch, so an eval makes a request per sample
+            requests = (job.limit or self.sample_counts.get(job.eval_name, 0)) / job.shards
+        tokens = self.estimates.get((job.model_name, job.eval_name), 0) / job.shards
+        return {"requests": requests, "tokens": tokens}
+
+    def max_connections(self, job):
+        """Per-eval request concurrency for a job, or None for the default."""
+        model_limit = self._limits("model", job.model_name).get("max_connections")
+        if model_limit:
+            return model_limit
+
+        provider_limits = self._limits("provider", job.provider)
+        if not provider_limits.get("max_connections"):
+            return None
+        # Share the provider's connection budget between its concurrent evals
+        share = provider_limits.get("max_concurrency") or 1
+        return max(1, provider_limits["max_connections"] // share)
+
+    def admit(self, job):
+        """Reserve capacity for a job, returning False if it must wait."""
+        for scope, name in self._scopes(job):
+            cap = self._limits(scope, name).get("max_concurrency")
+            if cap and self.running.get((scope, name), 0) >= max(1, cap):
+                return False
+
+        cost = self.estimate(job)
+        buckets = [(bucket, cost[kind]) for kind, bucket in self._buckets(job)]
+        if any(bucket.wait_time(amount) > 0 for bucket, amount in buckets):
+            return False
+
+        for bucket, amount in buckets:
+            bucket.try_acquire(amount)
+        for key in self._scopes(job):
+            self.running[key] = self.running.get(key, 0) + 1
+        self.charged[id(job)] = cost
+        return True
+
+    def release(self, job, usage=None):
+        """Free a job's slots and charge any usage beyond its estimate."""
+        for key in self._scopes(job):
+            self.running[key] -= 1
+
+        cost = self.charged.pop(id(job), {"requests": 0, "tokens": 0})
+        if not usage:
+            return
+        for kind, bucket in self._buckets(job):
+            bucket.charge(usage.get(kind, 0) - cost[kind])
+
+    def wait_time(self, jobs):
+        """Seconds until a rate-limited job may be admitted, or None."""
+        waits = []
+        for job in jobs:
+            cost = self.estimate(job)
+            job_waits = [bucket.wait_time(cost[kind]) for kind, bucket in self._buckets(job)]
+            if job_waits:
+                waits.append(max(job_waits))
+        positive = [wait for wait in waits if wait > 0]
+        return min(positive) if positive else None
@@ -1,21 +1,392 @@
 import os
-import http.server
-import socketserver
+import gzip
+import json
+import time
+import queue
+import fnmatch
+import hashlib
+import threading
+from http import HTTPStatus
 from pathlib import Path
+from functools import partial
 
 
-def start_server(config, port: int = 8000):
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Text assets worth serving pre-compressed
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt")
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Assets cached for a year by default. Only data shards are named by their
+# content; charts and pages are rebuilt under the same name and revalidated
+IMMUTABLE = ("data/shards/*",)
+
+# Seconds between keep-alive comments on idle event streams
+KEEPALIVE_INTERVAL = 15
+
+# Seconds between telemetry snapshots sent to `/telemetry` clients
+TELEMETRY_INTERVAL = 1.0
+
+
+def precompress_reports(reports_path, min_size=512):
+    """Write `.gz` (and `.br`, if brotli is installed) variants of text assets.
+
+    Variants are only rewritten when older than their source, and gzip output
+    is deterministic so unchanged files produce identical bytes.
+    """
+    from . import profiling
+
+    with profiling.span("server.precompress_reports"):
+        written = _precompress(Path(reports_path), min_size)
+    if written:
+        print(f"Pre-compressed {written} report assets in {reports_path}")
+
+
+def _precompress(reports_path, min_size):
+    written = 0
+    for file_path in Path(reports_path).rglob("*"):
+        if not file_path.is_file() or file_path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        if file_path.stat().st_size < min_size:
+            continue
+
+        source_mtime = file_path.stat().st_mtime_ns
+        for encoding, suffix in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+
+            variant = file_path.with_name(file_path.name + suffix)
+            if variant.exists() and variant.stat().st_mtime_ns >= source_mtime:
+                continue
+
+            data = file_path.read_bytes()
+            if encoding == "br":
+                compressed = brotli.compress(data)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            variant.write_bytes(compressed)
+            written += 1
+    return written
+
+
+class ETagCache:
+    """Thread-safe cache of content hashes keyed by path, size and mtime."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, stat):
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == key:
+                return entry[1]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+
+        with self._lock:
+            self._entries[path] = (key, etag)
+        return etag
+
+
+class EventStream:
+    """Fan-out of server-sent events to every connected client."""
+
+    def __init__(self):
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        client = queue.Queue()
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    @staticmethod
+    def format(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+    def publish(self, event, data):
+        message = self.format(event, data)
+        with self._lock:
+            for client in self._clients:
+                client.put(message)
+
+
+class ReportRequestHandler:
+    """Static file handler with pre-compressed variants, ETags and caching.
+
+    When the server has an `EventStream`, `/events` streams its events. With
+    evaluation telemetry, `/metrics` exposes the progress of the running
+    evaluation to Prometheus and `/telemetry` streams it to browsers.
+
+    A mixin over `http.server.SimpleHTTPRequestHandler`, combined with it by
+    `make_server`, so that resolving the `serve` command does not import
+    `http.server` (and the email and http.client modules it pulls in).
+    """
+
+    etags = ETagCache()
+    immutable = ()
+    max_age = 0
+    events = None
+    metrics = None
+    telemetry_events = None
+    span = None
+
+    def do_GET(self):
+        with self.span("server.GET", path=self.path):
+            route = self.path.split("?", 1)[0]
+            if self.events is not None and route == "/events":
+                self.stream_events(self.events)
+            elif self.metrics is not None and route == "/metrics":
+                self.send_metrics()
+            elif self.telemetry_events is not None and route == "/telemetry":
+                # New clients start from the current progress, not the next update
+                snapshot = EventStream.format("telemetry", {"jobs": self.metrics.snapshot()})
+                self.stream_events(self.telemetry_events, snapshot)
+            else:
+                super().do_GET()
+
+    def send_metrics(self):
+        body = self.metrics.prometheus().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self, events, initial=None):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+
+        client = events.subscribe()
+        try:
+            self.wfile.write(b"retry: 2000\n\n")
+            if initial:
+                self.wfile.write(initial)
+            self.wfile.flush()
+            while True:
+                try:
+                    message = client.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    message = b": keepalive\n\n"
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            events.unsubscribe(client)
+
+    def accepted_encodings(self):
+        header = self.headers.get("Accept-Encoding", "")
+        accepted = set()
+        for part in header.split(","):
+            name, _, params = part.strip().partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+                continue
+            accepted.add(name.strip().lower())
+        return accepted
+
+    def choose_variant(self, path):
+        """Return the (encoding, path) to serve for a file."""
+        accepted = self.accepted_encodings()
+        source_mtime = os.stat(path).st_mtime_ns
+        for encoding, suffix in ENCODINGS:
+            variant = path + suffix
+            if encoding in accepted and os.path.isfile(variant):
+                # Ignore variants left over from an older build
+                if os.stat(variant).st_mtime_ns >= source_mtime:
+                    return encoding, variant
+        return None, path
+
+    def cache_control(self, path):
+        relative = os.path.relpath(path, self.directory)
+        if any(fnmatch.fnmatch(relative, pattern) for pattern in self.immutable):
+            return "public, max-age=31536000, immutable"
+        if self.max_age:
+            return f"public, max-age={self.max_age}"
+        # Always revalidate; unchanged files are answered with 304
+        return "no-cache"
+
+    def send_live_header(self):
+        # Tells pages that `/events` exists; see live_updates.j2
+        if self.events is not None:
+            self.send_header("X-Benchci-Events", "events")
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            index = os.path.join(path, "index.html")
+            if os.path.isfile(index):
+                path = index
+
+        if not os.path.isfile(path):
+            # Directory listings, redirects and 404s
+            return super().send_head()
+
+        encoding, served = self.choose_variant(path)
+        stat = os.stat(served)
+        etag = self.etags.get(served, stat)
+        cache_control = self.cache_control(path)
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_live_header()
+            self.end_headers()
+            return None
+
+        f = open(served, "rb")
+        try:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Length", str(stat.st_size))
+            self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Vary", "Accept-Encoding")
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.send_live_header()
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+
+def make_server(reports_path, port, serve_config=None, events=None, metrics=None, telemetry_events=None):
+    """Create a threaded HTTP server for the reports directory."""
+    import http.server
+    from . import profiling
+
+    serve_config = serve_config or {}
+    handler = type(
+        "ConfiguredReportRequestHandler",
+        (ReportRequestHandler, http.server.SimpleHTTPRequestHandler),
+        {
+            "span": staticmethod(profiling.span),
+            "immutable": tuple(serve_config.get("immutable", IMMUTABLE)),
+            "max_age": serve_config.get("max_age", 0),
+            "events": events,
+            "metrics": metrics,
+            "telemetry_events": telemetry_events,
+        },
+    )
+    httpd = http.server.ThreadingHTTPServer(
+        ("", port), partial(handler, directory=str(reports_path))
+    )
+    httpd.daemon_threads = True
+    return httpd
+
+
+def watch_reports(config, reports_path, events):
+    """Rebuild the reports as logs arrive and notify connected browsers."""
+    # Only needed in watch mode; keeps plain `serve` free of numpy and jinja2
+    from .watch import watch_logs
+    from .reports.build import refresh_reports
+
+    serve_config = config["evaluation"].get("serve", {})
+    logs_path = config["evaluation"]["output"]["logs"]
+
+    def on_change():
+        try:
+            written = refresh_reports(config)
+        except Exception as e:
+            # Keep watching; the next change triggers another attempt
+            print(f"Error rebuilding reports: {e}")
+            return
+        if not written:
+            return
+
+        if serve_config.get("precompress", True):
+            precompress_reports(reports_path)
+        events.publish("update", {"artifacts": written})
+        print(f"Updated {', '.join(written)}")
+
+    print(f"Watching {logs_path} for new logs")
+    watch_logs(logs_path, on_change, interval=serve_config.get("poll_interval", 1.0))
+
+
+def follow_telemetry(path, metrics, telemetry_events):
+    """Feed the evaluation's telemetry file into `metrics` and publish snapshots."""
+    from . import telemetry
+
+    last_published = 0.0
+
+    def on_events(events):
+        nonlocal last_published
+        if events is None:
+            # A new evaluation started over
+            metrics.reset()
+            return
+        for event in events:
+            metrics.add(event)
+
+        now = time.monotonic()
+        if now - last_published >= TELEMETRY_INTERVAL:
+            last_published = now
+            telemetry_events.publish("telemetry", {"jobs": metrics.snapshot()})
+
+    print(f"Following evaluation telemetry in {path}")
+    telemetry.follow(path, on_events, interval=TELEMETRY_INTERVAL)
+
+
+def start_server(config, port: int = 8000, watch: bool = False):
+    from . import telemetry
+
     reports_path = Path(config["evaluation"]["output"]["reports"]).resolve()
 
-    if not reports_path.exists() or not reports_path.is_dir():
+    if watch:
+        reports_path.mkdir(parents=True, exist_ok=True)
+    elif not reports_path.exists() or not reports_path.is_dir():
         raise FileNotFoundError(f"Reports directory not found: {reports_path}")
 
-    os.chdir(reports_path)
+    serve_config = config["evaluation"].get("serve", {})
+    if serve_config.get("precompress", True):
+        precompress_reports(reports_path)
 
-    handler = http.server.SimpleHTTPRequestHandler
-    httpd = socketserver.TCPServer(("", port), handler)
+    events = EventStream() if watch else None
+    metrics = telemetry_events = None
+    telemetry_path = telemetry.telemetry_path(config)
+    if telemetry_path is not None:
+        metrics, telemetry_events = telemetry.Metrics(), EventStream()
+        threading.Thread(
+            target=follow_telemetry, args=(telemetry_path, metrics, telemetry_events), daemon=True
+        ).start()
+    httpd = make_server(reports_path, port, serve_config, events, metrics, telemetry_events)
 
     print(f"Serving reports from {reports_path} at http://localhost:{port}")
     with httpd:
-        httpd.RequestHandlerClass.directory = str(reports_path)
-        httpd.serve_forever()
+        if not watch:
+            httpd.serve_forever()
+            return
+
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            watch_reports(config, reports_path, events)
+        finally:
+            httpd.shutdown()
@@ -0,0 +1,167 @@
+import json
+import math
+from pathlib import Path
+from dataclasses import replace
+from . import logio
+
+
+def shard_ranges(total, shards):
+    """Split `total` samples into `shards` contiguous `(start, end)` ranges."""
+    shards = max(1, min(shards, total))
+    return [(i * total // shards, (i + 1) * total // shards) for i in range(shards)]
+
+
+def split_job(job, shards, total):
+    """Split a job into sample-range shards, or return it unchanged."""
+    if shards <= 1:
+        return [job]
+    if not total:
+        print(f"Not sharding {job.eval_name}: its dataset size is unknown until it has run once")
+        return [job]
+
+    if job.limit:
+        total = min(total, job.limit)
+
+    ranges = shard_ranges(total, shards)
+    return [
+        replace(job, shard=shard, shards=len(ranges), sample_range=sample_range)
+        for shard, sample_range in enumerate(ranges)
+    ]
+
+
+def shard_logfile(logfile, shard, shards):
+    """Name of the log written by one shard of an eval."""
+    return f"{logfile}_shard{shard + 1}of{shards}"
+
+
+def combine_metric(name, shard_metrics, counts):
+    """Combine one metric across shards.
+
+    `accuracy`/`mean` are weighted by each shard's scored samples and
+    `stderr` is recomputed exactly from the pooled variance, since every
+    shard's sample variance can be recovered from its mean and stderr.
+    Other metrics have no general combination rule and fall back to a
+    weighted mean.
+    """
+    total = sum(counts)
+    if total == 0:
+        return 0.0
+
+    if name != "stderr":
+        return sum(value * n for value, n in zip(shard_metrics[name], counts)) / total
+
+    # Recover the mean used by stderr from the accuracy/mean metric
+    mean_name = "accuracy" if "accuracy" in shard_metrics else "mean"
+    if mean_name not in shard_metrics or total < 2:
+        return 0.0
+
+    means = shard_metrics[mean_name]
+    pooled_mean = sum(m * n for m, n in zip(means, counts)) / total
+    sum_squares = 0.0
+    for mean, stderr, n in zip(means, shard_metrics["stderr"], counts):
+        variance = (stderr * math.sqrt(n)) ** 2
+        sum_squares += (n - 1) * variance + n * (mean - pooled_mean) ** 2
+
+    return math.sqrt(sum_squares / (total - 1)) / math.sqrt(total)
+
+
+def merge_scores(shard_scores):
+    """Merge the `results.scores` lists of several shards."""
+    merged = []
+    for scores in zip(*shard_scores):
+        counts = [score.get("scored_samples", 0) for score in scores]
+        metric_values = {
+            name: [score["metrics"][name]["value"] for score in scores]
+            for name in scores[0]["metrics"]
+        }
+
+        combined = json.loads(json.dumps(scores[0]))
+        combined["scored_samples"] = sum(counts)
+        combined["unscored_samples"] = sum(score.get("unscored_samples", 0) for score in scores)
+        for name, metric in combined["metrics"].items():
+            metric["value"] = combine_metric(name, metric_values, counts)
+        merged.append(combined)
+
+    return merged
+
+
+def merge_model_usage(shard_usages):
+    """Sum token usage per model across shards."""
+    merged = {}
+    for usages in shard_usages:
+        for model, usage in usages.items():
+            totals = merged.setdefault(model, {})
+            for key, value in usage.items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+    return merged
+
+
+def merge_reductions(shard_reductions):
+    """Concatenate the per-sample reductions of each scorer across shards."""
+    merged = {}
+    for reductions in shard_reductions:
+        for reduction in reductions:
+            key = (reduction.get("scorer"), reduction.get("reducer"))
+            if key not in merged:
+                merged[key] = {**reduction, "samples": []}
+            merged[key]["samples"].extend(reduction.get("samples", []))
+    return list(merged.values())
+
+
+def merge_logs(logs):
+    """Merge openbench logs of the shards of one eval into a single log."""
+    merged = json.loads(json.dumps(logs[0]))
+
+    # `dataset.samples` is the full dataset size in every shard already
+    dataset = merged["eval"]["dataset"]
+    if "sample_ids" in dataset:
+        dataset["sample_ids"] = [
+            sample_id for log in logs for sample_id in log["eval"]["dataset"].get("sample_ids", [])
+        ]
+    merged["eval"]["created"] = min(log["eval"]["created"] for log in logs)
+    merged["eval"]["config"].pop("limit", None)
+
+    if all("results" in log for log in logs):
+        results = merged["results"]
+        results["total_samples"] = sum(log["results"]["total_samples"] for log in logs)
+        results["completed_samples"] = sum(log["results"]["completed_samples"] for log in logs)
+        results["scores"] = merge_scores([log["results"]["scores"] for log in logs])
+
+    stats = merged["stats"]
+    stats["started_at"] = min(log["stats"]["started_at"] for log in logs)
+    stats["completed_at"] = max(log["stats"]["completed_at"] for log in logs)
+    stats["model_usage"] = merge_model_usage([log["stats"].get("model_usage", {}) for log in logs])
+
+    if any("samples" in log for log in logs):
+        merged["samples"] = [sample for log in logs for sample in log.get("samples", [])]
+    if any("reductions" in log for log in logs):
+        merged["reductions"] = merge_reductions([log.get("reductions", []) for log in logs])
+
+    errored = [log for log in logs if log.get("status") != "success"]
+    if errored:
+        merged["status"] = errored[0].get("status", "error")
+        merged["error"] = errored[0].get("error")
+
+    return merged
+
+
+def merge_shard_files(shard_paths, output_path):
+    """Merge shard logs (in sample order) into `output_path` and remove them.
+
+    Shards may be plain or compressed; the suffix of `output_path` decides
+    how the merged log is written. Samples are streamed from the shards into
+    the merged log one at a time, so no log is ever in memory whole, and the
+    merged log is returned without them.
+    """
+    shard_paths = [Path(shard_path) for shard_path in shard_paths]
+    logs = [logio.read_compacted(shard_path, dropped=("samples",)) for shard_path in shard_paths]
+
+    merged = merge_logs(logs)
+    samples = (sample for shard_path in shard_paths for sample in logio.iter_member(shard_path, "samples"))
+    logio.write_log(output_path, merged, streams={"samples": samples})
+
+    for shard_path in shard_paths:
+        Path(shard_path).unlink()
+
+    return merged
@@ -0,0 +1,362 @@
+import json
+import sqlite3
+from pathlib import Path
+from . import profiling
+from datetime import datetime, timezone, timedelta
+
+
+# Bump when the derived tables change; they are rebuilt from the logs
+SCHEMA_VERSION = 4
+
+DERIVED_TABLES = ("results", "ingest_manifest")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    source              TEXT NOT NULL,
+    model               TEXT NOT NULL,
+    eval_name           TEXT NOT NULL,
+    timestamp           TEXT NOT NULL,
+    created_at          REAL,
+    score               REAL,
+    additional_metrics  TEXT NOT NULL DEFAULT '{}',
+    total_input_tokens  INTEGER NOT NULL DEFAULT 0,
+    total_output_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens        INTEGER NOT NULL DEFAULT 0,
+    samples             INTEGER,
+    duration            REAL
+);
+
+CREATE INDEX IF NOT EXISTS results_model ON results (model);
+CREATE INDEX IF NOT EXISTS results_eval_name ON results (eval_name);
+CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+CREATE INDEX IF NOT EXISTS results_source ON results (source);
+CREATE INDEX IF NOT EXISTS results_pair ON results (model, eval_name, created_at);
+
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256   TEXT NOT NULL,
+    status   TEXT,
+    error    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS build_manifest (
+    artifact TEXT PRIMARY KEY,
+    digest   TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS run_cache (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    eval_name  TEXT NOT NULL,
+    logfile    TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+RESULT_COLUMNS = (
+    "model",
+    "timestamp",
+    "eval_name",
+    "score",
+    "additional_metrics",
+    "total_input_tokens",
+    "total_output_tokens",
+    "total_tokens",
+)
+
+
+# Where the store lives unless `output.store` says otherwise; like the
+# response cache, not under the reports, which are published
+DEFAULT_PATH = ".benchci/results.db"
+
+
+def get_store_path(config):
+    """Return the path of the results store for a configuration."""
+    return Path(config["evaluation"]["output"].get("store", DEFAULT_PATH))
+
+
+def connect(store_path):
+    """Open the results store, creating the schema if needed."""
+    Path(store_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(store_path))
+    conn.row_factory = sqlite3.Row
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        # Derived tables are rebuilt by the next ingest; the run cache is kept
+        for table in DERIVED_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_created_at(timestamp):
+    """Convert an ISO timestamp into epoch seconds, or None."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def load_manifest(conn):
+    """Return the ingest manifest as a dict keyed by log path."""
+    rows = conn.execute("SELECT path, size, mtime_ns, sha256, status, error FROM ingest_manifest")
+    return {row["path"]: dict(row) for row in rows}
+
+
+def record_file(conn, path, size, mtime_ns, sha256, status=None, error=None):
+    """Record (or refresh) a log file in the ingest manifest.
+
+    `status` is the run's status ("invalid" for logs that could not be
+    parsed) and `error` its error message, so errored logs can be found
+    without reading the logs again.
+    """
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO ingest_manifest (path, size, mtime_ns, sha256, status, error)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (path, size, mtime_ns, sha256, status, error),
+    )
+
+
+def errored_logs(conn, patterns=None):
+    """Return `(path, error)` of the logs of failed runs.
+
+    With `patterns`, only logs whose error contains one of them (ignoring
+    case) are returned. Runs that are still in progress never count.
+    """
+    rows = conn.execute(
+        """
+        SELECT path, error FROM ingest_manifest
+        WHERE status IS NOT NULL AND status NOT IN ('success', 'started')
+        ORDER BY path
+        """
+    )
+    errored = [(row["path"], row["error"] or "") for row in rows]
+    if patterns is None:
+        return errored
+
+    patterns = [pattern.lower() for pattern in patterns]
+    return [
+        (path, error)
+        for path, error in errored
+        if any(pattern in error.lower() for pattern in patterns)
+    ]
+
+
+def runs_beyond(conn, keep_runs, exclude_prefix):
+    """Return the successful runs older than the newest `keep_runs` per (model, eval).
+
+    Rows come grouped by model and eval, oldest first. Results whose source
+    starts with `exclude_prefix` are neither returned nor counted.
+    """
+    rows = conn.execute(
+        """
+        SELECT * FROM (
+            SELECT r.*, ROW_NUMBER() OVER (
+                PARTITION BY r.model, r.eval_name ORDER BY r.created_at DESC, r.id DESC
+            ) AS newer
+            FROM results r
+            WHERE r.score IS NOT NULL AND r.source NOT LIKE ? || '%'
+        )
+        WHERE newer > ?
+        ORDER BY model, eval_name, created_at, id
+        """,
+        (exclude_prefix, keep_runs),
+    )
+    return [{**row_to_entry(row), "source": row["source"]} for row in rows]
+
+
+def forget_files(conn, paths):
+    """Remove log files and their results from the store."""
+    for path in paths:
+        conn.execute("DELETE FROM ingest_manifest WHERE path = ?", (path,))
+        conn.execute("DELETE FROM results WHERE source = ?", (path,))
+
+
+def load_build_manifest(conn):
+    """Return the input digest each report artifact was last built from."""
+    rows = conn.execute("SELECT artifact, digest FROM build_manifest")
+    return {row["artifact"]: row["digest"] for row in rows}
+
+
+def record_build(conn, artifact, digest):
+    """Record the input digest a report artifact was built from."""
+    conn.execute(
+        "INSERT OR REPLACE INTO build_manifest (artifact, digest) VALUES (?, ?)",
+        (artifact, digest),
+    )
+
+
+def insert_entry(conn, source, entry, samples=None, duration=None):
+    """Append a database entry produced from the given log file.
+
+    `duration` is the wall-clock seconds the run took, when its log says.
+    """
+    score = entry["score"]
+    conn.execute(
+        """
+        INSERT INTO results (
+            source, model, eval_name, timestamp, created_at, score, additional_metrics,
+            total_input_tokens, total_output_tokens, total_tokens, samples, duration
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            source,
+            entry["model"],
+            entry["eval_name"],
+            entry["timestamp"],
+            parse_created_at(entry["timestamp"]),
+            score if isinstance(score, (int, float)) else None,
+            json.dumps(entry["additional_metrics"]),
+            entry["total_input_tokens"],
+            entry["total_output_tokens"],
+            entry["total_tokens"],
+            samples,
+            duration,
+        ),
+    )
+
+
+def row_to_entry(row):
+    """Convert a results row back into the `database.json` entry format."""
+    entry = {column: row[column] for column in RESULT_COLUMNS}
+    entry["score"] = "Error" if entry["score"] is None else entry["score"]
+    entry["additional_metrics"] = json.loads(entry["additional_metrics"])
+    return entry
+
+
+@profiling.traced
+def query_results(
+    conn,
+    model=None,
+    eval_name=None,
+    since=None,
+    latest=False,
+    include_errors=True,
+):
+    """Query results using the store's indexes.
+
+    Args:
+        model: Only return results for this model.
+        eval_name: Only return results for this evaluation.
+        since: Only return results created at or after this datetime.
+        latest: Only return the most recent run per model and evaluation.
+        include_errors: Include runs that did not produce a score.
+    """
+    clauses = []
+    params = []
+
+    if model is not None:
+        clauses.append("r.model = ?")
+        params.append(model)
+    if eval_name is not None:
+        clauses.append("r.eval_name = ?")
+        params.append(eval_name)
+    if since is not None:
+        clauses.append("r.created_at >= ?")
+        params.append(since.timestamp())
+    if not include_errors:
+        clauses.append("r.score IS NOT NULL")
+    if latest:
+        clauses.append(
+            f"""
+            r.id = (
+                SELECT l.id FROM results l
+                WHERE l.model = r.model AND l.eval_name = r.eval_name
+                {"" if include_errors else "AND l.score IS NOT NULL"}
+                ORDER BY l.created_at DESC, l.id DESC
+                LIMIT 1
+            )
+            """
+        )
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"SELECT * FROM results r {where} ORDER BY r.source, r.id", params)
+    return [row_to_entry(row) for row in rows]
+
+
+def task_name(eval_name):
+    """Strip the registry prefix from a logged task, e.g. `openbench/math_500`."""
+    return eval_name.rsplit("/", 1)[-1]
+
+
+def mean_usage(conn):
+    """Return the mean total tokens of successful runs per (model, eval)."""
+    rows = conn.execute(
+        """
+        SELECT model, eval_name, AVG(total_tokens) AS tokens
+        FROM results
+        WHERE score IS NOT NULL
+        GROUP BY model, eval_name
+        """
+    )
+    return {(row["model"], task_name(row["eval_name"])): row["tokens"] for row in rows}
+
+
+def run_durations(conn):
+    """Return `(model, eval, seconds, tokens)` of every successful run with a known duration."""
+    rows = conn.execute(
+        """
+        SELECT model, eval_name, duration, total_tokens
+        FROM results
+        WHERE score IS NOT NULL AND duration > 0
+        ORDER BY created_at, id
+        """
+    )
+    return [(row["model"], task_name(row["eval_name"]), row["duration"], row["total_tokens"]) for row in rows]
+
+
+def latest_scores(conn):
+    """Return the most recent successful score per (model, eval)."""
+    return {
+        (entry["model"], task_name(entry["eval_name"])): entry["score"]
+        for entry in query_results(conn, latest=True, include_errors=False)
+    }
+
+
+def sample_counts(conn):
+    """Return the largest logged dataset size per eval."""
+    rows = conn.execute(
+        "SELECT eval_name, MAX(samples) AS samples FROM results WHERE samples IS NOT NULL GROUP BY eval_name"
+    )
+    counts = {}
+    for row in rows:
+        name = task_name(row["eval_name"])
+        counts[name] = max(counts.get(name, 0), row["samples"])
+    return counts
+
+
+def report_filters(config):
+    """Return the `query_results` filters configured for the reports."""
+    report_config = config["evaluation"].get("reports", {})
+    filters = {}
+    if report_config.get("latest"):
+        filters["latest"] = True
+    if report_config.get("days"):
+        filters["since"] = datetime.now(timezone.utc) - timedelta(days=report_config["days"])
+    return filters
+
+
+def load_results(config, **filters):
+    """Load results for the reports, applying the configured report filters."""
+    store_path = get_store_path(config)
+    if not store_path.exists():
+        print(f"Results store not found at {store_path}")
+        return []
+
+    filters = {**report_filters(config), **filters}
+
+    conn = connect(store_path)
+    try:
+        data = query_results(conn, **filters)
+    finally:
+        conn.close()
+
+    print(f"Loaded {len(data)} records from {store_path}")
+    return data
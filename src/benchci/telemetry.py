@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from collections import deque
+
+
+# Set by `run_evaluation` so that eval workers (and their inspect hooks)
+# append their events to the same JSON-lines file
+TELEMETRY_ENV = "BENCHCI_TELEMETRY"
+
+DEFAULT_PATH = ".benchci/telemetry.jsonl"
+
+# Seconds of events the token and sample rates are computed over
+RATE_WINDOW = 60.0
+
+# Model calls kept per (model, eval) for the latency quantiles
+LATENCY_SAMPLES = 1000
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def telemetry_path(config):
+    """The configured event file, or None when telemetry is turned off."""
+    telemetry_config = config["evaluation"].get("telemetry", {})
+    if not telemetry_config.get("enabled", True):
+        return None
+    return Path(telemetry_config.get("path", DEFAULT_PATH))
+
+
+def start_telemetry(config):
+    """Start a fresh event file for this evaluation and point the workers at it."""
+    path = telemetry_path(config)
+    if path is None:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("", encoding="utf-8")
+    os.environ[TELEMETRY_ENV] = str(path.resolve())
+    return path
+
+
+def enabled():
+    return bool(os.environ.get(TELEMETRY_ENV))
+
+
+def emit(event, **fields):
+    """Append an event to the telemetry file, if telemetry is on.
+
+    Lines are written with a single `write` to a file opened for appending,
+    so events of concurrent workers never interleave.
+    """
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return
+    line = json.dumps({"ts": time.time(), "event": event, "pid": os.getpid(), **fields}) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def quantile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class JobMetrics:
+    """Progress of one (model, eval) job."""
+
+    def __init__(self):
+        self.running = 0
+        self.failed = False
+        self.finished = False
+        self.samples = 0
+        self.completed = 0
+        self.errors = 0
+        self.tokens = 0
+        self.calls = 0
+        self.retries = {}
+        self.job_retries = 0
+        self.started = None
+        self.updated = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.recent = deque()
+
+    @property
+    def state(self):
+        if self.running:
+            return "running"
+        if not self.finished:
+            return "pending"
+        return "failed" if self.failed else "succeeded"
+
+    def snapshot(self, now):
+        """JSON-friendly summary; rates are over the last `RATE_WINDOW` seconds."""
+        while self.recent and self.recent[0][0] < now - RATE_WINDOW:
+            self.recent.popleft()
+        span = min(RATE_WINDOW, now - self.started) if self.started else RATE_WINDOW
+        span = max(span, 1.0)
+        latencies = list(self.latencies)
+        return {
+            "state": self.state,
+            "running": self.running,
+            "samples": self.samples,
+            "completed": self.completed,
+            "errors": self.errors,
+            "tokens": self.tokens,
+            "calls": self.calls,
+            "retries": dict(self.retries),
+            "job_retries": self.job_retries,
+            "tokens_per_second": sum(tokens for _, tokens, _ in self.recent) / span,
+            "samples_per_second": sum(samples for _, _, samples in self.recent) / span,
+            "latency": {str(q): quantile(latencies, q) for q in QUANTILES} if latencies else {},
+            "idle_seconds": now - self.updated if self.updated else None,
+        }
+
+
+class Metrics:
+    """Aggregates telemetry events into per-job progress.
+
+    Jobs are keyed by (model, eval). Events of an inspect task carry its
+    `eval_id`, which `task_start` ties to the job.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.tasks = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.jobs.clear()
+            self.tasks.clear()
+
+    def job(self, model, eval_name):
+        key = (model, eval_name.rsplit("/", 1)[-1])
+        if key not in self.jobs:
+            self.jobs[key] = JobMetrics()
+        return self.jobs[key]
+
+    def add(self, event):
+        with self.lock:
+            self._add(event)
+
+    def _add(self, event):
+        kind = event.get("event")
+        now = event.get("ts", time.time())
+
+        if kind in ("job_start", "job_end", "job_retry"):
+            job = self.job(event["model"], event["eval"])
+        elif kind == "task_start":
+            self.tasks[event["eval_id"]] = (event["model"], event["eval"])
+            job = self.job(event["model"], event["eval"])
+            # Shards and canary batches of a job each start a task
+            job.samples += event.get("samples") or 0
+        elif event.get("eval_id") in self.tasks:
+            job = self.job(*self.tasks[event["eval_id"]])
+        else:
+            return
+
+        job.updated = now
+        if kind == "job_start":
+            # Shards of a job run (and start and end) separately
+            job.running += 1
+            job.started = job.started or now
+        elif kind == "job_end":
+            job.running = max(0, job.running - 1)
+            job.finished = True
+            job.failed = job.failed or not event.get("success")
+        elif kind == "job_retry":
+            job.job_retries += 1
+        elif kind == "sample_end":
+            job.completed += 1
+            job.errors += bool(event.get("error"))
+            job.recent.append((now, 0, 1))
+        elif kind == "model_call":
+            job.calls += 1
+            job.tokens += event.get("tokens") or 0
+            job.latencies.append(event.get("seconds") or 0.0)
+            job.recent.append((now, event.get("tokens") or 0, 0))
+        elif kind == "model_retry":
+            status = str(event.get("status") or event.get("error") or "unknown")
+            job.retries[status] = job.retries.get(status, 0) + 1
+
+    def snapshot(self):
+        """Per-job summaries, as sent on the SSE feed."""
+        now = time.time()
+        with self.lock:
+            return [
+                {"model": model, "eval": eval_name, **job.snapshot(now)}
+                for (model, eval_name), job in sorted(self.jobs.items())
+            ]
+
+    def prometheus(self):
+        """The summaries in the Prometheus text exposition format."""
+        lines = []
+        for name, kind, help_text, samples in self._metric_samples(self.snapshot()):
+            lines.append(f"# HELP benchci_{name} {help_text}")
+            lines.append(f"# TYPE benchci_{name} {kind}")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"benchci_{name}{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _metric_samples(jobs):
+        """Yield `(name, type, help, [(labels, value)])` for every metric."""
+        labelled = [({"model": job["model"], "eval": job["eval"]}, job) for job in jobs]
+
+        for name, kind, help_text, value in JOB_METRICS:
+            yield name, kind, help_text, [(labels, value(job)) for labels, job in labelled]
+
+        yield (
+            "model_retries_total",
+            "counter",
+            "Model calls retried, by HTTP status or error.",
+            [
+                ({**labels, "status": status}, count)
+                for labels, job in labelled
+                for status, count in sorted(job["retries"].items())
+            ],
+        )
+        yield (
+            "model_call_seconds",
+            "summary",
+            "Latency of recent model calls.",
+            [
+                ({**labels, "quantile": q}, round(seconds, 3))
+                for labels, job in labelled
+                for q, seconds in job["latency"].items()
+            ],
+        )
+        yield (
+            "idle_seconds",
+            "gauge",
+            "Seconds since the job's last event; keeps growing for a stalled job.",
+            [
+                (labels, round(job["idle_seconds"], 1))
+                for labels, job in labelled
+                if job["idle_seconds"] is not None and job["state"] == "running"
+            ],
+        )
+
+
+# Metrics with one sample per job: name, type, help and value
+JOB_METRICS = (
+    ("job_running", "gauge", "Whether the job is running.", lambda job: int(job["state"] == "running")),
+    ("samples_expected", "gauge", "Samples the job's tasks will run.", lambda job: job["samples"]),
+    ("samples_completed_total", "counter", "Samples completed.", lambda job: job["completed"]),
+    ("samples_errored_total", "counter", "Samples that ended with an error.", lambda job: job["errors"]),
+    ("tokens_total", "counter", "Tokens used by model calls.", lambda job: job["tokens"]),
+    ("model_calls_total", "counter", "Model calls made.", lambda job: job["calls"]),
+    ("job_retries_total", "counter", "Evals retried after a transient failure.", lambda job: job["job_retries"]),
+    (
+        "tokens_per_second",
+        "gauge",
+        f"Token rate over the last {RATE_WINDOW:.0f} seconds.",
+        lambda job: round(job["tokens_per_second"], 3),
+    ),
+    (
+        "samples_per_second",
+        "gauge",
+        f"Sample rate over the last {RATE_WINDOW:.0f} seconds.",
+        lambda job: round(job["samples_per_second"], 3),
+    ),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def follow(path, on_events, interval=1.0, stop=None):
+    """Tail a telemetry file, passing each batch of new events to `on_events`.
+
+    A file that shrinks was restarted by a new evaluation; `on_events` then
+    gets `None` before the events of the new file.
+    """
+    path = Path(path)
+    offset = 0
+    partial = b""
+    while not (stop and stop.is_set()):
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < offset:
+            offset, partial = 0, b""
+            on_events(None)
+
+        if size > offset:
+            with path.open("rb") as f:
+                f.seek(offset)
+                data = partial + f.read(size - offset)
+            offset = size
+            *lines, partial = data.split(b"\n")
+            events = []
+            for line in lines:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+            if events:
+                on_events(events)
+
+        time.sleep(interval)
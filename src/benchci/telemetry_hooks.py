@@ -0,0 +1,64 @@
+from inspect_ai.hooks import Hooks, hooks
+from . import telemetry
+
+
+def _total_tokens(model_usage):
+    return sum(usage.total_tokens or 0 for usage in (model_usage or {}).values())
+
+
+# Registered with inspect_ai on import, so only eval workers import this
+# module (see `run_single_eval`), and only while telemetry is on
+@hooks(name="benchci_telemetry", description="Publishes eval progress events for benchci serve")
+class TelemetryHooks(Hooks):
+    """Publishes task, sample and model call progress to the telemetry file."""
+
+    def enabled(self):
+        return telemetry.enabled()
+
+    async def on_task_start(self, data):
+        spec = data.spec
+        sample_ids = spec.dataset.sample_ids
+        samples = len(sample_ids) if sample_ids else spec.dataset.samples or 0
+        telemetry.emit(
+            "task_start",
+            eval_id=data.eval_id,
+            model=spec.model,
+            eval=spec.task,
+            samples=samples * (spec.config.epochs or 1),
+        )
+
+    async def on_sample_end(self, data):
+        sample = data.sample
+        telemetry.emit(
+            "sample_end",
+            eval_id=data.eval_id,
+            sample_id=data.sample_id,
+            epoch=sample.epoch,
+            error=sample.error.message if sample.error else None,
+            tokens=_total_tokens(sample.model_usage),
+            seconds=sample.total_time,
+        )
+
+    async def on_model_usage(self, data):
+        telemetry.emit(
+            "model_call",
+            eval_id=data.eval_id,
+            model=data.model_name,
+            tokens=data.usage.total_tokens or 0,
+            seconds=data.call_duration,
+            retries=data.retries,
+        )
+
+    async def on_model_retry(self, data):
+        telemetry.emit(
+            "model_retry",
+            eval_id=data.eval_id,
+            model=data.model_name,
+            attempt=data.attempt,
+            status=data.status_code,
+            error=data.exception_type,
+            wait=data.wait_time,
+        )
+
+    async def on_task_end(self, data):
+        telemetry.emit("task_end", eval_id=data.eval_id, status=data.log.status)
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import ctypes
+import select
+import ctypes.util
+from pathlib import Path
+from . import logio
+
+
+# Event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+
+class InotifyWatcher:
+    """Wait for files in a directory to be written, moved or deleted."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Could not watch {path}")
+
+    def wait(self, timeout):
+        """Block until something changed, returning False on timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        # Only the fact that something changed matters; drop the events
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher comparing the size and mtime of the logs."""
+
+    def __init__(self, path, interval=1.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for file_path in logio.iter_logs(self.path):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[file_path.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout):
+        """Block until something changed, returning False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def make_watcher(path, interval=1.0):
+    """Watch `path` with inotify where available, otherwise by polling."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError):
+            # AttributeError: the C library has no inotify functions
+            pass
+
+    print(f"inotify is unavailable; polling {path} every {interval}s")
+    return PollingWatcher(path, interval)
+
+
+def watch_logs(path, on_change, interval=1.0, settle=0.5):
+    """Call `on_change()` whenever the logs in `path` change, until interrupted.
+
+    Bursts of events (an eval writing its log, `compat` renaming it) are
+    coalesced by waiting until the directory has been quiet for `settle`
+    seconds.
+    """
+    Path(path).mkdir(parents=True, exist_ok=True)
+    watcher = make_watcher(path, interval)
+    try:
+        while True:
+            if not watcher.wait(timeout=60):
+                continue
+            while watcher.wait(timeout=settle):
+                pass
+            on_change()
+    finally:
+        watcher.close()
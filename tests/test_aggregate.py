@@ -0,0 +1,52 @@
+import math
+import pytest
+from benchci.reports.aggregate import build_score_matrix
+
+
+def entry(model, eval_name, score, runs=None):
+    metrics = {"runs": runs} if runs else {}
+    return {"model": model, "eval_name": eval_name, "score": score, "additional_metrics": metrics}
+
+
+def test_score_matrix_aggregates_every_cell():
+    matrix = build_score_matrix(
+        [
+            entry("m2", "mmlu", 0.2),
+            entry("m1", "mmlu", 0.4),
+            entry("m1", "mmlu", 0.8),
+            entry("m1", "gpqa", 0.3),
+        ]
+    )
+    m1, m2 = matrix.model_index()["m1"], matrix.model_index()["m2"]
+    gpqa, mmlu = matrix.eval_index()["gpqa"], matrix.eval_index()["mmlu"]
+
+    assert matrix.models == ["m1", "m2"]
+    assert matrix.evals == ["gpqa", "mmlu"]
+    assert matrix.mean[m1, mmlu] == pytest.approx(0.6)
+    assert matrix.count[m1, mmlu] == 2
+    assert (matrix.minimum[m1, mmlu], matrix.maximum[m1, mmlu]) == (0.4, 0.8)
+    assert matrix.mean[m2, mmlu] == pytest.approx(0.2)
+
+    # m2 never ran gpqa
+    assert not matrix.present[m2, gpqa]
+    assert math.isnan(matrix.mean[m2, gpqa])
+
+
+def test_errors_and_unlabelled_entries_are_skipped():
+    matrix = build_score_matrix([entry("m1", "mmlu", "Error"), entry(None, "mmlu", 0.5), entry("m1", "mmlu", 0.5)])
+
+    assert matrix.count.tolist() == [[1]]
+
+
+def test_rollups_count_as_the_runs_they_stand_for():
+    matrix = build_score_matrix([entry("m1", "mmlu", 0.2, runs=3), entry("m1", "mmlu", 0.6)])
+
+    assert matrix.count[0, 0] == 4
+    assert matrix.mean[0, 0] == pytest.approx((0.2 * 3 + 0.6) / 4)
+
+
+def test_empty_data_gives_an_empty_matrix():
+    matrix = build_score_matrix([entry("m1", "mmlu", "Error")])
+
+    assert matrix.models == [] and matrix.evals == []
+    assert matrix.mean.shape == (0, 0)
@@ -0,0 +1,86 @@
+import json
+from benchci.reports import datafiles
+
+
+def row(model, eval_name, score, timestamp="2025-09-01T00:00:00"):
+    return {
+        "model": model,
+        "timestamp": timestamp,
+        "eval_name": eval_name,
+        "score": score,
+        "additional_metrics": {},
+        "total_input_tokens": 1,
+        "total_output_tokens": 2,
+        "total_tokens": 3,
+    }
+
+
+DATA = [
+    row("openrouter/m1", "mmlu", 0.5),
+    row("openrouter/m1", "gpqa", "Error"),
+    row("Other M2", "mmlu", 0.7),
+    *(row("openrouter/m1", "math", 0.1 * i) for i in range(5)),
+]
+
+
+def read_data(reports_path):
+    data_path = reports_path / "data"
+    index = json.loads((data_path / "index.json").read_text())
+    return index, {shard["file"]: json.loads((data_path / shard["file"]).read_text()) for shard in index["shards"]}
+
+
+def test_rows_are_split_into_per_model_shards(tmp_path):
+    datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+    index, shards = read_data(tmp_path)
+
+    assert index["total"] == len(DATA)
+    assert index["models"] == ["Other M2", "openrouter/m1"]
+    assert index["evals"] == ["gpqa", "math", "mmlu"]
+    assert [(shard["model"], shard["rows"]) for shard in index["shards"]] == [
+        ("Other M2", 1),
+        ("openrouter/m1", 3),
+        ("openrouter/m1", 3),
+        ("openrouter/m1", 1),
+    ]
+    assert index["shards"][0]["file"].startswith("shards/other_m2-")
+
+
+def test_shards_are_columnar(tmp_path):
+    datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+    _, shards = read_data(tmp_path)
+
+    first = next(shard for shard in shards.values() if shard["model"] == "openrouter/m1")
+    assert first["evals"] == ["gpqa", "math", "mmlu"]
+    assert [first["evals"][i] for i in first["columns"]["eval"]] == ["mmlu", "gpqa", "math"]
+    assert first["columns"]["score"] == [0.5, None, 0.0]
+    assert first["columns"]["additional_metrics"] == [None, None, None]
+
+
+def test_unchanged_shards_keep_their_files_and_stale_ones_are_removed(tmp_path):
+    assert datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+    before = {path.name: path.stat().st_mtime_ns for path in (tmp_path / "data" / "shards").glob("*.json")}
+
+    assert not datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+
+    changed = DATA[:-1] + [row("openrouter/m1", "math", 0.9)]
+    assert datafiles.write_data_files(changed, tmp_path, shard_rows=3)
+    after = {path.name: path.stat().st_mtime_ns for path in (tmp_path / "data" / "shards").glob("*.json")}
+
+    # Only the last shard of m1 changed, under a new name
+    assert len(after) == len(before) == 4
+    assert len(set(after) & set(before)) == 3
+    assert all(after[name] == before[name] for name in set(after) & set(before))
+
+
+def test_shards_present_notices_a_missing_shard(tmp_path):
+    assert not datafiles.shards_present(tmp_path)
+
+    datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+    assert datafiles.shards_present(tmp_path)
+
+    next((tmp_path / "data" / "shards").glob("*.json")).unlink()
+    assert not datafiles.shards_present(tmp_path)
+
+    # Writing again restores it even though the index is unchanged
+    assert datafiles.write_data_files(DATA, tmp_path, shard_rows=3)
+    assert datafiles.shards_present(tmp_path)
@@ -0,0 +1,92 @@
+from functools import partial
+from benchci import store
+from benchci.reports import datafiles
+from benchci.reports.graph import BuildGraph
+
+
+class Builder:
+    """Writes an artifact and counts how often it was built."""
+
+    def __init__(self, path, text="built"):
+        self.path = path
+        self.text = text
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.path.write_text(self.text)
+        return True
+
+
+def make_graph(tmp_path, builder, inputs):
+    graph = BuildGraph(tmp_path)
+    graph.add("page.html", builder, inputs=inputs, templates=["report_html.j2"])
+    return graph
+
+
+def test_artifacts_are_built_once_until_their_inputs_change(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    builder = Builder(tmp_path / "page.html")
+
+    assert make_graph(tmp_path, builder, {"rows": 1}).run(conn) == ["page.html"]
+    assert make_graph(tmp_path, builder, {"rows": 1}).run(conn) == []
+    assert builder.calls == 1
+
+    assert make_graph(tmp_path, builder, {"rows": 2}).run(conn) == ["page.html"]
+    assert builder.calls == 2
+
+
+def test_missing_outputs_are_rebuilt(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    builder = Builder(tmp_path / "page.html")
+    make_graph(tmp_path, builder, {"rows": 1}).run(conn)
+
+    (tmp_path / "page.html").unlink()
+    make_graph(tmp_path, builder, {"rows": 1}).run(conn)
+
+    assert builder.calls == 2
+    assert (tmp_path / "page.html").exists()
+
+
+def test_builders_report_whether_their_output_changed(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    graph = BuildGraph(tmp_path)
+    graph.add("a.txt", Builder(tmp_path / "a.txt"), inputs=1)
+    graph.add("b.txt", lambda: False, inputs=1)
+
+    assert graph.run(conn) == ["a.txt"]
+    assert set(store.load_build_manifest(conn)) == {"a.txt", "b.txt"}
+
+
+def test_data_index_is_rebuilt_when_one_of_its_shards_is_missing(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    data = [
+        {
+            "model": f"m{i}",
+            "timestamp": "2025-09-01T00:00:00",
+            "eval_name": "mmlu",
+            "score": 0.5,
+            "additional_metrics": {},
+            "total_input_tokens": 1,
+            "total_output_tokens": 1,
+            "total_tokens": 2,
+        }
+        for i in range(3)
+    ]
+
+    def run():
+        graph = BuildGraph(tmp_path)
+        graph.add(
+            "data/index.json",
+            partial(datafiles.write_data_files, data, tmp_path),
+            inputs=data,
+            complete=partial(datafiles.shards_present, tmp_path),
+        )
+        return graph.run(conn)
+
+    assert run() == ["data/index.json"]
+    assert run() == []
+
+    next((tmp_path / "data" / "shards").glob("*.json")).unlink()
+    assert run() == ["data/index.json"]
+    assert len(list((tmp_path / "data" / "shards").glob("*.json"))) == 3
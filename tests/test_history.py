@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from benchci.reports.history import build_history, rolling_mean, detect_change_points
+
+
+def entries(model, eval_name, scores, day=1):
+    return [
+        {"model": model, "eval_name": eval_name, "timestamp": f"2026-01-{day + index:02d}T00:00:00", "score": score}
+        for index, score in enumerate(scores)
+    ]
+
+
+def series(history, model, eval_name):
+    row = history.keys.index((model, eval_name))
+    return history.scores[row, : history.lengths[row]].tolist()
+
+
+def test_build_history_orders_runs_by_time_and_skips_errors():
+    data = [*entries("m", "b", [0.3, 0.4], day=5), *entries("m", "b", [0.1, 0.2]), *entries("n", "a", [0.9, "Error"])]
+
+    history = build_history(data)
+
+    assert history.keys == [("m", "b"), ("n", "a")]
+    assert series(history, "m", "b") == [0.1, 0.2, 0.3, 0.4]
+    assert series(history, "n", "a") == [0.9]
+    assert np.isnan(history.scores[1, 1:]).all()
+
+
+def test_rolling_mean_covers_the_last_runs():
+    history = build_history(entries("m", "e", [1.0, 2.0, 3.0, 4.0]))
+
+    assert rolling_mean(history, window=2)[0].tolist() == [1.0, 1.5, 2.5, 3.5]
+
+
+def test_detects_a_regression_at_the_shift():
+    scores = [0.80, 0.81, 0.79, 0.80, 0.81, 0.60, 0.61, 0.59, 0.60]
+    history = build_history([*entries("m", "drop", scores), *entries("m", "flat", [0.5, 0.51, 0.49, 0.5, 0.51, 0.5])])
+
+    result = detect_change_points(history)
+
+    drop = history.keys.index(("m", "drop"))
+    flat = history.keys.index(("m", "flat"))
+    assert result.index[drop] == 5
+    assert result.before[drop] == pytest.approx(0.802)
+    assert result.after[drop] == pytest.approx(0.60)
+    assert result.regression[drop]
+    assert not result.flagged[flat]
+
+
+def test_small_or_untestable_shifts_are_not_flagged():
+    history = build_history([*entries("m", "tiny", [0.5, 0.5, 0.51, 0.51]), *entries("m", "short", [0.2, 0.9, 0.9])])
+
+    result = detect_change_points(history)
+
+    assert not result.flagged.any()
+    short = history.keys.index(("m", "short"))
+    assert result.index[short] == 0
+
+
+def test_improvements_are_flagged_but_are_not_regressions():
+    history = build_history(entries("m", "up", [0.4, 0.41, 0.4, 0.7, 0.71, 0.7]))
+
+    result = detect_change_points(history)
+
+    assert result.flagged[0] and not result.regression[0]
@@ -0,0 +1,78 @@
+import os
+import json
+from benchci import store
+from benchci.reports.pages import ingest_logs
+
+
+def make_log(model, accuracy, created="2025-09-01T00:00:00+00:00"):
+    return {
+        "status": "success",
+        "eval": {"model": model, "task": "openbench/mmlu", "created": created, "dataset": {"samples": 10}},
+        "results": {"scores": [{"metrics": {"accuracy": {"value": accuracy}, "stderr": {"value": 0.1}}}]},
+        "stats": {
+            "started_at": "2025-09-01T00:00:00+00:00",
+            "completed_at": "2025-09-01T00:01:00+00:00",
+            "model_usage": {model: {"input_tokens": 5, "output_tokens": 7, "total_tokens": 12}},
+        },
+        "samples": [{"id": 1}],
+    }
+
+
+def write(path, log):
+    path.write_text(json.dumps(log))
+
+
+def scores(conn):
+    return {entry["model"]: entry["score"] for entry in store.query_results(conn)}
+
+
+def test_ingest_extracts_an_entry_per_log(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    write(tmp_path / "a.json", make_log("m1", 0.5))
+    write(tmp_path / "b.json", make_log("m2", 0.7))
+
+    assert ingest_logs(tmp_path, conn, max_workers=1) == 2
+
+    [entry, _] = store.query_results(conn)
+    assert entry["score"] == 0.5
+    assert entry["additional_metrics"] == {"stderr": 0.1}
+    assert entry["total_tokens"] == 12
+    assert store.run_durations(conn)[0] == ("m1", "mmlu", 60.0, 12)
+
+
+def test_unchanged_and_touched_logs_are_not_parsed_again(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    write(tmp_path / "a.json", make_log("m1", 0.5))
+    ingest_logs(tmp_path, conn, max_workers=1)
+
+    assert ingest_logs(tmp_path, conn, max_workers=1) == 0
+
+    # Same content, new mtime: recognised by its hash
+    stat = (tmp_path / "a.json").stat()
+    os.utime(tmp_path / "a.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert ingest_logs(tmp_path, conn, max_workers=1) == 0
+    assert store.load_manifest(conn)["a.json"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+    assert scores(conn) == {"m1": 0.5}
+
+
+def test_changed_logs_replace_their_results_and_removed_logs_are_forgotten(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    write(tmp_path / "a.json", make_log("m1", 0.5))
+    write(tmp_path / "b.json", make_log("m2", 0.7))
+    ingest_logs(tmp_path, conn, max_workers=1)
+
+    write(tmp_path / "a.json", make_log("m1", 0.9, created="2025-09-02T00:00:00+00:00"))
+    (tmp_path / "b.json").unlink()
+
+    assert ingest_logs(tmp_path, conn, max_workers=1) == 1
+    assert scores(conn) == {"m1": 0.9}
+    assert set(store.load_manifest(conn)) == {"a.json"}
+
+
+def test_invalid_logs_are_recorded_as_such(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    (tmp_path / "a.json").write_text("{not json")
+
+    assert ingest_logs(tmp_path, conn, max_workers=1) == 1
+    assert store.query_results(conn) == []
+    assert store.load_manifest(conn)["a.json"]["status"] == "invalid"
@@ -0,0 +1,157 @@
+import json
+import pytest
+from benchci import logio
+from benchci.logio import MemberFilter, read_compacted
+
+
+COMPRESSIONS = [
+    "none",
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(logio.zstandard is None, reason="needs zstandard")),
+]
+
+
+LOG = {
+    "version": 2,
+    "eval": {"task": "mmlu", "note": "a \"samples\": [1, 2] lookalike \\ with {braces}"},
+    "samples": [
+        {"id": 1, "input": "what is [1, 2]?", "scores": {"match": {"value": "C"}}},
+        {"id": "two", "input": "escaped \" quote, and comma", "scores": {}},
+        3,
+    ],
+    "results": {"scores": [{"name": "match", "metrics": {"accuracy": {"value": 0.5}}}]},
+    "reductions": {"kind": "object value"},
+    "stats": {"samples": "not top-level"},
+}
+
+
+def feed_chunks(member_filter, text, size):
+    return "".join(member_filter.feed(text[i : i + size]) for i in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 1 << 16])
+def test_member_filter_blanks_dropped_members_at_any_chunk_size(size):
+    text = json.dumps(LOG, indent=2)
+
+    kept = json.loads(feed_chunks(MemberFilter(), text, size))
+
+    assert kept["samples"] is None
+    assert kept["reductions"] is None
+    assert kept["eval"] == LOG["eval"]
+    assert kept["results"] == LOG["results"]
+    assert kept["stats"] == LOG["stats"]
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_member_filter_passes_captured_elements_one_at_a_time(size):
+    text = json.dumps(LOG)
+    items = []
+    member_filter = MemberFilter(capture=("samples", "reductions"), on_item=lambda *item: items.append(item))
+
+    kept = json.loads(feed_chunks(member_filter, text, size))
+
+    assert kept["samples"] is None
+    assert items == [("samples", element) for element in LOG["samples"]] + [("reductions", LOG["reductions"])]
+
+
+def test_member_filter_skips_empty_captured_arrays():
+    items = []
+    member_filter = MemberFilter(capture=("samples",), on_item=lambda *item: items.append(item))
+
+    kept = json.loads(member_filter.feed('{"samples": [], "status": "success"}'))
+
+    assert kept == {"samples": None, "status": "success"}
+    assert items == []
+
+
+def test_read_compacted_streams_a_log(tmp_path):
+    path = tmp_path / "log.json"
+    path.write_text(json.dumps(LOG), encoding="utf-8")
+    items = []
+
+    record = read_compacted(path, chunk_size=5, on_item=lambda *item: items.append(item))
+
+    assert "samples" not in record and "reductions" not in record
+    assert record["eval"] == LOG["eval"]
+    assert [element for member, element in items if member == "samples"] == LOG["samples"]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_logs_round_trip_with_every_compression(tmp_path, compression):
+    path = tmp_path / logio.log_name("run", compression)
+
+    logio.write_log(path, LOG)
+
+    assert logio.read_log(path) == LOG
+    assert read_compacted(path)["eval"] == LOG["eval"]
+    assert list(logio.iter_member(path, "samples", chunk_size=7)) == LOG["samples"]
+    assert [p.name for p in logio.iter_logs(tmp_path)] == [path.name]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_streamed_members_are_written_like_the_whole_log(tmp_path, compression):
+    whole = tmp_path / logio.log_name("whole", compression)
+    streamed = tmp_path / logio.log_name("streamed", compression)
+    header = {key: value for key, value in LOG.items() if key != "samples"}
+
+    logio.write_log(whole, LOG)
+    logio.write_log(streamed, header, streams={"samples": iter(LOG["samples"])})
+
+    assert streamed.read_bytes() == whole.read_bytes()
+
+
+def test_compressed_logs_are_deterministic(tmp_path):
+    logio.write_log(tmp_path / "a.json.gz", LOG)
+    logio.write_log(tmp_path / "b.json.gz", LOG)
+
+    assert (tmp_path / "a.json.gz").read_bytes() == (tmp_path / "b.json.gz").read_bytes()
+
+
+def test_truncated_logs_raise_read_errors(tmp_path):
+    logio.write_log(tmp_path / "run.json.gz", LOG)
+    data = (tmp_path / "run.json.gz").read_bytes()
+    (tmp_path / "run.json.gz").write_bytes(data[: len(data) // 2])
+
+    with pytest.raises(logio.READ_ERRORS):
+        logio.read_log(tmp_path / "run.json.gz")
+
+
+@pytest.mark.parametrize(
+    "name, stem, suffix",
+    [("run_compat.json", "run_compat", ".json"), ("run.json.gz", "run", ".json.gz"), ("run.json.zst", "run", ".json.zst")],
+)
+def test_log_names(name, stem, suffix):
+    assert logio.log_suffix(name) == suffix
+    assert logio.log_stem(name) == stem
+    assert logio.run_name(name) == "run"
+    assert not logio.is_log("run.samples.npz")
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_convert_log_re_encodes_and_replaces_the_log(tmp_path, compression):
+    logio.write_log(tmp_path / "run.json", LOG)
+
+    converted = logio.convert_log(tmp_path / "run.json", compression)
+
+    assert converted == tmp_path / logio.log_name("run", compression)
+    assert [p.name for p in logio.iter_logs(tmp_path)] == [converted.name]
+    assert logio.read_log(converted) == LOG
+
+
+def test_migrate_logs_converts_every_log(tmp_path):
+    config = {"evaluation": {"output": {"logs": str(tmp_path), "compression": "gzip"}, "compat": {"workers": 1}}}
+    logio.write_log(tmp_path / "a.json", LOG)
+    logio.write_log(tmp_path / "b.json.gz", LOG)
+
+    logio.migrate_logs(config)
+
+    assert [p.name for p in logio.iter_logs(tmp_path)] == ["a.json.gz", "b.json.gz"]
+    assert logio.read_log(tmp_path / "a.json.gz") == LOG
+
+    logio.migrate_logs(config, compression="none")
+    assert [p.name for p in logio.iter_logs(tmp_path)] == ["a.json", "b.json"]
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError):
+        logio.log_compression({"evaluation": {"output": {"compression": "lz4"}}})
@@ -0,0 +1,64 @@
+import pytest
+from benchci.scheduler import Job
+from benchci.planner import DurationModel, plan_jobs, parse_slice, partition_jobs
+
+
+def make_jobs(*evals, model="openrouter/a"):
+    return [Job("nightly", model, eval_name) for eval_name in evals]
+
+
+def test_duration_model_prefers_the_pair_history():
+    model = DurationModel(
+        [
+            ("openrouter/a", "mmlu", 100.0, 1000),
+            ("openrouter/a", "mmlu", 300.0, 1000),
+            ("openrouter/b", "gpqa", 50.0, 500),
+        ],
+        default=42.0,
+    )
+
+    assert model.estimate(Job("r", "openrouter/a", "mmlu")) == (200.0, "history")
+    assert model.estimate(Job("r", "openrouter/a", "mmlu", shard=1, shards=4)) == (50.0, "history")
+    # The eval's tokens on another model at this model's seconds per token
+    assert model.estimate(Job("r", "openrouter/a", "gpqa")) == (pytest.approx(100.0), "tokens")
+    assert model.estimate(Job("r", "openrouter/c", "gpqa")) == (pytest.approx(500 * 450 / 2500), "tokens")
+    assert model.estimate(Job("r", "openrouter/a", "new")) == (42.0, "default")
+
+
+def test_plan_starts_the_longest_jobs_first():
+    durations = [("openrouter/a", name, seconds, 0) for name, seconds in [("a", 1), ("b", 1), ("c", 1), ("d", 1), ("e", 5)]]
+    jobs = make_jobs("a", "b", "c", "d", "e")
+
+    plan = plan_jobs(jobs, DurationModel(durations), max_workers=2)
+
+    assert [job.eval_name for job in plan.order] == ["e", "a", "b", "c", "d"]
+    assert plan.makespan == 5.0
+    assert plan.config_makespan == 7.0
+    assert sorted(len(worker) for worker in plan.workers) == [1, 4]
+    assert set(plan.sources.values()) == {"history"}
+
+
+@pytest.mark.parametrize("text, expected", [("1/4", (0, 4)), ("4/4", (3, 4)), ("1/1", (0, 1))])
+def test_parse_slice(text, expected):
+    assert parse_slice(text) == expected
+
+
+@pytest.mark.parametrize("text", ["0/4", "5/4", "4", "a/b", "1/2/3"])
+def test_parse_slice_rejects_bad_slices(text):
+    with pytest.raises(ValueError):
+        parse_slice(text)
+
+
+def test_partition_balances_slices_and_agrees_across_machines():
+    seconds = {"a": 9, "b": 7, "c": 6, "d": 5, "e": 4, "f": 2, "g": 1}
+    model = DurationModel([("openrouter/a", name, value, 0) for name, value in seconds.items()])
+    jobs = make_jobs(*seconds)
+
+    slices, digest, estimates = partition_jobs(jobs, model, 3)
+    _, shuffled_digest, _ = partition_jobs(jobs[::-1], model, 3)
+
+    assert sorted(job.eval_name for jobs_slice in slices for job in jobs_slice) == list(seconds)
+    assert sorted(sum(estimates[job] for job in jobs_slice) for jobs_slice in slices) == [11, 11, 12]
+    assert shuffled_digest == digest
+    # Every slice keeps the config order
+    assert all(jobs_slice == sorted(jobs_slice, key=jobs.index) for jobs_slice in slices)
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import threading
+import http.server
+import urllib.error
+import urllib.request
+import pytest
+from benchci import responsecache
+from benchci.responsecache import ResponseCache
+
+
+def body(size=400):
+    # Random bytes do not compress, so each response takes a little over `size` bytes
+    return os.urandom(size)
+
+
+def keys(cache):
+    return {row[0] for row in cache.conn.execute("SELECT key FROM responses")}
+
+
+def test_request_key_ignores_member_order_and_user_fields():
+    key = responsecache.request_key("https://api/v1/chat", {"model": "m", "messages": [], "user": "a"})
+
+    assert responsecache.request_key("https://api/v1/chat", {"messages": [], "model": "m", "metadata": {}}) == key
+    assert responsecache.request_key("https://api/v1/chat", {"model": "m", "messages": [1]}) != key
+    assert responsecache.request_key("https://other/v1/chat", {"model": "m", "messages": []}) != key
+
+
+@pytest.mark.parametrize(
+    "response, tokens",
+    [
+        (b'{"usage": {"total_tokens": 12}}', 12),
+        (b'{"usage": {"input_tokens": 5, "output_tokens": 4}}', 9),
+        (b'data: {"usage": null}\n\ndata: {"usage": {"total_tokens": 9}}\n\ndata: [DONE]\n\n', 9),
+        (b"not json", 0),
+    ],
+)
+def test_response_tokens(response, tokens):
+    assert responsecache.response_tokens(response) == tokens
+
+
+def test_responses_round_trip(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db")
+    response = b'{"usage": {"total_tokens": 12}}'
+
+    cache.put("key", "application/json", response)
+
+    assert cache.get("key") == ("application/json", response, 12)
+    assert cache.get("other") is None
+
+
+def test_expired_responses_are_misses_and_dropped_on_open(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db", ttl_days=1)
+    cache.put("old", "application/json", body())
+    cache.put("new", "application/json", body())
+    with cache.conn:
+        cache.conn.execute("UPDATE responses SET created_at = ? WHERE key = 'old'", (time.time() - 2 * 86400,))
+
+    assert cache.get("old") is None
+    assert cache.get("new") is not None
+
+    cache.close()
+    assert keys(ResponseCache(tmp_path / "responses.db", ttl_days=1)) == {"new"}
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    # Room for about four responses
+    cache = ResponseCache(tmp_path / "responses.db", max_size_mb=2000 / (1024 * 1024))
+    for key in "abc":
+        cache.put(key, "application/json", body())
+    with cache.conn:
+        for accessed_at, key in enumerate("bac"):
+            cache.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (accessed_at, key))
+
+    cache.put("d", "application/json", body())
+    assert keys(cache) == {"a", "b", "c", "d"}
+
+    # Over size: "b" was used least recently, and dropping it trims the cache enough
+    cache.put("e", "application/json", body())
+    assert keys(cache) == {"a", "c", "d", "e"}
+
+
+def test_reading_a_response_marks_it_as_used(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db")
+    cache.put("a", "application/json", body())
+    with cache.conn:
+        cache.conn.execute("UPDATE responses SET accessed_at = 0")
+
+    cache.get("a")
+
+    assert cache.conn.execute("SELECT accessed_at FROM responses").fetchone()[0] > 0
+
+
+class Upstream(http.server.BaseHTTPRequestHandler):
+    """Answers every request with its count, or never for `"hang": true`."""
+
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if request.get("hang"):
+            time.sleep(1)
+            return
+        Upstream.requests += 1
+        response = json.dumps({"count": Upstream.requests, "usage": {"total_tokens": 3}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    Upstream.requests = 0
+    upstream = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    upstream.daemon_threads = True
+    cache = ResponseCache(tmp_path / "responses.db")
+    httpd = responsecache.make_proxy(cache, {"TEST": f"http://127.0.0.1:{upstream.server_address[1]}/v1"}, timeout=0.2)
+    for server in (upstream, httpd):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(request, proxy=httpd):
+        url = f"http://127.0.0.1:{proxy.server_address[1]}/test/chat"
+        data = json.dumps(request).encode("utf-8")
+        with urllib.request.urlopen(urllib.request.Request(url, data, {"Content-Type": "application/json"})) as r:
+            return json.loads(r.read())["count"]
+
+    yield httpd, post
+    for server in (httpd, upstream):
+        server.shutdown()
+        server.server_close()
+
+
+def test_repeated_requests_are_answered_from_the_cache(proxy):
+    httpd, post = proxy
+
+    # Identical requests (e.g. epochs) each keep their own response
+    assert [post({"model": "m"}), post({"model": "m"})] == [1, 2]
+
+    # A later run sees the same responses in the same order
+    rerun = responsecache.make_proxy(httpd.cache, httpd.RequestHandlerClass.upstreams)
+    threading.Thread(target=rerun.serve_forever, daemon=True).start()
+    try:
+        assert [post({"model": "m"}, rerun), post({"model": "m"}, rerun), post({"model": "m"}, rerun)] == [1, 2, 3]
+    finally:
+        rerun.shutdown()
+        rerun.server_close()
+
+    assert rerun.stats == {"hits": 2, "misses": 1, "tokens": 6}
+
+
+def test_silent_upstreams_time_out(proxy):
+    _, post = proxy
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post({"model": "m", "hang": True})
+
+    assert error.value.code == 504
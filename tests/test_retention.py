@@ -0,0 +1,114 @@
+import json
+import pytest
+from benchci import logio, store, retention
+from benchci.shards import combine_metric
+
+
+def run(source, score, day=1):
+    return {
+        "source": source,
+        "score": score,
+        "timestamp": f"2025-09-{day:02d}T00:00:00+00:00",
+        "total_input_tokens": 10,
+        "total_output_tokens": 20,
+        "total_tokens": 30,
+    }
+
+
+def make_log(score, day, status="success", error=None):
+    log = {
+        "status": status,
+        "eval": {"model": "openrouter/m1", "task": "openbench/mmlu", "created": f"2025-09-{day:02d}T00:00:00+00:00"},
+        "results": {"scores": [{"metrics": {"accuracy": {"value": score}}}]},
+        "stats": {"model_usage": {"m1": {"input_tokens": 1, "output_tokens": 2, "total_tokens": 3}}},
+    }
+    if error:
+        log["error"] = {"message": error}
+    return log
+
+
+def test_rolling_up_in_passes_matches_rolling_up_at_once():
+    runs = [run(f"{i}.json", score, i + 1) for i, score in enumerate([0.2, 0.4, 0.9, 0.5, 0.6])]
+
+    at_once = retention.merge_runs(None, "m1", "mmlu", runs)
+    in_passes = retention.merge_runs(None, "m1", "mmlu", runs[:2])
+    in_passes = retention.merge_runs(json.loads(json.dumps(in_passes)), "m1", "mmlu", runs[2:])
+
+    assert in_passes["runs"] == at_once["runs"] == 5
+    assert in_passes["mean"] == pytest.approx(at_once["mean"]) == pytest.approx(0.52)
+    assert in_passes["stderr"] == pytest.approx(at_once["stderr"])
+    assert (in_passes["first"], in_passes["last"]) == (runs[0]["timestamp"], runs[-1]["timestamp"])
+    assert in_passes["total_tokens"] == 150
+
+
+def test_stderr_of_a_rollup_is_that_of_its_scores():
+    scores = [0.2, 0.4, 0.9]
+    rollup = retention.merge_runs(None, "m1", "mmlu", [run(f"{i}.json", score) for i, score in enumerate(scores)])
+    # Single-sample shards: the combined stderr is the stderr of the scores
+    stats = {"accuracy": scores, "stderr": [0.0] * len(scores)}
+
+    assert rollup["stderr"] == pytest.approx(combine_metric("stderr", stats, [1] * len(scores)))
+
+
+def test_runs_already_rolled_up_are_not_counted_again():
+    rollup = retention.merge_runs(None, "m1", "mmlu", [run("a.json", 0.5)])
+
+    rollup = retention.merge_runs(rollup, "m1", "mmlu", [run("a.json", 0.5), run("b.json", 0.7)])
+
+    assert rollup["runs"] == 2
+    assert rollup["sources"] == ["a.json", "b.json"]
+
+
+@pytest.mark.parametrize(
+    "retention_config, expected",
+    [
+        ({}, (None, retention.DELETE_ERRORS)),
+        ({"keep_runs": 3, "delete_errors": True}, (3, None)),
+        ({"delete_errors": False}, (None, ())),
+    ],
+)
+def test_retention_policy(retention_config, expected):
+    assert retention.retention_policy({"evaluation": {"retention": retention_config}}) == expected
+
+
+def test_prune_rolls_up_old_runs_and_deletes_errored_logs(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    for day, score in enumerate([0.2, 0.4, 0.9], start=1):
+        logio.write_log(logs / f"run{day}.json", make_log(score, day))
+    logio.write_log(logs / "failed.json", make_log(None, 4, "error", "BadRequestError: invalid model"))
+    config = {
+        "evaluation": {
+            "output": {"logs": str(logs), "store": str(tmp_path / "results.db"), "compression": "gzip"},
+            "retention": {"keep_runs": 1},
+            "reports": {"ingest_workers": 1},
+        }
+    }
+
+    retention.prune_logs(config)
+
+    stem = retention.rollup_stem("openrouter/m1", "openbench/mmlu")
+    assert [path.name for path in logio.iter_logs(logs)] == ["run3.json"]
+    assert [path.name for path in logio.iter_logs(logs / "rollups")] == [f"{stem}.json.gz"]
+
+    conn = store.connect(tmp_path / "results.db")
+    scores = sorted((entry["score"], entry["additional_metrics"].get("runs")) for entry in store.query_results(conn))
+    assert scores == [(pytest.approx(0.3), 2), (0.9, None)]
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    for day in (1, 2):
+        logio.write_log(logs / f"run{day}.json", make_log(0.5, day))
+    config = {
+        "evaluation": {
+            "output": {"logs": str(logs), "store": str(tmp_path / "results.db")},
+            "retention": {"keep_runs": 1},
+        }
+    }
+
+    retention.prune_logs(config, dry_run=True)
+
+    assert [path.name for path in logio.iter_logs(logs)] == ["run1.json", "run2.json"]
+    assert not (logs / "rollups").exists()
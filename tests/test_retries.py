@@ -0,0 +1,63 @@
+import random
+import pytest
+from benchci.retries import DEFAULTS, is_transient, backoff_delay, retry_settings
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        "openai.RateLimitError: Error code: 429 - {'error': 'Rate limit exceeded'}",
+        "openai.InternalServerError: Error code: 502 - Bad gateway",
+        "anthropic.APIStatusError: Overloaded",
+        "httpx.ReadTimeout: timed out",
+        "openai.APIConnectionError: Connection error.",
+        "httpx.RemoteProtocolError: Server disconnected without sending a response.",
+        "OpenRouterError: Error 503 - No available providers",
+    ],
+)
+def test_provider_errors_are_transient(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        "openai.BadRequestError: Error code: 400 - {'error': 'invalid model'}",
+        "openai.AuthenticationError: Error code: 401 - Incorrect API key",
+        "openai.NotFoundError: Error code: 404 - model not found",
+        "This model's maximum context length is 8192 tokens",
+        "OpenRouterError: Error 402 - Insufficient credits",
+        "ValueError: could not parse the answer",
+        "",
+        None,
+    ],
+)
+def test_request_and_unknown_errors_are_not_transient(error):
+    assert not is_transient(error)
+
+
+def test_permanent_errors_win_over_transient_words():
+    assert not is_transient("BadRequestError: Error code: 400 - request timed out waiting for tool")
+
+
+def test_configured_patterns_are_retried():
+    error = "RuntimeError: sandbox container exited"
+
+    assert not is_transient(error)
+    assert is_transient(error, {"transient": ["sandbox container"]})
+
+
+def test_retry_settings():
+    assert retry_settings({"evaluation": {}}) == DEFAULTS
+    assert retry_settings({"evaluation": {"retry": False}})["max_attempts"] == 1
+    assert retry_settings({"evaluation": {"retry": {"max_attempts": 5}}}) == {**DEFAULTS, "max_attempts": 5}
+
+
+def test_backoff_doubles_up_to_the_maximum_with_jitter():
+    settings = {**DEFAULTS, "base_delay": 10.0, "max_delay": 60.0}
+    rng = random.Random(0)
+
+    for attempt, delay in [(1, 10.0), (2, 20.0), (3, 40.0), (4, 60.0), (8, 60.0)]:
+        waits = [backoff_delay(attempt, settings, rng) for _ in range(50)]
+        assert all(delay / 2 <= wait <= delay for wait in waits)
+        assert len(set(waits)) > 1
@@ -0,0 +1,74 @@
+import time
+from benchci import store, runcache
+from benchci.scheduler import Job
+
+
+JOB = Job("nightly", "openrouter/openai/gpt-oss-120b", "mmlu", limit=100)
+RUN_CONFIG = {"evals": ["mmlu", "gpqa"], "shards": 2, "epochs": 1, "temperature": 0.0}
+
+
+def test_cache_key_ignores_the_eval_list_and_sharding():
+    key = runcache.cache_key(JOB, RUN_CONFIG, "1.0")
+
+    assert runcache.cache_key(JOB, {**RUN_CONFIG, "evals": ["mmlu"], "shards": 4}, "1.0") == key
+    assert runcache.cache_key(Job("other-run", JOB.model_name, "mmlu", limit=100), RUN_CONFIG, "1.0") == key
+
+
+def test_cache_key_changes_with_anything_that_changes_the_result():
+    key = runcache.cache_key(JOB, RUN_CONFIG, "1.0")
+
+    assert runcache.cache_key(JOB, RUN_CONFIG, "1.1") != key
+    assert runcache.cache_key(JOB, {**RUN_CONFIG, "temperature": 0.7}, "1.0") != key
+    assert runcache.cache_key(Job("nightly", JOB.model_name, "mmlu", limit=50), RUN_CONFIG, "1.0") != key
+    assert runcache.cache_key(Job("nightly", JOB.model_name, "gpqa", limit=100), RUN_CONFIG, "1.0") != key
+
+
+def test_lookup_finds_the_recorded_log_under_its_compacted_name(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    (tmp_path / "run1_compat.json.gz").write_bytes(b"")
+
+    assert runcache.lookup(conn, "key", tmp_path) is None
+    with conn:
+        runcache.record(conn, "key", JOB, "run1", tmp_path)
+
+    assert runcache.lookup(conn, "key", tmp_path) == tmp_path / "run1_compat.json.gz"
+    assert runcache.lookup(conn, "other", tmp_path) is None
+
+
+def test_lookup_misses_when_the_log_is_gone_or_expired(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    (tmp_path / "run1.json").write_text("{}")
+    with conn:
+        runcache.record(conn, "key", JOB, "run1", tmp_path)
+        conn.execute("UPDATE run_cache SET created_at = ?", (time.time() - 2 * 86400,))
+
+    assert runcache.lookup(conn, "key", tmp_path, ttl_days=3) == tmp_path / "run1.json"
+    assert runcache.lookup(conn, "key", tmp_path, ttl_days=1) is None
+
+    (tmp_path / "run1.json").unlink()
+    assert runcache.lookup(conn, "key", tmp_path) is None
+
+
+def test_entries_rebuild_the_cache_of_a_fresh_store(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "run1.json").write_text("{}")
+    conn = store.connect(tmp_path / "slice.db")
+    with conn:
+        runcache.record(conn, "key", JOB, "run1", logs)
+
+    fresh = store.connect(tmp_path / "fresh.db")
+    with fresh:
+        runcache.load_entries(fresh, logs)
+
+    assert runcache.lookup(fresh, "key", logs) == logs / "run1.json"
+
+
+def test_merge_entries_keeps_the_newest_entry(tmp_path):
+    older, newer, logs = tmp_path / "older", tmp_path / "newer", tmp_path / "logs"
+    runcache.write_entry(older / runcache.ENTRY_DIR / "key.json", {"logfile": "old", "created_at": 1.0})
+    runcache.write_entry(newer / runcache.ENTRY_DIR / "key.json", {"logfile": "new", "created_at": 2.0})
+
+    assert runcache.merge_entries(newer, logs) == 1
+    assert runcache.merge_entries(older, logs) == 0
+    assert dict(runcache.read_entries(logs / runcache.ENTRY_DIR))["key"]["logfile"] == "new"
@@ -0,0 +1,85 @@
+import json
+import math
+import numpy as np
+import pytest
+from benchci import samples
+from benchci.compat import compact_log
+
+
+SAMPLES = [
+    {
+        "id": 2,
+        "epoch": 1,
+        "scores": {"match": {"value": "I"}},
+        "model_usage": {"m1": {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}},
+        "total_time": 1.5,
+    },
+    {
+        "id": 1,
+        "epoch": 1,
+        "scores": {"match": {"value": "C"}, "judge": {"value": {"accuracy": 0.5, "grade": "yes"}}},
+        "output": {"usage": {"input_tokens": 3, "output_tokens": 4, "total_tokens": 7}},
+        "error": "timeout",
+    },
+]
+
+REDUCTIONS = [{"reducer": "mean", "scorer": "match", "samples": [{"sample_id": 1, "value": 1.0}]}]
+
+
+def test_columns_are_ordered_by_sample_id():
+    columns = samples.extract_columns(SAMPLES, REDUCTIONS)
+
+    assert columns["id"].tolist() == [1, 2]
+    assert columns["error"].tolist() == [True, False]
+    assert columns["score.match"].tolist() == [1.0, 0.0]
+    assert columns["score.judge.grade"][0] == 1.0
+    assert math.isnan(columns["score.judge.accuracy"][1])
+    assert columns["total_tokens"].tolist() == [7, 15]
+    assert math.isnan(columns["total_time"][0])
+    assert columns["reduced.mean.match"][0] == 1.0
+
+
+@pytest.mark.parametrize("value, expected", [(True, 1.0), (3, 3.0), ("P", 0.5), ("0.25", 0.25)])
+def test_score_values_map_to_floats(value, expected):
+    assert samples.score_to_float(value) == expected
+
+
+def test_sidecar_round_trip(tmp_path):
+    columns = samples.extract_columns(SAMPLES, REDUCTIONS)
+    path = tmp_path / "run_compat.samples.npz"
+    samples.write_sidecar(path, columns)
+
+    loaded = samples.load_samples(path)
+
+    assert set(loaded) == set(columns)
+    for name, values in columns.items():
+        np.testing.assert_array_equal(loaded[name], values)
+    assert isinstance(loaded["total_tokens"], np.memmap)
+
+
+def test_load_only_the_requested_columns(tmp_path):
+    path = tmp_path / "run_compat.samples.npz"
+    samples.write_sidecar(path, samples.extract_columns(SAMPLES))
+
+    assert set(samples.load_samples(path, ["id", "score.match"])) == {"id", "score.match"}
+    with pytest.raises(KeyError):
+        samples.load_samples(path, ["missing"])
+
+
+def test_compacting_a_log_writes_its_sidecar(tmp_path):
+    log = {"status": "success", "eval": {"task": "mmlu"}, "samples": SAMPLES, "reductions": REDUCTIONS}
+    (tmp_path / "run.json").write_text(json.dumps(log))
+
+    compacted = compact_log(tmp_path / "run.json", compression="gzip")
+
+    assert compacted == tmp_path / "run_compat.json.gz"
+    assert samples.sidecar_path(compacted) == tmp_path / "run_compat.samples.npz"
+    np.testing.assert_array_equal(samples.load_samples(compacted)["id"], [1, 2])
+
+
+def test_logs_without_samples_get_no_sidecar(tmp_path):
+    (tmp_path / "run.json").write_text(json.dumps({"status": "success", "samples": []}))
+
+    compacted = compact_log(tmp_path / "run.json")
+
+    assert not samples.sidecar_path(compacted).exists()
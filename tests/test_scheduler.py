@@ -0,0 +1,147 @@
+import pytest
+from benchci import scheduler
+from benchci.scheduler import Job, Scheduler, TokenBucket, RateLimiter
+
+
+class FakeTime:
+    """Stands in for the `time` module; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(scheduler, "time", fake)
+    return fake
+
+
+def job(model_name="openrouter/m1", eval_name="mmlu", limit=60, **fields):
+    return Job("nightly", model_name, eval_name, limit, **fields)
+
+
+def test_bucket_refills_at_its_per_minute_rate(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.try_acquire(60)
+    assert not bucket.try_acquire(1)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+    clock.sleep(10)
+    assert bucket.try_acquire(10)
+    assert not bucket.try_acquire(1)
+
+
+def test_bucket_admits_oversized_requests_when_full(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.try_acquire(100)
+    assert bucket.level == -40
+    assert bucket.wait_time(100) == pytest.approx(100.0)
+
+
+def test_charges_put_the_bucket_into_debt(clock):
+    bucket = TokenBucket(60)
+    bucket.charge(90)
+
+    assert bucket.wait_time(0) == pytest.approx(30.0)
+    clock.sleep(30)
+    assert bucket.wait_time(0) == 0.0
+
+
+def test_rate_limiter_waits_for_the_request_budget(clock):
+    limiter = RateLimiter({"providers": {"openrouter": {"requests_per_minute": 2}}})
+
+    limiter.acquire("openrouter/m1")
+    limiter.acquire("openrouter/m2")
+    assert clock.now == 1000.0
+
+    limiter.acquire("openrouter/m1")
+    assert clock.now == pytest.approx(1030.0)
+    assert limiter.stats["delayed"] == 1
+
+    # Other providers are not limited
+    limiter.acquire("openai/gpt")
+    assert clock.now == pytest.approx(1030.0)
+
+
+def test_rate_limiter_waits_while_tokens_are_in_debt(clock):
+    limiter = RateLimiter({"models": {"openrouter/m1": {"tokens_per_minute": 600}}})
+
+    limiter.charge("openrouter/m1", 900)
+    limiter.acquire("openrouter/m1")
+
+    assert clock.now == pytest.approx(1030.0)
+
+
+def test_rate_limiter_without_limits_is_falsy():
+    assert not RateLimiter({"providers": {"openrouter": {"max_concurrency": 2}}})
+    assert RateLimiter({"providers": {"openrouter": {"tokens_per_minute": 10}}})
+
+
+def test_scheduler_caps_concurrency_per_provider_and_model(clock):
+    limits = Scheduler(
+        {
+            "providers": {"openrouter": {"max_concurrency": 2}},
+            "models": {"openrouter/m1": {"max_concurrency": 1}},
+        }
+    )
+    first, second, third = job(), job(eval_name="gpqa"), job("openrouter/m2")
+
+    assert limits.admit(first)
+    assert not limits.admit(second)
+    assert limits.admit(third)
+    assert not limits.admit(job("openrouter/m3"))
+
+    limits.release(first)
+    assert limits.admit(second)
+
+
+def test_scheduler_charges_estimates_and_trues_up_usage(clock):
+    limits = Scheduler(
+        {"providers": {"openrouter": {"tokens_per_minute": 1000}}},
+        estimates={("openrouter/m1", "mmlu"): 600},
+    )
+    first = job()
+
+    assert limits.admit(first)
+    assert not limits.admit(Job("other", "openrouter/m1", "mmlu"))
+
+    limits.release(first, {"tokens": 900})
+    assert limits.wait_time([job()]) == pytest.approx(60 * (600 - 100) / 1000)
+
+
+def test_enforced_providers_are_only_limited_by_concurrency(clock):
+    config = {"providers": {"openrouter": {"requests_per_minute": 1}}}
+    limits = Scheduler(config, enforced=["openrouter"])
+
+    assert limits.admit(job()) and limits.admit(job(eval_name="gpqa"))
+    assert limits.wait_time([job()]) is None
+
+
+def test_estimate_splits_the_cost_of_sharded_jobs():
+    limits = Scheduler({}, estimates={("openrouter/m1", "mmlu"): 1000}, sample_counts={"mmlu": 300})
+
+    assert limits.estimate(job(limit=0)) == {"requests": 300, "tokens": 1000}
+    assert limits.estimate(job(limit=0, shard=1, shards=2)) == {"requests": 150, "tokens": 500}
+    assert limits.estimate(job(limit=0, shards=2, sample_range=(0, 100)))["requests"] == 100
+
+
+def test_max_connections_shares_the_provider_budget():
+    limits = Scheduler(
+        {
+            "providers": {"openrouter": {"max_connections": 10, "max_concurrency": 3}},
+            "models": {"openrouter/m1": {"max_connections": 8}},
+        }
+    )
+
+    assert limits.max_connections(job()) == 8
+    assert limits.max_connections(job("openrouter/m2")) == 3
+    assert limits.max_connections(job("openai/gpt")) is None
@@ -0,0 +1,107 @@
+import os
+import gzip
+import threading
+import http.client
+import pytest
+from benchci import server
+
+
+PAGE = b"<html>" + b"benchmark results " * 100 + b"</html>"
+
+
+@pytest.fixture
+def reports(tmp_path):
+    (tmp_path / "data" / "shards").mkdir(parents=True)
+    (tmp_path / "index.html").write_bytes(PAGE)
+    (tmp_path / "data" / "shards" / "results-0123abcd.json").write_text("{}")
+    return tmp_path
+
+
+@pytest.fixture
+def serve(reports):
+    servers = []
+
+    def start(**serve_config):
+        httpd = server.make_server(reports, 0, serve_config)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return httpd.server_address[1]
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def get(port, path, **headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_precompress_writes_variants_only_for_large_text_assets(reports):
+    server.precompress_reports(reports)
+
+    assert gzip.decompress((reports / "index.html.gz").read_bytes()) == PAGE
+    assert not (reports / "data" / "shards" / "results-0123abcd.json.gz").exists()
+
+    # Unchanged sources are not compressed again
+    assert server._precompress(reports, 512) == 0
+
+
+def test_unchanged_files_are_answered_with_304(reports, serve):
+    port = serve()
+
+    response, body = get(port, "/")
+    etag = response.getheader("ETag")
+    assert response.status == 200 and body == PAGE
+    assert response.getheader("Cache-Control") == "no-cache"
+
+    response, body = get(port, "/index.html", **{"If-None-Match": etag})
+    assert response.status == 304 and body == b""
+    assert response.getheader("ETag") == etag
+
+    (reports / "index.html").write_bytes(PAGE + b"\n")
+    response, _ = get(port, "/index.html", **{"If-None-Match": etag})
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+
+
+def test_the_preferred_accepted_encoding_is_served(reports, serve):
+    (reports / "index.html.br").write_bytes(b"brotli bytes")
+    server.precompress_reports(reports)
+    port = serve()
+
+    response, body = get(port, "/index.html", **{"Accept-Encoding": "gzip, br"})
+    assert response.getheader("Content-Encoding") == "br" and body == b"brotli bytes"
+    assert response.getheader("Vary") == "Accept-Encoding"
+
+    response, body = get(port, "/index.html", **{"Accept-Encoding": "gzip, br;q=0"})
+    assert response.getheader("Content-Encoding") == "gzip" and gzip.decompress(body) == PAGE
+
+    response, body = get(port, "/index.html")
+    assert response.getheader("Content-Encoding") is None and body == PAGE
+
+
+def test_stale_variants_are_not_served(reports, serve):
+    server.precompress_reports(reports)
+    stat = (reports / "index.html.gz").stat()
+    os.utime(reports / "index.html", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    port = serve()
+
+    response, body = get(port, "/index.html", **{"Accept-Encoding": "gzip"})
+
+    assert response.getheader("Content-Encoding") is None and body == PAGE
+
+
+def test_only_content_hashed_shards_are_cached_as_immutable(serve):
+    port = serve(max_age=60)
+
+    response, _ = get(port, "/data/shards/results-0123abcd.json")
+    assert response.getheader("Cache-Control") == "public, max-age=31536000, immutable"
+
+    response, _ = get(port, "/index.html")
+    assert response.getheader("Cache-Control") == "public, max-age=60"
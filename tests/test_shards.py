@@ -0,0 +1,52 @@
+import math
+import random
+import pytest
+from benchci.shards import shard_ranges, combine_metric
+
+
+def mean_and_stderr(values):
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    return mean, math.sqrt(variance) / math.sqrt(n)
+
+
+@pytest.mark.parametrize("total, shards", [(10, 3), (7, 7), (3, 5), (1000, 4)])
+def test_shard_ranges_cover_every_sample_once(total, shards):
+    ranges = shard_ranges(total, shards)
+
+    assert len(ranges) == min(total, shards)
+    assert [index for start, end in ranges for index in range(start, end)] == list(range(total))
+
+
+@pytest.mark.parametrize("mean_name", ["accuracy", "mean"])
+def test_combined_stderr_matches_the_unsharded_eval(mean_name):
+    rng = random.Random(7)
+    if mean_name == "accuracy":
+        scores = [float(rng.random() < 0.6) for _ in range(500)]
+    else:
+        scores = [rng.gauss(3, 2) for _ in range(500)]
+    shards = [scores[start:end] for start, end in shard_ranges(len(scores), 3)]
+    stats = [mean_and_stderr(shard) for shard in shards]
+    shard_metrics = {mean_name: [mean for mean, _ in stats], "stderr": [stderr for _, stderr in stats]}
+    counts = [len(shard) for shard in shards]
+
+    mean, stderr = mean_and_stderr(scores)
+
+    assert combine_metric(mean_name, shard_metrics, counts) == pytest.approx(mean)
+    assert combine_metric("stderr", shard_metrics, counts) == pytest.approx(stderr)
+
+
+def test_combined_stderr_accounts_for_shards_with_different_means():
+    # Every shard is constant, so all of the variance lies between the shards
+    shard_metrics = {"accuracy": [0.0, 1.0], "stderr": [0.0, 0.0]}
+
+    _, stderr = mean_and_stderr([0.0] * 4 + [1.0] * 4)
+
+    assert combine_metric("stderr", shard_metrics, [4, 4]) == pytest.approx(stderr)
+
+
+def test_combine_metric_without_samples_or_a_mean():
+    assert combine_metric("accuracy", {"accuracy": [0.5, 0.5]}, [0, 0]) == 0.0
+    assert combine_metric("stderr", {"stderr": [0.1, 0.2]}, [10, 10]) == 0.0
+    assert combine_metric("f1", {"f1": [0.2, 0.8]}, [1, 3]) == pytest.approx(0.65)
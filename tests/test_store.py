@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+from benchci import store
+
+
+def make_entry(model, eval_name, timestamp, score, total_tokens=100):
+    return {
+        "model": model,
+        "timestamp": timestamp,
+        "eval_name": eval_name,
+        "score": score,
+        "additional_metrics": {"stderr": 0.01},
+        "total_input_tokens": total_tokens // 2,
+        "total_output_tokens": total_tokens // 2,
+        "total_tokens": total_tokens,
+    }
+
+
+def fill(conn):
+    with conn:
+        store.insert_entry(conn, "a.json", make_entry("m1", "openbench/mmlu", "2025-09-01T00:00:00+00:00", 0.5), 100, 60.0)
+        store.insert_entry(conn, "b.json", make_entry("m1", "openbench/mmlu", "2025-09-02T00:00:00+00:00", 0.7), 100, 30.0)
+        store.insert_entry(conn, "c.json", make_entry("m1", "openbench/mmlu", "2025-09-03T00:00:00+00:00", "Error"))
+        store.insert_entry(conn, "d.json", make_entry("m2", "openbench/gpqa", "2025-09-02T00:00:00+00:00", 0.3, 200), 50)
+
+
+def test_entries_round_trip_through_the_store(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    entry = make_entry("m1", "openbench/mmlu", "2025-09-01T00:00:00+00:00", 0.5)
+    with conn:
+        store.insert_entry(conn, "a.json", entry)
+
+    assert store.query_results(conn) == [entry]
+
+
+def test_errored_runs_come_back_as_errors(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+
+    scores = [entry["score"] for entry in store.query_results(conn)]
+
+    assert scores == [0.5, 0.7, "Error", 0.3]
+    assert "Error" not in [entry["score"] for entry in store.query_results(conn, include_errors=False)]
+
+
+def test_query_filters(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+    since = datetime(2025, 9, 2, tzinfo=timezone.utc)
+
+    assert {entry["model"] for entry in store.query_results(conn, model="m2")} == {"m2"}
+    assert len(store.query_results(conn, eval_name="openbench/mmlu")) == 3
+    assert [entry["timestamp"][:10] for entry in store.query_results(conn, since=since)] == [
+        "2025-09-02",
+        "2025-09-03",
+        "2025-09-02",
+    ]
+
+
+def test_latest_picks_the_newest_run_per_model_and_eval(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+
+    latest = store.query_results(conn, latest=True)
+    assert [(entry["model"], entry["score"]) for entry in latest] == [("m1", "Error"), ("m2", 0.3)]
+
+    latest = store.query_results(conn, latest=True, include_errors=False)
+    assert [(entry["model"], entry["score"]) for entry in latest] == [("m1", 0.7), ("m2", 0.3)]
+    assert store.latest_scores(conn) == {("m1", "mmlu"): 0.7, ("m2", "gpqa"): 0.3}
+
+
+def test_aggregate_queries_skip_errored_runs(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+
+    assert store.mean_usage(conn) == {("m1", "mmlu"): 100, ("m2", "gpqa"): 200}
+    assert store.run_durations(conn) == [("m1", "mmlu", 60.0, 100), ("m1", "mmlu", 30.0, 100)]
+    assert store.sample_counts(conn) == {"mmlu": 100, "gpqa": 50}
+
+
+def test_runs_beyond_keeps_the_newest_runs(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+
+    assert [entry["source"] for entry in store.runs_beyond(conn, 1, "rollups/")] == ["a.json"]
+    assert store.runs_beyond(conn, 2, "rollups/") == []
+    # Excluded results (roll-ups) are not counted towards the runs kept
+    assert store.runs_beyond(conn, 1, "a.json") == []
+
+
+def test_forget_files_removes_results_and_manifest_rows(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    fill(conn)
+    with conn:
+        store.record_file(conn, "a.json", 10, 1, "sha", "success")
+        store.forget_files(conn, ["a.json"])
+
+    assert store.load_manifest(conn) == {}
+    assert "a.json" not in {row["source"] for row in conn.execute("SELECT source FROM results")}
+
+
+def test_errored_logs_match_patterns_and_skip_started_runs(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    with conn:
+        store.record_file(conn, "a.json", 1, 1, "sha", "success")
+        store.record_file(conn, "b.json", 1, 1, "sha", "error", "RateLimitError: 429")
+        store.record_file(conn, "c.json", 1, 1, "sha", "started")
+        store.record_file(conn, "d.json", 1, 1, "sha", "invalid", "JSONDecodeError")
+
+    assert store.errored_logs(conn) == [("b.json", "RateLimitError: 429"), ("d.json", "JSONDecodeError")]
+    assert store.errored_logs(conn, ["ratelimit"]) == [("b.json", "RateLimitError: 429")]
+
+
+def test_schema_upgrade_rebuilds_derived_tables_but_keeps_the_run_cache(tmp_path):
+    path = tmp_path / "results.db"
+    conn = store.connect(path)
+    fill(conn)
+    with conn:
+        conn.execute("INSERT INTO run_cache VALUES ('key', 'm1', 'mmlu', 'a.json', 1.0)")
+        conn.execute(f"PRAGMA user_version = {store.SCHEMA_VERSION - 1}")
+    conn.close()
+
+    conn = store.connect(path)
+
+    assert store.query_results(conn) == []
+    assert conn.execute("SELECT COUNT(*) FROM run_cache").fetchone()[0] == 1
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == store.SCHEMA_VERSION
+
+
+def test_queries_use_the_indexes(tmp_path):
+    conn = store.connect(tmp_path / "results.db")
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM results WHERE model = ?", ("m1",)).fetchall()
+
+    assert any("results_model" in row[-1] for row in plan)